@@ -0,0 +1,72 @@
+"""
+Compare crop preprocessing modes on a labelled corpus.
+
+Uses the same corpus layout as tune_thresholds.py (screenshots + labels.json).
+Every screenshot is run through the ROI fast path once per mode; per project
+and mode it reports how often the fast path accepted the correct score and the
+average preprocessing cost. Pick the winner per project for PREPROCESS_MODES.
+
+  python bench_preprocess.py ./corpus --modes none,invert,binary
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from tune_thresholds import _num
+
+
+async def run(corpus: str, modes: list[str]) -> dict:
+    import bot
+    import preprocess
+
+    with open(os.path.join(corpus, "labels.json"), "r", encoding="utf-8") as f:
+        labels = json.load(f)
+    blobs = {}
+    for name, lab in labels.items():
+        path = os.path.join(corpus, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                blobs[name] = (f.read(), lab)
+
+    report = {}
+    for mode in modes:
+        bot.PREPROCESS_MODES = {"default": mode}
+        preprocess.STATS.clear()
+        for name, (data, lab) in blobs.items():
+            project = lab.get("project") or "auto"
+            t0 = time.perf_counter()
+            _img, proj, score, _handle, used_fast, _conf = await bot.detect_project_score_and_handle(
+                data, project_hint=project
+            )
+            ms = (time.perf_counter() - t0) * 1000.0
+            row = report.setdefault(proj, {}).setdefault(mode, {"n": 0, "hits": 0, "ms": 0.0})
+            row["n"] += 1
+            row["ms"] += ms
+            if used_fast and _num(score) is not None and _num(score) == _num(lab.get("score")):
+                row["hits"] += 1
+        pp = preprocess.summary().get(mode, {})
+        for proj_rows in report.values():
+            if mode in proj_rows:
+                proj_rows[mode]["preprocess_ms"] = pp.get("avg_ms", 0.0)
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("corpus")
+    ap.add_argument("--modes", default=",".join(("none", "gray", "invert", "binary")))
+    args = ap.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    report = asyncio.run(run(args.corpus, modes))
+    print(f"{'project':<16}{'mode':<8}{'n':>5}{'fast hit':>10}{'avg ms':>9}{'prep ms':>9}")
+    for proj, rows in sorted(report.items()):
+        for mode, r in rows.items():
+            rate = r["hits"] / r["n"] if r["n"] else 0.0
+            print(f"{proj:<16}{mode:<8}{r['n']:>5}{rate:>10.1%}{r['ms'] / max(1, r['n']):>9.1f}{r.get('preprocess_ms', 0.0):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
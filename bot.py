@@ -14,7 +14,24 @@ import hashlib
 import base64
 import aiohttp
 import hmac
+import math
+import atexit
+import gzip
 import database
+import image_hash
+import ocr_limiter
+import profiling
+import ocr_backends
+import roi_learning
+import preprocess
+import capture
+import history_export
+import role_reconciler
+import ocr_nodes
+import storage
+import rate_limit
+import ocr_cost
+import handle_match
 
 # ============================================================
 # Optional OCR acceleration deps (Pillow + numpy)
@@ -48,19 +65,130 @@ DISCORD_TOKEN = getattr(config, "DISCORD_TOKEN", os.getenv("DISCORD_TOKEN", ""))
 # For instant slash commands in a test server, set DISCORD_GUILD_ID (recommended).
 DISCORD_GUILD_ID = int(getattr(config, "DISCORD_GUILD_ID", os.getenv("DISCORD_GUILD_ID", "0")) or 0)
 
+# Sharding: SHARD_COUNT > 0 (or AUTO_SHARD=1 to let Discord pick) runs an AutoShardedClient.
+# SHARD_IDS=0,1 makes this process own only those shards, so shards can be spread over processes/hosts;
+# the process that owns shard 0 (or an unsharded one) syncs slash commands.
+AUTO_SHARD = bool(int(getattr(config, "AUTO_SHARD", os.getenv("AUTO_SHARD", "0")) or 0))
+SHARD_COUNT = int(getattr(config, "SHARD_COUNT", os.getenv("SHARD_COUNT", "0")) or 0)
+SHARD_IDS = [int(x) for x in str(getattr(config, "SHARD_IDS", os.getenv("SHARD_IDS", ""))).split(",") if x.strip()]
+if SHARD_IDS and not SHARD_COUNT:
+    # Without the total, discord.py would ask the gateway and each process could get a different count
+    raise SystemExit("SHARD_IDS is set but SHARD_COUNT is not; set SHARD_COUNT to the total number of shards.")
+if SHARD_IDS and not all(0 <= i < SHARD_COUNT for i in SHARD_IDS):
+    raise SystemExit(f"SHARD_IDS {SHARD_IDS} must be between 0 and SHARD_COUNT-1 ({SHARD_COUNT - 1}).")
+IS_PRIMARY = not SHARD_IDS or 0 in SHARD_IDS
+
+# Shared state backend: empty/sqlite:///path = local SQLite; http://host:8200 = storage_service.py
+# (required when several processes or hosts run the bot).
+STORAGE = storage.from_url(
+    getattr(config, "STORAGE_URL", os.getenv("STORAGE_URL", "")),
+    token=getattr(config, "STORAGE_TOKEN", os.getenv("STORAGE_TOKEN", "")).strip()
+)
+
 # Optional: restrict /verify to one channel (0 = allow everywhere)
 VERIFY_CHANNEL_ID = int(getattr(config, "VERIFY_CHANNEL_ID", os.getenv("VERIFY_CHANNEL_ID", "0")) or 0)
 
+# Command cooldowns (token buckets, checked before any download/OCR). Rates are per minute; 0 disables.
+VERIFY_MEMBER_RATE = float(getattr(config, "VERIFY_MEMBER_RATE", os.getenv("VERIFY_MEMBER_RATE", "3")) or 0)
+VERIFY_MEMBER_BURST = float(getattr(config, "VERIFY_MEMBER_BURST", os.getenv("VERIFY_MEMBER_BURST", "3")) or 1)
+VERIFY_GUILD_RATE = float(getattr(config, "VERIFY_GUILD_RATE", os.getenv("VERIFY_GUILD_RATE", "120")) or 0)
+VERIFY_GUILD_BURST = float(getattr(config, "VERIFY_GUILD_BURST", os.getenv("VERIFY_GUILD_BURST", "40")) or 1)
+XLINK_MEMBER_RATE = float(getattr(config, "XLINK_MEMBER_RATE", os.getenv("XLINK_MEMBER_RATE", "2")) or 0)
+XLINK_MEMBER_BURST = float(getattr(config, "XLINK_MEMBER_BURST", os.getenv("XLINK_MEMBER_BURST", "2")) or 1)
+COOLDOWNS = {
+    "verify_member": rate_limit.TokenBucketLimiter(VERIFY_MEMBER_RATE, VERIFY_MEMBER_BURST),
+    "verify_guild": rate_limit.TokenBucketLimiter(VERIFY_GUILD_RATE, VERIFY_GUILD_BURST),
+    "xlink_member": rate_limit.TokenBucketLimiter(XLINK_MEMBER_RATE, XLINK_MEMBER_BURST),
+}
+COOLDOWNS_ENABLED = True
+
 # OCR concurrency limiter (important under load)
+# OCR_CONCURRENCY is the starting limit; with OCR_ADAPTIVE=1 it is tuned (AIMD) between
+# OCR_CONCURRENCY_MIN and OCR_CONCURRENCY_MAX from observed latency, queue wait and CPU.
+# Not with OCR_WORKERS or OCR_NODES (see below): the limit then stays at OCR_CONCURRENCY.
 OCR_CONCURRENCY = int(getattr(config, "OCR_CONCURRENCY", os.getenv("OCR_CONCURRENCY", "4")) or 4)
-OCR_SEMAPHORE = asyncio.Semaphore(OCR_CONCURRENCY)
+OCR_ADAPTIVE = bool(int(getattr(config, "OCR_ADAPTIVE", os.getenv("OCR_ADAPTIVE", "1")) or 0))
+OCR_CONCURRENCY_MIN = int(getattr(config, "OCR_CONCURRENCY_MIN", os.getenv("OCR_CONCURRENCY_MIN", "1")) or 1)
+OCR_CONCURRENCY_MAX = int(getattr(config, "OCR_CONCURRENCY_MAX", os.getenv("OCR_CONCURRENCY_MAX", "0")) or 0) or None  # 0 = CPU count
+# Queued jobs run cheapest-predicted-first. OCR_SCHED_AGING: seconds of predicted cost forgiven per
+# second waited (0 = pure shortest-job-first). OCR_RESERVED_SLOTS: slots likely full-OCR jobs can't use.
+OCR_SCHED_AGING = float(getattr(config, "OCR_SCHED_AGING", os.getenv("OCR_SCHED_AGING", "1.0")) or 0)
+OCR_RESERVED_SLOTS = int(getattr(config, "OCR_RESERVED_SLOTS", os.getenv("OCR_RESERVED_SLOTS", "1")) or 0)
+# A job is "heavy" up front when its hint's fast path misses at least this often
+OCR_HEAVY_MISS_RATE = float(getattr(config, "OCR_HEAVY_MISS_RATE", os.getenv("OCR_HEAVY_MISS_RATE", "0.5")) or 0.5)
+OCR_SEMAPHORE = ocr_limiter.AdaptiveLimiter(
+    OCR_CONCURRENCY,
+    min_limit=OCR_CONCURRENCY_MIN,
+    max_limit=OCR_CONCURRENCY_MAX,
+    adaptive=OCR_ADAPTIVE,
+    aging=OCR_SCHED_AGING,
+    reserved=OCR_RESERVED_SLOTS,
+)
 
 # Downscale very large screenshots for speed (keeps enough detail for numbers)
 MAX_IMAGE_SIDE = int(getattr(config, "MAX_IMAGE_SIDE", os.getenv("MAX_IMAGE_SIDE", "1600")) or 1600)
 
+# Coarse-to-fine full-image OCR: run text *detection* on a copy downscaled to this side,
+# then recognize the detected boxes on the MAX_IMAGE_SIDE image (0 = detect at full size)
+COARSE_DETECT_SIDE = int(getattr(config, "COARSE_DETECT_SIDE", os.getenv("COARSE_DETECT_SIDE", "640")) or 0)
+
+# Predicted OCR cost per job (fast-path hit rates, per-megapixel full-OCR time), learned from finished jobs
+OCR_COSTS = ocr_cost.CostModel(max_side=MAX_IMAGE_SIDE)
+
+# Fast-path score confidence: full OCR only runs when the calibrated confidence of the
+# ROI score is below its project's threshold. Thresholds (and optional Platt scaling a/b)
+# come from SCORE_THRESHOLDS_FILE, written by tune_thresholds.py from a labelled corpus.
+SCORE_THRESHOLD_DEFAULT = float(getattr(config, "SCORE_THRESHOLD_DEFAULT", os.getenv("SCORE_THRESHOLD_DEFAULT", "0.5")) or 0.5)
+# Below this, a fast-path score is discarded even if full OCR finds nothing
+SCORE_MIN_CONFIDENCE = float(getattr(config, "SCORE_MIN_CONFIDENCE", os.getenv("SCORE_MIN_CONFIDENCE", "0.25")) or 0.0)
+SCORE_THRESHOLDS_FILE = getattr(config, "SCORE_THRESHOLDS_FILE", os.getenv("SCORE_THRESHOLDS_FILE", "score_thresholds.json")).strip()
+
 # Enable ROI-based fast OCR (set FAST_OCR=0 to disable)
 FAST_OCR = bool(int(getattr(config, "FAST_OCR", os.getenv("FAST_OCR", "1")) or 1))
 
+# On-demand profiling of slow /verify requests (PROFILE_SLOW_MS=0 disables the threshold trigger;
+# admins can still arm it with /profile). Captures go to PROFILE_DIR, keeping the newest PROFILE_KEEP.
+PROFILE_SLOW_MS = int(getattr(config, "PROFILE_SLOW_MS", os.getenv("PROFILE_SLOW_MS", "0")) or 0)
+PROFILE_DIR = getattr(config, "PROFILE_DIR", os.getenv("PROFILE_DIR", "profiles")).strip()
+PROFILE_KEEP = int(getattr(config, "PROFILE_KEEP", os.getenv("PROFILE_KEEP", "20")) or 20)
+PROFILER = profiling.ProfileHook(out_dir=PROFILE_DIR, slow_ms=PROFILE_SLOW_MS, keep=PROFILE_KEEP)
+
+# Remote OCR nodes (ocr_service.py): comma-separated base URLs. Requests go to the healthy node with
+# the fewest in flight; if every node fails the screenshot is processed locally.
+OCR_NODES_URLS = [u.strip() for u in getattr(config, "OCR_NODES", os.getenv("OCR_NODES", "")).split(",") if u.strip()]
+OCR_NODE_TOKEN = getattr(config, "OCR_NODE_TOKEN", os.getenv("OCR_NODE_TOKEN", "")).strip()
+OCR_NODE_TIMEOUT = float(getattr(config, "OCR_NODE_TIMEOUT", os.getenv("OCR_NODE_TIMEOUT", "30")) or 30)
+OCR_NODES = ocr_nodes.OCRNodePool(OCR_NODES_URLS, token=OCR_NODE_TOKEN, timeout=OCR_NODE_TIMEOUT)
+
+# Record-and-replay: store CAPTURE_SAMPLE_RATE of /verify screenshots (0 = off) with their timings and
+# outcome in CAPTURE_DIR, capped at CAPTURE_MAX_MB. Replay offline with replay.py.
+CAPTURE_SAMPLE_RATE = float(getattr(config, "CAPTURE_SAMPLE_RATE", os.getenv("CAPTURE_SAMPLE_RATE", "0")) or 0)
+CAPTURE_DIR = getattr(config, "CAPTURE_DIR", os.getenv("CAPTURE_DIR", "captures")).strip()
+CAPTURE_MAX_MB = int(getattr(config, "CAPTURE_MAX_MB", os.getenv("CAPTURE_MAX_MB", "500")) or 0)
+CAPTURE = capture.CaptureArchive(path=CAPTURE_DIR, sample_rate=CAPTURE_SAMPLE_RATE, max_bytes=CAPTURE_MAX_MB * 1024 * 1024)
+
+# History retention (opt-in): raw verification_history rows older than RETENTION_DAYS are deleted
+# (daily aggregates keep their rollup). 0 = keep forever. Databases created before this need
+# `python database.py --enable-incremental-vacuum` once, offline, to hand freed pages back.
+RETENTION_DAYS = int(getattr(config, "RETENTION_DAYS", os.getenv("RETENTION_DAYS", "0")) or 0)
+RETENTION_INTERVAL_HOURS = float(getattr(config, "RETENTION_INTERVAL_HOURS", os.getenv("RETENTION_INTERVAL_HOURS", "6")) or 6)
+RETENTION_BATCH = int(getattr(config, "RETENTION_BATCH", os.getenv("RETENTION_BATCH", "500")) or 500)
+VACUUM_PAGES = int(getattr(config, "VACUUM_PAGES", os.getenv("VACUUM_PAGES", "2000")) or 2000)
+
+# Tier-role reconciliation against member_latest_tier. Needs the privileged Server Members intent
+# (enable it in the developer portal). RECONCILE_INTERVAL_HOURS=0 leaves only the /reconcile command.
+RECONCILE_ENABLED = bool(int(getattr(config, "RECONCILE_ENABLED", os.getenv("RECONCILE_ENABLED", "0")) or 0))
+RECONCILE_INTERVAL_HOURS = float(getattr(config, "RECONCILE_INTERVAL_HOURS", os.getenv("RECONCILE_INTERVAL_HOURS", "24")) or 0)
+RECONCILE_CHUNK = int(getattr(config, "RECONCILE_CHUNK", os.getenv("RECONCILE_CHUNK", "500")) or 500)
+RECONCILE_EDITS_PER_MIN = float(getattr(config, "RECONCILE_EDITS_PER_MIN", os.getenv("RECONCILE_EDITS_PER_MIN", "30")) or 0)
+# Also strip tier roles from members with no recorded tier (e.g. granted by hand)
+RECONCILE_REMOVE_UNTRACKED = bool(int(getattr(config, "RECONCILE_REMOVE_UNTRACKED", os.getenv("RECONCILE_REMOVE_UNTRACKED", "0")) or 0))
+
+# Perceptual-hash reuse check: max Hamming distance (of 64 bits) to count as the same screenshot
+PHASH_MAX_DISTANCE = int(getattr(config, "PHASH_MAX_DISTANCE", os.getenv("PHASH_MAX_DISTANCE", "6")) or 6)
+# How stale the in-memory index may get before /verify pulls attempts other processes stored
+PHASH_REFRESH_SECONDS = float(getattr(config, "PHASH_REFRESH_SECONDS", os.getenv("PHASH_REFRESH_SECONDS", "30")) or 0)
+
 
 # Role tier names (fixed, only 3 roles)
 TIER_ROLE_NAMES = ["Signal Lite", "Signal Amplifier", "Top Signal"]
@@ -73,11 +201,62 @@ TIER_ROLE_NAMES = ["Signal Lite", "Signal Amplifier", "Top Signal"]
 # Note: EasyOCR uses PyTorch under the hood.
 # Keep reader global so models are loaded once.
 OCR_GPU = bool(int(getattr(config, "OCR_GPU", os.getenv("OCR_GPU", "0")) or 0))
-try:
-    reader = easyocr.Reader(['en'], gpu=OCR_GPU, verbose=False)
-except TypeError:
-    # Older easyocr versions might not support verbose=
-    reader = easyocr.Reader(['en'], gpu=OCR_GPU)
+# OCR_WORKERS > 0 runs EasyOCR in that many worker processes instead of in-process; a worker is
+# recycled (after a warm replacement is ready) once it served OCR_WORKER_MAX_JOBS jobs or its RSS
+# crossed OCR_WORKER_MAX_RSS_MB (0 disables either limit).
+OCR_WORKERS = int(getattr(config, "OCR_WORKERS", os.getenv("OCR_WORKERS", "0")) or 0)
+OCR_WORKER_MAX_JOBS = int(getattr(config, "OCR_WORKER_MAX_JOBS", os.getenv("OCR_WORKER_MAX_JOBS", "500")) or 0)
+OCR_WORKER_MAX_RSS_MB = float(getattr(config, "OCR_WORKER_MAX_RSS_MB", os.getenv("OCR_WORKER_MAX_RSS_MB", "1500")) or 0)
+# OCR_WORKER_SHARED=1 loads the weights once in a model host process and forks workers from it
+# (copy-on-write), so each worker costs only its private memory and starts in milliseconds.
+# The RSS limit then applies to a worker's private memory. Ignored with OCR_GPU.
+OCR_WORKER_SHARED = bool(int(getattr(config, "OCR_WORKER_SHARED", os.getenv("OCR_WORKER_SHARED", "1")) or 0))
+if OCR_WORKERS > 0 and os.name != "posix":
+    # Workers get their pipe as an inherited fd (pass_fds), which Windows doesn't have
+    print("[ocr] OCR_WORKERS needs a POSIX system; running OCR in-process")
+    OCR_WORKERS = 0
+if OCR_WORKERS > 0:
+    import ocr_workers
+    reader = ocr_workers.WorkerPool(
+        OCR_WORKERS, max_jobs=OCR_WORKER_MAX_JOBS, max_rss_mb=OCR_WORKER_MAX_RSS_MB, gpu=OCR_GPU,
+        shared=OCR_WORKER_SHARED,
+    ).start()
+    atexit.register(reader.close)
+else:
+    try:
+        reader = easyocr.Reader(['en'], gpu=OCR_GPU, verbose=False)
+    except TypeError:
+        # Older easyocr versions might not support verbose=
+        reader = easyocr.Reader(['en'], gpu=OCR_GPU)
+
+# The limiter's CPU reading (process_time) and torch thread split only see this process;
+# with OCR in worker processes or on remote nodes they'd steer the limit on noise.
+if OCR_WORKERS > 0 or OCR_NODES.nodes:
+    OCR_SEMAPHORE.adaptive = False
+    OCR_SEMAPHORE.tune_torch_threads = False
+
+# ROI OCR is routed through pluggable backends per region kind / project.
+# Default: everything goes through EasyOCR. The template digit reader is opt-in through
+# OCR_ROUTES (JSON), e.g. {"score": ["digits", "easyocr"], "Wallchain:score": ["easyocr"]}.
+DIGIT_TEMPLATE_DIR = getattr(config, "DIGIT_TEMPLATE_DIR", os.getenv("DIGIT_TEMPLATE_DIR", "digit_templates")).strip()
+DIGIT_TEMPLATE_FONT = getattr(config, "DIGIT_TEMPLATE_FONT", os.getenv("DIGIT_TEMPLATE_FONT", "")).strip() or None
+OCR_ROUTES = ocr_backends.parse_routes(getattr(config, "OCR_ROUTES", os.getenv("OCR_ROUTES", "")).strip())
+OCR_BACKENDS = {"easyocr": ocr_backends.EasyOCRBackend(reader)}
+if any("digits" in names for names in OCR_ROUTES.values()):
+    OCR_BACKENDS["digits"] = ocr_backends.DigitTemplateBackend(template_dir=DIGIT_TEMPLATE_DIR, font_path=DIGIT_TEMPLATE_FONT)
+# Crop preprocessing per project (none|gray|invert|binary), e.g. "Kaito=invert,default=none".
+# "<project>:handle" keys apply to handle crops; otherwise modes apply to score crops only.
+PREPROCESS_MODES = {"default": "none", **preprocess.parse_modes(
+    getattr(config, "PREPROCESS_MODES", os.getenv("PREPROCESS_MODES", "")).strip()
+)}
+
+def preprocess_mode(project: str | None, kind: str = "score") -> str:
+    mode = PREPROCESS_MODES.get(f"{project}:{kind}") or (PREPROCESS_MODES.get(project) if kind == "score" else None)
+    if mode is None:
+        mode = PREPROCESS_MODES.get("default", "none") if kind == "score" else "none"
+    return mode if mode in preprocess.MODES else "none"
+
+OCR_ROUTER = ocr_backends.OCRRouter(OCR_BACKENDS, OCR_ROUTES)
 
 
 # ============================================================
@@ -125,6 +304,25 @@ HANDLE_ROIS = [
     (0.00, 0.00, 1.00, 0.25),
 ]
 
+# Identity check against the linked handle: boxes recognized per handle ROI, the edit budget
+# for finding the box that holds the handle (after case/confusable folding; handles under
+# 6 chars need an exact read) and the recognizer confidence a read needs to count. A match
+# always needs an exact, case-insensitive read of the linked handle.
+HANDLE_MAX_BOXES = int(getattr(config, "HANDLE_MAX_BOXES", os.getenv("HANDLE_MAX_BOXES", "4")) or 4)
+HANDLE_MAX_EDITS = int(getattr(config, "HANDLE_MAX_EDITS", os.getenv("HANDLE_MAX_EDITS", "1")) or 0)
+HANDLE_MIN_CONF = float(getattr(config, "HANDLE_MIN_CONF", os.getenv("HANDLE_MIN_CONF", "0.5")) or 0.0)
+
+# Learned ROIs (from successful full-OCR runs) are tried before the static ones above
+# once a layout bucket has LEARNED_ROI_MIN_SAMPLES observations.
+LEARNED_ROI_MIN_SAMPLES = int(getattr(config, "LEARNED_ROI_MIN_SAMPLES", os.getenv("LEARNED_ROI_MIN_SAMPLES", "3")) or 3)
+LEARNED_ROIS = roi_learning.RoiLearner(min_samples=LEARNED_ROI_MIN_SAMPLES)
+
+def _score_rois(project, img):
+    return LEARNED_ROIS.rois(project, "score", img.size) + (SCORE_ROIS.get(project) or [])
+
+def _handle_rois(project, img):
+    return LEARNED_ROIS.rois(project or "Unknown", "handle", img.size) + HANDLE_ROIS
+
 _NUM_RE = re.compile(r"\d[\d,]*\d(?:\.\d+)?|\d(?:\.\d+)?")
 
 def _downscale_image(img):
@@ -209,14 +407,130 @@ def _best_number_from_texts(texts, project):
     parsed.sort(key=lambda x: x[0], reverse=True)
     return parsed[0][1]
 
-async def _readtext_detail0(img, allowlist):
-    """Fast readtext: detail=0 returns only strings (no boxes)."""
+# ---- Score confidence ----
+_GROUPED_NUM_RE = re.compile(r"^\d{1,3}(,\d{3})+(\.\d+)?$|^\d+(\.\d+)?$")
+
+def _load_score_thresholds(path: str) -> dict:
+    """{project: {"threshold": float, "a": float, "b": float}}; missing file = defaults."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {k: v for k, v in data.items() if isinstance(v, dict)}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+SCORE_THRESHOLDS = _load_score_thresholds(SCORE_THRESHOLDS_FILE)
+
+def score_threshold(project: str) -> float:
+    return float((SCORE_THRESHOLDS.get(project) or {}).get("threshold", SCORE_THRESHOLD_DEFAULT))
+
+def _bbox_height(bbox) -> float:
+    return max(1.0, float(bbox[2][1] - bbox[0][1]))
+
+def score_confidence_raw(results, score: str | None) -> float:
+    """
+    Uncalibrated confidence in [0, 1] that `score` is the dashboard score, from
+    the recognizer's token probability, how large the token is relative to the
+    other numbers in the crop (scores are the headline digits), whether another
+    similarly sized number competes with it, and whether digit grouping is sane.
+    """
+    if not score or not results:
+        return 0.0
+    nums = [(bbox, text, prob) for (bbox, text, prob) in results if _NUM_RE.search(str(text))]
+    chosen = [r for r in nums if score in str(r[1])]
+    if not chosen:
+        return 0.0
+    bbox, text, prob = max(chosen, key=lambda r: r[2])
+    h = _bbox_height(bbox)
+    max_h = max(_bbox_height(r[0]) for r in nums)
+    size = h / max_h
+
+    rivals = 0
+    for r in nums:
+        if r[0] is bbox:
+            continue
+        if _bbox_height(r[0]) >= 0.85 * h and score not in str(r[1]):
+            rivals += 1
+
+    conf = float(prob) * (0.5 + 0.5 * size)
+    if rivals:
+        conf *= 0.6
+    if not _GROUPED_NUM_RE.match(score):
+        conf *= 0.5
+    return max(0.0, min(1.0, conf))
+
+def calibrate_confidence(project: str, raw: float) -> float:
+    """Apply per-project Platt scaling when the thresholds file provides it."""
+    cfg = SCORE_THRESHOLDS.get(project) or {}
+    if "a" in cfg and "b" in cfg:
+        z = float(cfg["a"]) * raw + float(cfg["b"])
+        z = max(-30.0, min(30.0, z))
+        return 1.0 / (1.0 + math.exp(-z))
+    return raw
+
+async def _readtext_detail1(img, allowlist, backend=None, mode=None):
+    """ROI readtext that keeps boxes and per-token confidences (EasyOCR unless a backend is given)."""
+    backend = backend or OCR_BACKENDS["easyocr"]
     def _run():
-        # EasyOCR accepts numpy arrays
         arr = np.array(img) if _PIL_OK else img
-        return reader.readtext(arr, detail=0, paragraph=False, allowlist=allowlist, decoder="greedy")
+        if mode:
+            arr = preprocess.apply(mode, arr)
+        return backend.readtext(arr, allowlist=allowlist)
     return await asyncio.to_thread(_run)
 
+async def _readtext_routed(kind, project, img, allowlist, mode=None):
+    """Texts from the first backend routed for (kind, project) that returns anything."""
+    for backend in OCR_ROUTER.backends_for(kind, project):
+        results = await _readtext_detail1(img, allowlist, backend=backend, mode=mode)
+        if results:
+            return [r[1] for r in results]
+    return []
+
+def _project_from_blob(blob: str) -> str:
+    if "wallchain" in blob or "quacks" in blob or "quack balance" in blob:
+        return "Wallchain"
+    if "kaito" in blob or "total yaps" in blob or "earned yaps" in blob:
+        return "Kaito"
+    if "xeet" in blob or "xeets earned" in blob:
+        return "Xeet"
+    if "cookie" in blob or "snaps earned" in blob or "total snaps" in blob:
+        return "Cookie"
+    if "kol score" in blob or "mindoshare" in blob:
+        return "Mindoshare"
+    return "Unknown"
+
+def _scale_boxes(horizontal_list, free_list, factor: float, w: int, h: int):
+    """Map EasyOCR detector boxes from the coarse image back to the fine image."""
+    def cx(v):
+        return min(w, max(0, int(round(v * factor))))
+    def cy(v):
+        return min(h, max(0, int(round(v * factor))))
+    hs = [[cx(x0), cx(x1), cy(y0), cy(y1)] for (x0, x1, y0, y1) in horizontal_list]
+    fs = [[[cx(x), cy(y)] for (x, y) in box] for box in free_list]
+    return hs, fs
+
+def _readtext_coarse_to_fine(img):
+    """
+    Full-image OCR with detection on a small copy and recognition on `img`.
+    Returns readtext-style [(bbox, text, prob)] in `img` coordinates, so the
+    extract_* rules keep working unchanged. Blocking; call via asyncio.to_thread.
+    """
+    w, h = img.size
+    m = max(w, h)
+    if COARSE_DETECT_SIDE <= 0 or m <= COARSE_DETECT_SIDE:
+        return reader.readtext(np.array(img))
+
+    scale = COARSE_DETECT_SIDE / float(m)
+    small = img.resize((max(1, int(w * scale)), max(1, int(h * scale))))
+    horizontal, free = reader.detect(np.array(small), min_size=max(1, int(20 * scale)))
+    hs, fs = _scale_boxes(horizontal[0] if horizontal else [], free[0] if free else [], 1.0 / scale, w, h)
+    hs = [b for b in hs if b[1] > b[0] and b[3] > b[2]]
+    if not hs and not fs:
+        return []
+    return reader.recognize(np.array(img), horizontal_list=hs, free_list=fs, detail=1)
+
 async def _fast_detect_project(img):
     """Detect which project screenshot is for using small ROIs."""
     if not _PIL_OK or not FAST_OCR:
@@ -224,69 +538,151 @@ async def _fast_detect_project(img):
     try:
         for roi in PROJECT_DETECT_ROIS:
             crop = _crop_ratio(img, roi)
-            texts = await _readtext_detail0(crop, allowlist=_ALLOWLIST_HANDLE + _ALLOWLIST_NUM)
-            blob = " ".join(texts).lower()
-
-            if "wallchain" in blob or "quacks" in blob or "quack balance" in blob:
-                return "Wallchain"
-            if "kaito" in blob or "total yaps" in blob or "earned yaps" in blob:
-                return "Kaito"
-            if "xeet" in blob or "xeets earned" in blob:
-                return "Xeet"
-            if "cookie" in blob or "snaps earned" in blob or "total snaps" in blob:
-                return "Cookie"
-            if "kol score" in blob or "mindoshare" in blob:
-                return "Mindoshare"
+            texts = await _readtext_routed("project", None, crop, allowlist=_ALLOWLIST_HANDLE + _ALLOWLIST_NUM)
+            proj = _project_from_blob(" ".join(texts).lower())
+            if proj != "Unknown":
+                return proj
     except Exception:
         pass
     return "Unknown"
 
-async def _fast_extract_handle(img):
+def _handle_from_texts(texts):
+    for t in texts:
+        s = (t or "").strip()
+        if s.startswith("@") and len(s) > 3:
+            return s.lstrip("@").strip().strip(".,;:!)]}(")
+    return None
+
+async def _fast_extract_handle(img, project=None):
     if not _PIL_OK or not FAST_OCR:
         return None
     try:
-        for roi in HANDLE_ROIS:
+        for roi in _handle_rois(project, img):
             crop = _crop_ratio(img, roi)
-            texts = await _readtext_detail0(crop, allowlist=_ALLOWLIST_HANDLE)
-            for t in texts:
-                s = (t or "").strip()
-                if s.startswith("@") and len(s) > 3:
-                    return s.lstrip("@").strip().strip(".,;:!)]}(")
+            texts = await _readtext_routed("handle", project, crop, allowlist=_ALLOWLIST_HANDLE,
+                                           mode=preprocess_mode(project, "handle"))
+            handle = _handle_from_texts(texts)
+            if handle:
+                return handle
     except Exception:
         return None
     return None
 
+def _verify_handle_crop(img, roi, mode, expected: str, bound: int):
+    """
+    Blocking. Crop and preprocess the ROI, detect lines once, then recognize plausible boxes one at a time, restricted to
+    expected's characters, until one looks like the handle. That box is re-read with the open
+    handle allowlist, and only an exact read of expected is a match. If no box decides, every
+    line is read once with the open allowlist (same detection) to name whatever handle is there.
+    """
+    arr = np.array(_crop_ratio(img, roi))
+    if mode:
+        arr = preprocess.apply(mode, arr)
+    horizontal, _free = reader.detect(arr)
+    lines = horizontal[0] if horizontal else []
+    boxes = handle_match.plausible_boxes(lines, expected, HANDLE_MAX_BOXES)
+    allowlist = handle_match.allowlist_for(expected)
+    for box in boxes:
+        results = reader.recognize(arr, horizontal_list=[box], free_list=[], detail=1, allowlist=allowlist)
+        verdict, token = handle_match.match_results(results, expected, bound, HANDLE_MIN_CONF)
+        if verdict in ("match", "near"):
+            results = reader.recognize(arr, horizontal_list=[box], free_list=[], detail=1, allowlist=_ALLOWLIST_HANDLE)
+            verdict, token = handle_match.match_results(results, expected, 0, HANDLE_MIN_CONF)
+            if verdict == "match":
+                return verdict, token
+            if token:
+                return "mismatch", token
+    if not lines:
+        return None, None
+    results = reader.recognize(arr, horizontal_list=lines, free_list=[], detail=1, allowlist=_ALLOWLIST_HANDLE)
+    token = handle_match.first_token(results)
+    if not token:
+        return None, None
+    return ("match" if token.lower() == expected.lower() else "mismatch"), token
+
+async def _fast_verify_handle(img, project, expected: str):
+    """
+    Targeted identity check: is @expected in the handle ROIs? Returns ("match", token) with the
+    token as read, ("mismatch", token) after the first ROI showing a different handle, or
+    (None, None) when no ROI shows a handle at all.
+    """
+    if not _PIL_OK or not FAST_OCR or not expected:
+        return None, None
+    bound = handle_match.max_edits(expected, HANDLE_MAX_EDITS)
+    mode = preprocess_mode(project, "handle")
+    try:
+        for roi in _handle_rois(project, img):
+            verdict, token = await asyncio.to_thread(_verify_handle_crop, img, roi, mode, expected, bound)
+            if verdict:
+                return verdict, token
+    except Exception:
+        return None, None
+    return None, None
+
+async def _resolve_handle(img, project, expected: str | None = None):
+    """
+    The handle read from the screenshot, to compare against the linked one. With `expected`
+    known, the targeted check settles it (its per-crop open read already covers handles that
+    aren't expected); the separate open-ended read is only for callers without one.
+    """
+    if expected:
+        _verdict, token = await _fast_verify_handle(img, project, expected)
+        return token
+    return await _fast_extract_handle(img, project)
+
+def _score_from_results(results, project):
+    """(score_or_None, calibrated_confidence) from detail=1 OCR results of a score crop."""
+    score = _best_number_from_texts([r[1] for r in results], project)
+    if not score:
+        return None, 0.0
+    return score, calibrate_confidence(project, score_confidence_raw(results, score))
+
 async def _fast_extract_score(img, project):
+    """
+    Try the project's score ROIs in order, each through its routed backends (cheapest first);
+    stop at the first confident read. Returns (score, conf).
+    """
     if not _PIL_OK or not FAST_OCR:
-        return None
-    rois = SCORE_ROIS.get(project) or []
+        return None, 0.0
+    best, best_conf = None, 0.0
+    threshold = score_threshold(project)
+    rois = _score_rois(project, img)
+    backends = OCR_ROUTER.backends_for("score", project)
+    mode = preprocess_mode(project, "score")
     for roi in rois:
-        try:
-            crop = _crop_ratio(img, roi)
-            texts = await _readtext_detail0(crop, allowlist=_ALLOWLIST_NUM)
-            score = _best_number_from_texts(texts, project)
-            if score:
-                return score
-        except Exception:
-            continue
-    return None
-
-async def detect_project_score_and_handle(image_bytes: bytes, project_hint: str | None = None):
+        crop = _crop_ratio(img, roi)
+        for backend in backends:
+            try:
+                results = await _readtext_detail1(crop, allowlist=_ALLOWLIST_NUM, backend=backend, mode=mode)
+            except Exception:
+                continue
+            score, conf = _score_from_results(results, project)
+            if score and conf > best_conf:
+                best, best_conf = score, conf
+            if best_conf >= threshold:
+                preprocess.record_outcome(mode, True)
+                return best, best_conf
+    preprocess.record_outcome(mode, False)
+    return best, best_conf
+
+async def detect_project_score_and_handle(image_bytes: bytes, project_hint: str | None = None,
+                                          expected_handle: str | None = None):
     """
     ROI fast path:
       - decode bytes with Pillow
       - downscale large images
       - detect project (unless hint given)
-      - extract score and handle from small crops
-    Returns: (pil_img_or_None, project, score_or_None, handle_or_None, used_fast_bool)
+      - extract score and handle from small crops (checked against expected_handle when given)
+    Returns: (pil_img_or_None, project, score_or_None, handle_or_None, used_fast_bool, score_conf)
+    used_fast is only True when the score's confidence clears the project threshold.
     """
     if not _PIL_OK or not FAST_OCR:
-        return None, "Unknown", None, None, False
+        return None, "Unknown", None, None, False, 0.0
 
     try:
         img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
     except Exception:
-        return None, "Unknown", None, None, False
+        return None, "Unknown", None, None, False, 0.0
 
     img = _downscale_image(img)
 
@@ -296,20 +692,204 @@ async def detect_project_score_and_handle(image_bytes: bytes, project_hint: str
     else:
         proj = await _fast_detect_project(img)
 
-    score = None
+    score, conf = None, 0.0
     if proj != "Unknown":
-        score = await _fast_extract_score(img, proj)
+        score, conf = await _fast_extract_score(img, proj)
+
+    handle = await _resolve_handle(img, proj, expected_handle)
+    used_fast = (proj != "Unknown" and score is not None and conf >= score_threshold(proj))
+    return img, proj, score, handle, used_fast, conf
+
+
+# ============================================================
+# Batched fast path (several screenshots in one /verify)
+# ============================================================
+_MOSAIC_GAP = 24
+_MOSAIC_BG = (127, 127, 127)
+
+def _decode_image(image_bytes: bytes):
+    try:
+        return _downscale_image(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+    except Exception:
+        return None
+
+async def _readtext_tiles(tiles, allowlist):
+    """
+    Stack crops into one vertical mosaic and OCR it in a single readtext call,
+    so detection runs once and recognition batches every box. Returns (bbox, text, prob) per tile.
+    """
+    width = max(t.size[0] for t in tiles)
+    offsets, y = [], 0
+    for t in tiles:
+        offsets.append(y)
+        y += t.size[1] + _MOSAIC_GAP
+    height = y - _MOSAIC_GAP
+
+    def _run():
+        canvas = Image.new("RGB", (width, height), color=_MOSAIC_BG)
+        for t, oy in zip(tiles, offsets):
+            canvas.paste(t, (0, oy))
+        return reader.readtext(
+            np.array(canvas), detail=1, paragraph=False, allowlist=allowlist, decoder="greedy",
+            batch_size=max(1, 4 * len(tiles)), canvas_size=max(2560, width, height), mag_ratio=1.0
+        )
+    results = await asyncio.to_thread(_run)
+
+    per_tile = [[] for _ in tiles]
+    for bbox, text, prob in results:
+        cy = (bbox[0][1] + bbox[2][1]) / 2.0
+        idx = 0
+        for i, oy in enumerate(offsets):
+            if cy >= oy:
+                idx = i
+        per_tile[idx].append((bbox, text, prob))
+    return per_tile
+
+async def detect_batch(blobs: list[bytes], project_hint: str | None = None, expected_handle: str | None = None):
+    """
+    Batched version of detect_project_score_and_handle for several screenshots.
+    Decodes concurrently, then runs one mosaic OCR pass for project detection (Auto only)
+    and one each for all first-choice score ROIs and handle ROIs (each with its own allowlist).
+    Anything the batch misses falls back
+    to the per-image ROI helpers. Returns one tuple per blob, same shape as the single path.
+    """
+    if not _PIL_OK or not FAST_OCR:
+        return [(None, "Unknown", None, None, False, 0.0) for _ in blobs]
+
+    imgs = await asyncio.gather(*(asyncio.to_thread(_decode_image, b) for b in blobs))
+    live = [i for i, img in enumerate(imgs) if img is not None]
+
+    hint = (project_hint or "").strip()
+    projects = ["Unknown"] * len(blobs)
+    if hint and hint.lower() != "auto":
+        for i in live:
+            projects[i] = hint
+    elif live:
+        try:
+            texts = await _readtext_tiles(
+                [_crop_ratio(imgs[i], PROJECT_DETECT_ROIS[0]) for i in live],
+                allowlist=_ALLOWLIST_HANDLE + _ALLOWLIST_NUM
+            )
+            for i, t in zip(live, texts):
+                projects[i] = _project_from_blob(" ".join(r[1] for r in t).lower())
+        except Exception:
+            pass
+        for i in live:
+            if projects[i] == "Unknown":
+                projects[i] = await _fast_detect_project(imgs[i])
+
+    scores = [None] * len(blobs)
+    confs = [0.0] * len(blobs)
+    handles = [None] * len(blobs)
+    score_tiles, score_owners = [], []
+    for i in live:
+        rois = _score_rois(projects[i], imgs[i])
+        if projects[i] != "Unknown" and rois:
+            crop = _crop_ratio(imgs[i], rois[0])
+            # Cheap non-EasyOCR backends run per crop; only misses join the mosaic
+            for backend in OCR_ROUTER.backends_for("score", projects[i]):
+                if backend.name == "easyocr":
+                    break
+                try:
+                    results = await _readtext_detail1(crop, allowlist=_ALLOWLIST_NUM, backend=backend,
+                                                      mode=preprocess_mode(projects[i], "score"))
+                    scores[i], confs[i] = _score_from_results(results, projects[i])
+                except Exception:
+                    pass
+                if confs[i] >= score_threshold(projects[i]):
+                    break
+            if confs[i] < score_threshold(projects[i]):
+                score_tiles.append(crop)
+                score_owners.append(i)
+    if score_tiles:
+        try:
+            texts = await _readtext_tiles(score_tiles, allowlist=_ALLOWLIST_NUM)
+            for i, t in zip(score_owners, texts):
+                score, conf = _score_from_results(t, projects[i])
+                if conf > confs[i]:
+                    scores[i], confs[i] = score, conf
+        except Exception:
+            pass
+    if live:
+        try:
+            texts = await _readtext_tiles(
+                [_crop_ratio(imgs[i], _handle_rois(projects[i], imgs[i])[0]) for i in live],
+                allowlist=_ALLOWLIST_HANDLE
+            )
+            for i, t in zip(live, texts):
+                handles[i] = extract_handle(t)
+        except Exception:
+            pass
 
-    handle = await _fast_extract_handle(img)
-    used_fast = (proj != "Unknown" and score is not None)
-    return img, proj, score, handle, used_fast
+    out = []
+    for i, img in enumerate(imgs):
+        if img is None:
+            out.append((None, "Unknown", None, None, False, 0.0))
+            continue
+        if projects[i] != "Unknown" and confs[i] < score_threshold(projects[i]):
+            score, conf = await _fast_extract_score(img, projects[i])
+            if conf > confs[i]:
+                scores[i], confs[i] = score, conf
+        if handles[i] is None:
+            handles[i] = await _resolve_handle(img, projects[i], expected_handle)
+        used_fast = (projects[i] != "Unknown" and scores[i] is not None and confs[i] >= score_threshold(projects[i]))
+        out.append((img, projects[i], scores[i], handles[i], used_fast, confs[i]))
+    return out
+
+
+# ============================================================
+# Screenshot reuse detection (perceptual hash index)
+# ============================================================
+PHASH_INDEX = image_hash.BKTree()
+_phash_last_id = 0
+_phash_refreshed_at = None
+
+async def load_phash_index(page_size: int = 5000):
+    """
+    Add stored attempts newer than the last load to the in-memory BK-tree. Reads STORAGE, so
+    with a shared store the index also picks up other shards' uploads (re-adding is a no-op).
+    """
+    global _phash_last_id, _phash_refreshed_at
+    first = _phash_refreshed_at is None
+    while True:
+        rows = await STORAGE.get_phash_page(_phash_last_id, page_size)
+        for _id, discord_id, phash_hex in rows:
+            h = image_hash.from_hex(phash_hex)
+            if h is not None:
+                PHASH_INDEX.add(h, discord_id)
+        if rows:
+            _phash_last_id = max(_phash_last_id, rows[-1][0])
+        if len(rows) < page_size:
+            break
+    _phash_refreshed_at = time.monotonic()
+    if first:
+        print(f"Perceptual hash index loaded ({PHASH_INDEX.size} hashes).")
+
+async def refresh_phash_index():
+    if _phash_refreshed_at is not None and time.monotonic() - _phash_refreshed_at < PHASH_REFRESH_SECONDS:
+        return
+    try:
+        await load_phash_index()
+    except Exception as e:
+        print(f"[phash] index refresh failed: {e}")
+
+def check_screenshot_reuse(pil_img, discord_id: str, phash: int | None = None):
+    """
+    Hash the decoded screenshot (or use a hash computed by an OCR node) and look for a
+    near-duplicate from another account.
+    Returns (phash_int_or_None, (other_discord_id, distance) or None).
+    """
+    h = phash if phash is not None else image_hash.dhash(pil_img)
+    if h is None:
+        return None, None
+    dup = PHASH_INDEX.find_other_owner(h, discord_id, PHASH_MAX_DISTANCE)
+    PHASH_INDEX.add(h, discord_id)
+    return h, dup
 
 
 # ============================================================
 # Helper: atomic JSON (kept for compatibility)
 # ============================================================
-STORE_LOCK = asyncio.Lock()
-PENDING_FILE = "oauth_pending.json"
 PENDING_TTL_SECONDS = 10 * 60  # 10 minutes
 
 def _load_json_sync(path: str) -> dict:
@@ -335,42 +915,21 @@ def _atomic_write_json_sync(path: str, data: dict):
         except:
             pass
 
-async def _cleanup_pending_locked(pending: dict) -> dict:
-    now = int(time.time())
-    cleaned = {}
-    for state, obj in pending.items():
-        created_at = int(obj.get("created_at", 0))
-        if now - created_at <= PENDING_TTL_SECONDS:
-            cleaned[state] = obj
-    return cleaned
-
+# OAuth pending state lives in STORAGE (oauth_pending table) so any replica can finish the flow
 async def pending_put(state: str, discord_id: str, code_verifier: str):
-    async with STORE_LOCK:
-        pending = _load_json_sync(PENDING_FILE)
-        pending = await _cleanup_pending_locked(pending)
-        pending[state] = {
-            "discord_id": discord_id,
-            "code_verifier": code_verifier,
-            "created_at": int(time.time())
-        }
-        _atomic_write_json_sync(PENDING_FILE, pending)
+    await STORAGE.pending_put(state, discord_id, code_verifier, ttl=PENDING_TTL_SECONDS)
 
 async def pending_pop(state: str):
-    async with STORE_LOCK:
-        pending = _load_json_sync(PENDING_FILE)
-        pending = await _cleanup_pending_locked(pending)
-        obj = pending.pop(state, None)
-        _atomic_write_json_sync(PENDING_FILE, pending)
-        return obj
+    return await STORAGE.pending_pop(state, ttl=PENDING_TTL_SECONDS)
 
 # ============================================================
 # Link store helpers (DB)
 # ============================================================
 async def link_get(discord_id: str):
-    return await database.get_link(discord_id)
+    return await STORAGE.get_link(discord_id)
 
 async def link_delete(discord_id: str):
-    return await database.delete_link(discord_id)
+    return await STORAGE.delete_link(discord_id)
 
 # ============================================================
 # PKCE helpers (for your FastAPI service)
@@ -585,10 +1144,12 @@ def extract_handle(results):
 # Result + Role mapping
 # ============================================================
 class VerificationResult:
-    def __init__(self, detected_score, project="Unknown", handle_match_error=None):
+    def __init__(self, detected_score, project="Unknown", handle_match_error=None, duplicate_of=None):
         self.detected_score = detected_score
         self.project = project
         self.handle_match_error = handle_match_error
+        # (other_discord_id, hamming_distance) if this screenshot was already submitted by another account
+        self.duplicate_of = duplicate_of
         self.role_name = None
 
         if detected_score and not handle_match_error:
@@ -640,13 +1201,50 @@ intents = discord.Intents.default()
 intents.guilds = True
 # We intentionally avoid message_content: we do NOT use public chat commands anymore.
 intents.message_content = False
+intents.members = RECONCILE_ENABLED
+
+_ClientBase = discord.AutoShardedClient if (AUTO_SHARD or SHARD_COUNT or SHARD_IDS) else discord.Client
+
+class VerifierClient(_ClientBase):
+    async def setup_hook(self):
+        # Runs once per process, before the first gateway connect (not on reconnects)
+        await startup()
 
-client = discord.Client(intents=intents)
+_client_kwargs = {}
+if SHARD_COUNT:
+    _client_kwargs["shard_count"] = SHARD_COUNT
+if SHARD_IDS:
+    _client_kwargs["shard_ids"] = SHARD_IDS
+client = VerifierClient(intents=intents, **_client_kwargs)
 tree = discord.app_commands.CommandTree(client)
 
+def cooldown_retry_after(interaction: discord.Interaction, member_key: str, guild_key: str | None = None) -> float:
+    """Seconds until the member (and guild) may run the command again; 0.0 = go ahead."""
+    if not COOLDOWNS_ENABLED:
+        return 0.0
+    member_limit = COOLDOWNS[member_key]
+    wait = member_limit.try_acquire(interaction.user.id)
+    if wait:
+        return wait
+    if guild_key and interaction.guild:
+        wait = COOLDOWNS[guild_key].try_acquire(interaction.guild.id)
+        if wait:
+            # Not the member's fault; give their token back
+            member_limit.refund(interaction.user.id)
+            return wait
+    return 0.0
+
+def _cooldown_message(wait: float) -> str:
+    return f"⏳ Slow down — try again in {max(1, math.ceil(wait))}s."
+
 def _require_verify_channel(interaction: discord.Interaction) -> bool:
     return (VERIFY_CHANNEL_ID == 0) or (interaction.channel_id == VERIFY_CHANNEL_ID)
 
+def _is_admin(interaction: discord.Interaction) -> bool:
+    # Admin commands are also hidden via default_permissions; this re-checks at runtime.
+    perms = getattr(interaction.user, "guild_permissions", None)
+    return bool(perms and (perms.administrator or perms.manage_guild))
+
 async def ensure_tier_roles(guild: discord.Guild) -> dict:
     """
     Ensure the 3 tier roles exist. Returns name->Role for roles that exist/created.
@@ -663,6 +1261,11 @@ async def ensure_tier_roles(guild: discord.Guild) -> dict:
         roles[name] = role
     return roles
 
+RECONCILER = role_reconciler.RoleReconciler(
+    TIER_ROLE_NAMES, ensure_tier_roles, chunk_size=RECONCILE_CHUNK,
+    edits_per_minute=RECONCILE_EDITS_PER_MIN, remove_untracked=RECONCILE_REMOVE_UNTRACKED, store=STORAGE
+)
+
 async def assign_tier_role(member: discord.Member, role_name: str) -> tuple[bool, str]:
     """
     Removes other tier roles and assigns role_name.
@@ -735,6 +1338,13 @@ def build_result_embed(member: discord.Member, x_link: dict | None, result: Veri
         embed.add_field(name="🎯 Score", value=f"`{result.detected_score}`", inline=True)
     if result.role_name:
         embed.add_field(name="🎭 Role", value=f"`{result.role_name}`", inline=True)
+    if result.duplicate_of:
+        other_id, dist = result.duplicate_of
+        embed.add_field(
+            name="⚠️ Reused Screenshot",
+            value=f"A near-identical screenshot was already submitted by <@{other_id}> (distance {dist}).",
+            inline=False
+        )
 
     if x_link:
         x_user = x_link.get("x_username")
@@ -756,6 +1366,10 @@ def build_result_embed(member: discord.Member, x_link: dict | None, result: Veri
 async def xlink_cmd(interaction: discord.Interaction):
     if not interaction.user:
         return
+    wait = cooldown_retry_after(interaction, "xlink_member")
+    if wait:
+        await interaction.response.send_message(_cooldown_message(wait), ephemeral=True)
+        return
     link = await create_signed_start_link(str(interaction.user.id))
     embed, view = build_link_embed(link)
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
@@ -776,8 +1390,302 @@ async def xunlink_cmd(interaction: discord.Interaction):
     removed = await link_delete(str(interaction.user.id))
     await interaction.response.send_message("✅ Unlinked." if removed else "You were not linked.", ephemeral=True)
 
-@tree.command(name="verify", description="Upload a screenshot for verification (ephemeral)")
-@discord.app_commands.describe(image="Upload a screenshot (PNG/JPG)", project="Which dashboard is in the screenshot (Auto recommended)")
+@tree.command(name="ocrstatus", description="Admin: show the OCR concurrency controller state")
+@discord.app_commands.default_permissions(manage_guild=True)
+async def ocrstatus_cmd(interaction: discord.Interaction):
+    if not _is_admin(interaction):
+        await interaction.response.send_message("This command is for server admins.", ephemeral=True)
+        return
+    st = OCR_SEMAPHORE.state()
+    lines = [f"`{k}`: {v}" for k, v in st.items()]
+    costs = OCR_COSTS.state()
+    lines.append(f"**Job cost model** (full OCR {costs['full_s_per_mp']}s/MP)")
+    lines += [f"`{h}`: fast-path hit rate {v['hit_rate']}, fast {v['fast_s']}s ({v['jobs']} screenshots)"
+              for h, v in costs["hints"].items()]
+    pp = preprocess.summary()
+    if pp:
+        lines.append("**Preprocessing**")
+        lines += [f"`{m}`: {v['avg_ms']}ms avg, hit rate {v['hit_rate']} ({v['attempts']} reads)" for m, v in pp.items()]
+    if COOLDOWNS_ENABLED:
+        lines.append("**Cooldowns**")
+        lines += [
+            f"`{k}`: {v['rejected']} rejected / {v['allowed']} allowed, {v['keys']} keys"
+            for k, v in ((k, lim.state()) for k, lim in COOLDOWNS.items()) if v["rate_per_min"]
+        ]
+    if OCR_NODES.nodes:
+        ns = OCR_NODES.state()
+        lines.append(f"**OCR nodes** (local fallbacks: {ns['local_fallbacks']})")
+        lines += [
+            f"`{x['url']}`: {'up' if x['healthy'] else 'DOWN'}, {x['outstanding']} in flight, "
+            f"{x['served']} served, {x['latency_ms']}ms" + (f", last error: {x['last_error']}" if not x["healthy"] else "")
+            for x in ns["nodes"]
+        ]
+    if OCR_WORKERS > 0:
+        ws = reader.state()
+        lines.append(f"**OCR workers** (recycled: {ws['recycled']}, peak RSS {ws['peak_rss_mb']}MB)")
+        if ws["host"]:
+            h = ws["host"]
+            lines.append(f"model host `{h['pid']}`: rss {h['rss_mb']}MB, weights loaded in {h['load_s']}s")
+        lines += [
+            f"`{w['pid']}`: {w['jobs']} jobs, rss {w['rss_mb']}MB (private {w['private_mb']}MB), "
+            f"peak {w['peak_rss_mb']}MB, age {w['age_s']}s"
+            + (" (retiring)" if w["retiring"] else "")
+            for w in ws["workers"]
+        ]
+    await interaction.response.send_message("**OCR limiter**\n" + "\n".join(lines), ephemeral=True)
+
+@tree.command(name="profile", description="Admin: profile the next N /verify requests")
+@discord.app_commands.describe(count="Number of upcoming /verify requests to profile (0 disarms)")
+@discord.app_commands.default_permissions(manage_guild=True)
+async def profile_cmd(interaction: discord.Interaction, count: int = 1):
+    if not _is_admin(interaction):
+        await interaction.response.send_message("This command is for server admins.", ephemeral=True)
+        return
+    PROFILER.arm(min(max(0, count), 50))
+    await interaction.response.send_message(
+        f"Profiler armed for the next **{PROFILER.armed}** /verify request(s). "
+        f"Slow threshold: {PROFILE_SLOW_MS or 'off'}{'ms' if PROFILE_SLOW_MS else ''}. Output: `{PROFILE_DIR}/`",
+        ephemeral=True
+    )
+
+@tree.command(name="stats", description="Admin: verification stats for this server")
+@discord.app_commands.describe(days="How many recent days to show (default 7)")
+@discord.app_commands.default_permissions(manage_guild=True)
+async def stats_cmd(interaction: discord.Interaction, days: int = 7):
+    if not interaction.guild or not _is_admin(interaction):
+        await interaction.response.send_message("This command is for server admins.", ephemeral=True)
+        return
+    st = await STORAGE.get_guild_stats(str(interaction.guild.id), days=min(max(1, days), 31))
+
+    embed = discord.Embed(title="📊 Verification Stats", color=0x5865F2)
+    if st["projects"]:
+        lines = []
+        for name, p in sorted(st["projects"].items(), key=lambda kv: -kv[1]["attempts"]):
+            lines.append(f"**{name}**: {p['attempts']} attempts, {p['scored']} scored, {p['success_rate']:.0%} got a role")
+        embed.add_field(name="Projects (all time)", value="\n".join(lines)[:1024], inline=False)
+    else:
+        embed.add_field(name="Projects (all time)", value="*No attempts yet*", inline=False)
+
+    tiers = st["tier_distribution"]
+    embed.add_field(
+        name="Current tiers",
+        value="\n".join(f"`{n}`: {tiers.get(n, 0)}" for n in TIER_ROLE_NAMES),
+        inline=False
+    )
+
+    if st["daily"]:
+        lines = []
+        for day, per_project in sorted(st["daily"].items(), reverse=True):
+            total = sum(v["attempts"] for v in per_project.values())
+            breakdown = ", ".join(f"{k} {v['attempts']}" for k, v in per_project.items())
+            lines.append(f"`{day}`: {total} ({breakdown})")
+        embed.add_field(name=f"Last {st['days']} days", value="\n".join(lines)[:1024], inline=False)
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+# Manual passes started from /reconcile, by guild id; a task drops itself when done
+_reconcile_tasks = {}
+
+@tree.command(name="reconcile", description="Admin: re-sync tier roles with recorded verifications")
+@discord.app_commands.default_permissions(manage_guild=True)
+async def reconcile_cmd(interaction: discord.Interaction):
+    if not interaction.guild or not _is_admin(interaction):
+        await interaction.response.send_message("This command is for server admins.", ephemeral=True)
+        return
+    last = RECONCILER.last.get(interaction.guild.id)
+    summary = ""
+    if last:
+        summary = (f"\nLast pass: {last['scanned']} scanned, {last['differing']} differing, "
+                   f"{last['edited']} edited, {last['failed']} failed, {last['untracked']} untracked"
+                   + (" (complete)" if last.get("complete") else " (partial, will resume)")
+                   + (f" — {last['error']}" if last.get("error") else ""))
+    if not RECONCILE_ENABLED:
+        await interaction.response.send_message(
+            "Role reconciliation is disabled (set `RECONCILE_ENABLED=1` and enable the Server Members intent)." + summary,
+            ephemeral=True
+        )
+        return
+    guild_id = interaction.guild.id
+    if guild_id in RECONCILER.running or guild_id in _reconcile_tasks:
+        await interaction.response.send_message("A reconciliation pass is already running." + summary, ephemeral=True)
+        return
+    task = asyncio.create_task(RECONCILER.reconcile_guild(interaction.guild))
+    _reconcile_tasks[guild_id] = task
+    task.add_done_callback(lambda _t: _reconcile_tasks.pop(guild_id, None))
+    await interaction.response.send_message("Reconciliation pass started." + summary, ephemeral=True)
+
+@tree.command(name="export", description="Admin: download this server's verification history")
+@discord.app_commands.describe(format="csv or ndjson", days="Only the last N days (0 = everything)")
+@discord.app_commands.choices(format=[
+    discord.app_commands.Choice(name="CSV", value="csv"),
+    discord.app_commands.Choice(name="NDJSON", value="ndjson"),
+])
+@discord.app_commands.default_permissions(manage_guild=True)
+async def export_cmd(interaction: discord.Interaction, format: discord.app_commands.Choice[str] | None = None, days: int = 0):
+    if not interaction.guild or not _is_admin(interaction):
+        await interaction.response.send_message("This command is for server admins.", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    fmt = format.value if format else "csv"
+    since_ts = int(time.time()) - days * 86400 if days > 0 else None
+
+    # Stream chunks into a gzip temp file so memory stays flat regardless of history size
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=f".{fmt}.gz")
+    os.close(fd)
+    try:
+        with gzip.open(path, "wt", encoding="utf-8", newline="") as gz:
+            async for chunk in history_export.export_chunks(str(interaction.guild.id), fmt, since_ts=since_ts, store=STORAGE):
+                await asyncio.to_thread(gz.write, chunk)
+        size = os.path.getsize(path)
+        if size > interaction.guild.filesize_limit:
+            await interaction.followup.send(
+                f"Export is {size / 1e6:.1f}MB (compressed), over this server's upload limit. "
+                f"Use the `/api/export?guild_id={interaction.guild.id}` endpoint of the verify service instead "
+                "(needs its ADMIN_API_TOKEN).",
+                ephemeral=True
+            )
+            return
+        name = f"verifications-{interaction.guild.id}-{time.strftime('%Y%m%d')}.{fmt}.gz"
+        await interaction.followup.send(file=discord.File(path, filename=name), ephemeral=True)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _token_bbox(results, value: str, handle: bool = False):
+    """Box of the full-OCR token that produced an extracted score/handle."""
+    want = str(value).replace(",", "").strip().lower()
+    for (bbox, text, prob) in results:
+        t = text.strip()
+        if handle:
+            if t.startswith("@") and t.lstrip("@").strip().strip(".,;:!)]}(").lower() == want:
+                return bbox
+        elif t.replace(",", "").lower() == want:
+            return bbox
+    return None
+
+async def learn_rois_from_full_ocr(pil_img, project: str, results, score_val, img_handle):
+    """Record where full OCR found the score/handle so the fast path can look there next time."""
+    if pil_img is None or not results or project == "Unknown":
+        return
+    found = []
+    if score_val:
+        found.append(("score", _token_bbox(results, score_val)))
+    if img_handle:
+        found.append(("handle", _token_bbox(results, img_handle, handle=True)))
+    for kind, bbox in found:
+        if bbox is None:
+            continue
+        row = LEARNED_ROIS.observe(project, kind, pil_img.size, bbox)
+        try:
+            await database.save_learned_roi(row)
+        except Exception as e:
+            print(f"[roi] failed to persist learned ROI: {e}")
+
+def needs_full_ocr(project_hint: str, fast: tuple) -> bool:
+    used_fast, proj_fast = fast[4], fast[1]
+    return (not used_fast) or (project_hint != "auto" and proj_fast == "Unknown")
+
+def ocr_job(project_hint: str, sizes: list):
+    """An OCR_SEMAPHORE slot ranked by the predicted cost of these screenshots."""
+    cost = OCR_COSTS.estimate(project_hint, sizes)
+    heavy = OCR_COSTS.miss_probability(project_hint) >= OCR_HEAVY_MISS_RATE
+    return OCR_SEMAPHORE.job(cost, heavy=heavy)
+
+async def record_ocr_costs(project_hint: str, sizes: list, fast_s: float, fasts: list, full_s: list):
+    """Feed finished screenshots back into OCR_COSTS; persisted every few dozen jobs."""
+    for size, fast, full in zip(sizes, fasts, full_s):
+        OCR_COSTS.observe(project_hint, size, fast_s, not needs_full_ocr(project_hint, fast), full)
+    if OCR_COSTS.dirty >= 25:
+        try:
+            await database.set_meta("ocr_cost_model", OCR_COSTS.snapshot())
+        except Exception as e:
+            print(f"[ocr-cost] failed to persist cost model: {e}")
+
+async def complete_with_full_ocr(image_bytes: bytes, project_hint: str, fast: tuple):
+    """
+    Take a fast-path tuple and, if it didn't confidently extract, fall back to
+    full-image OCR (your existing logic). Returns (pil_img, project, score, handle).
+    """
+    pil_img, proj_fast, score_fast, handle_fast, used_fast, score_conf = fast
+
+    results = None
+    project_name = proj_fast
+
+    # If fast path didn't succeed, do full OCR on the downscaled image (if we decoded it),
+    # otherwise on raw bytes.
+    if needs_full_ocr(project_hint, fast):
+        def _full_run():
+            if _PIL_OK and pil_img is not None:
+                return _readtext_coarse_to_fine(pil_img)
+            return reader.readtext(image_bytes)
+        results = await asyncio.to_thread(_full_run)
+        if project_hint != "auto":
+            project_name = project_hint
+        else:
+            project_name = classify_project(results)
+
+    # Decide which score to use
+    if used_fast and score_fast is not None and project_name != "Unknown":
+        score_val = score_fast
+    else:
+        # Extract score using your existing rules from full OCR results
+        score_val = None
+        if results is None:
+            score_val = None
+        else:
+            if project_name == "Wallchain":
+                score_val = extract_wallchain_score(results)
+            elif project_name == "Kaito":
+                score_val = extract_kaito_score(results)
+            elif project_name == "Xeet":
+                score_val = extract_xeet_score(results)
+            elif project_name == "Cookie":
+                score_val = extract_cookie_score(results)
+            elif project_name == "Mindoshare":
+                score_val = extract_mindoshare_score(results)
+            else:
+                score_val = extract_mindoshare_score(results) or extract_wallchain_score(results) or extract_kaito_score(results)
+
+        # Full OCR found nothing: keep a low-confidence fast read only if it isn't junk
+        if score_val is None and score_fast is not None and project_name == proj_fast and score_conf >= SCORE_MIN_CONFIDENCE:
+            score_val = score_fast
+
+    # Handle extraction: prefer fast handle, fallback to full if needed
+    img_handle = handle_fast
+    if img_handle is None and results is not None:
+        img_handle = extract_handle(results)
+
+    if results is not None:
+        # Only tokens actually present in the full-OCR results are learned
+        await learn_rois_from_full_ocr(pil_img, project_name, results, score_val, img_handle)
+
+    return pil_img, project_name, score_val, img_handle
+
+def _tier_rank(role_name: str | None) -> int:
+    return TIER_ROLE_NAMES.index(role_name) if role_name in TIER_ROLE_NAMES else -1
+
+def add_screenshot_breakdown(embed: discord.Embed, results: list[VerificationResult]):
+    lines = []
+    for n, r in enumerate(results, start=1):
+        if r.handle_match_error:
+            status = "identity mismatch"
+        elif r.detected_score:
+            status = f"`{r.detected_score}` → {r.role_name or 'no tier'}"
+        else:
+            status = "no score found"
+        lines.append(f"**#{n}** {r.project}: {status}")
+    embed.add_field(name="📸 Screenshots", value="\n".join(lines)[:1024], inline=False)
+
+@tree.command(name="verify", description="Upload one or more screenshots for verification (ephemeral)")
+@discord.app_commands.describe(
+    image="Upload a screenshot (PNG/JPG)",
+    project="Which dashboard is in the screenshot(s) (Auto recommended)",
+    image2="Optional: another dashboard screenshot",
+    image3="Optional: another dashboard screenshot",
+    image4="Optional: another dashboard screenshot",
+)
 @discord.app_commands.choices(project=[
     discord.app_commands.Choice(name="Auto", value="auto"),
     discord.app_commands.Choice(name="Cookie", value="Cookie"),
@@ -786,7 +1694,14 @@ async def xunlink_cmd(interaction: discord.Interaction):
     discord.app_commands.Choice(name="Wallchain", value="Wallchain"),
     discord.app_commands.Choice(name="Mindoshare", value="Mindoshare"),
 ])
-async def verify_cmd(interaction: discord.Interaction, image: discord.Attachment, project: discord.app_commands.Choice[str] | None = None):
+async def verify_cmd(
+    interaction: discord.Interaction,
+    image: discord.Attachment,
+    project: discord.app_commands.Choice[str] | None = None,
+    image2: discord.Attachment | None = None,
+    image3: discord.Attachment | None = None,
+    image4: discord.Attachment | None = None,
+):
     # Must be used in a guild
     if not interaction.guild or not isinstance(interaction.user, discord.Member):
         await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
@@ -796,7 +1711,8 @@ async def verify_cmd(interaction: discord.Interaction, image: discord.Attachment
         await interaction.response.send_message("Please use `/verify` in the designated verification channel.", ephemeral=True)
         return
 
-    if not (image.content_type and image.content_type.startswith("image/")):
+    attachments = [a for a in (image, image2, image3, image4) if a is not None]
+    if not all(a.content_type and a.content_type.startswith("image/") for a in attachments):
         await interaction.response.send_message("Please upload a valid image file.", ephemeral=True)
         return
 
@@ -808,131 +1724,286 @@ async def verify_cmd(interaction: discord.Interaction, image: discord.Attachment
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         return
 
+    # Cooldowns before anything costly (defer, download, OCR slot), but after the cheap
+    # rejections above, so a wrong channel, file type or missing link costs no token
+    wait = cooldown_retry_after(interaction, "verify_member", "verify_guild")
+    if wait:
+        await interaction.response.send_message(_cooldown_message(wait), ephemeral=True)
+        return
+
+    capturing = CAPTURE.should_sample()
+
     # Immediately acknowledge (ephemeral)
     await interaction.response.defer(ephemeral=True, thinking=True)
 
+    prof = None
     try:
-        image_bytes = await image.read()
+        # Started only once the interaction is acknowledged, so finally always ends the session
+        prof = PROFILER.start(f"verify-{interaction.user.id}")
+        t0 = time.perf_counter()
+        blobs = await asyncio.gather(*(a.read() for a in attachments))
+        t_read = time.perf_counter()
 
         project_hint = (project.value if project else "auto")
+        required_handle = (x_link.get("x_username") or "").lower()
 
-        # Concurrency limiter: avoid melting CPU under load.
-        # Inside the semaphore we try a fast ROI-based path first; if it can't confidently extract,
-        # we fall back to full-image OCR (your existing logic).
-        async with OCR_SEMAPHORE:
-            pil_img, proj_fast, score_fast, handle_fast, used_fast = await detect_project_score_and_handle(
-                image_bytes,
-                project_hint=project_hint
-            )
+        n = len(blobs)
+        fast_all, analyses, full_ms, node_hashes = [None] * n, [None] * n, [0.0] * n, [None] * n
 
-            results = None
-            project_name = proj_fast
-
-            # If fast path didn't succeed, do full OCR on the downscaled image (if we decoded it),
-            # otherwise on raw bytes.
-            if (not used_fast) or (project_hint != "auto" and proj_fast == "Unknown"):
-                def _full_run():
-                    if _PIL_OK and pil_img is not None:
-                        return reader.readtext(np.array(pil_img))
-                    return reader.readtext(image_bytes)
-                results = await asyncio.to_thread(_full_run)
-                if project_hint != "auto":
-                    project_name = project_hint
-                else:
-                    project_name = classify_project(results)
+        # Remote OCR nodes first (if configured); whatever they can't take runs locally
+        remote = [None] * n
+        if OCR_NODES.nodes:
+            remote = await asyncio.gather(*(OCR_NODES.analyze(b, project_hint, required_handle) for b in blobs))
+        for i, r in enumerate(remote):
+            if r is None:
+                continue
+            if r.get("error"):
+                # The node couldn't decode it; local OCR wouldn't either, so it reads as nothing
+                print(f"[verify] {r['node']} rejected screenshot {i + 1}: {r['error']}")
+                fast_all[i] = (None, "Unknown", None, None, False, 0.0)
+                analyses[i] = (None, "Unknown", None, None)
+                continue
+            fast_all[i] = (None, r["project"], r["score"], r["handle"], r["used_fast"], r["conf"])
+            analyses[i] = (None, r["project"], r["score"], r["handle"])
+            full_ms[i] = r.get("elapsed_ms", 0.0)
+            node_hashes[i] = image_hash.from_hex(r.get("phash"))
+        local = [i for i in range(n) if analyses[i] is None]
+        t_acquired = t_fast = time.perf_counter()
 
-            # Decide which score to use
-            if used_fast and score_fast is not None and project_name != "Unknown":
-                score_val = score_fast
-            else:
-                # Extract score using your existing rules from full OCR results
-                score_val = None
-                if results is None:
-                    score_val = None
+        # Concurrency limiter: avoid melting CPU under load.
+        # Inside the semaphore we try a fast ROI-based path first (batched across screenshots);
+        # if it can't confidently extract, we fall back to full-image OCR per screenshot.
+        if local:
+            # Attachment metadata carries the dimensions; fall back to the image header
+            sizes = [
+                (attachments[i].width, attachments[i].height) if attachments[i].width else ocr_cost.image_size(blobs[i])
+                for i in local
+            ]
+            async with ocr_job(project_hint, sizes) as job:
+                t_acquired = time.perf_counter()
+                if len(local) == 1:
+                    local_fast = [await detect_project_score_and_handle(
+                        blobs[local[0]], project_hint=project_hint, expected_handle=required_handle
+                    )]
                 else:
-                    if project_name == "Wallchain":
-                        score_val = extract_wallchain_score(results)
-                    elif project_name == "Kaito":
-                        score_val = extract_kaito_score(results)
-                    elif project_name == "Xeet":
-                        score_val = extract_xeet_score(results)
-                    elif project_name == "Cookie":
-                        score_val = extract_cookie_score(results)
-                    elif project_name == "Mindoshare":
-                        score_val = extract_mindoshare_score(results)
-                    else:
-                        score_val = extract_mindoshare_score(results) or extract_wallchain_score(results) or extract_kaito_score(results)
-
-            # Handle extraction: prefer fast handle, fallback to full if needed
-            img_handle = handle_fast
-            if img_handle is None and results is not None:
-                img_handle = extract_handle(results)
-
-        project = project_name
-        # Handle / identity check
-        handle_error = None
-        required_handle = (x_link.get("x_username") or "").lower()
-        if img_handle and img_handle.lower() != required_handle:
-            handle_error = f"Found @{img_handle} in image, but your linked account is @{required_handle}"
+                    local_fast = await detect_batch(
+                        [blobs[i] for i in local], project_hint=project_hint, expected_handle=required_handle
+                    )
+                t_fast = time.perf_counter()
+                for i, fast in zip(local, local_fast):
+                    if needs_full_ocr(project_hint, fast):
+                        job.promote()
+                    t_full = time.perf_counter()
+                    fast_all[i] = fast
+                    analyses[i] = await complete_with_full_ocr(blobs[i], project_hint, fast)
+                    full_ms[i] = (time.perf_counter() - t_full) * 1000.0
+            await record_ocr_costs(
+                project_hint, sizes, (t_fast - t_acquired) / len(local),
+                local_fast, [full_ms[i] / 1000.0 for i in local],
+            )
 
-        result = VerificationResult(score_val, project, handle_match_error=handle_error)
+        await refresh_phash_index()
+        results, hashes = [], []
+        for (pil_img, project_name, score_val, img_handle), node_hash in zip(analyses, node_hashes):
+            # Handle / identity check
+            handle_error = None
+            if img_handle and img_handle.lower() != required_handle:
+                handle_error = f"Found @{img_handle} in image, but your linked account is @{required_handle}"
+
+            phash, duplicate_of = check_screenshot_reuse(pil_img, str(interaction.user.id), phash=node_hash)
+            if duplicate_of:
+                print(f"[verify] reused screenshot: user={interaction.user.id} matches user={duplicate_of[0]} (distance {duplicate_of[1]})")
+
+            results.append(VerificationResult(score_val, project_name, handle_match_error=handle_error, duplicate_of=duplicate_of))
+            hashes.append(phash)
+
+        # One role decision: the best tier among screenshots without an identity mismatch
+        eligible = [r for r in results if r.role_name and not r.handle_match_error]
+        if eligible:
+            result = max(eligible, key=lambda r: _tier_rank(r.role_name))
+        else:
+            result = next((r for r in results if r.handle_match_error), None) \
+                or next((r for r in results if r.detected_score), results[0])
 
         # Assign role if applicable and no identity mismatch
         role_note = None
+        granted = None
         if result.role_name and not result.handle_match_error:
             ok, msg = await assign_tier_role(interaction.user, result.role_name)
-            if not ok:
+            if ok:
+                granted = result
+            else:
                 role_note = msg
 
-        # Log to DB (always log attempt)
-        await database.log_result(
-            discord_id=str(interaction.user.id),
-            discord_username=str(interaction.user),
-            guild_id=str(interaction.guild.id),
-            project=project,
-            score=str(score_val) if score_val else None,
-            role_assigned=result.role_name
-        )
+        # Log to DB (always log every attempt). role_assigned is only set on the screenshot whose
+        # tier was granted, logged last, so member_latest_tier matches the member's actual role.
+        logged = sorted(zip(results, hashes), key=lambda rh: rh[0] is granted)
+        for r, phash in logged:
+            await STORAGE.log_result(
+                discord_id=str(interaction.user.id),
+                discord_username=str(interaction.user),
+                guild_id=str(interaction.guild.id),
+                project=r.project,
+                score=str(r.detected_score) if r.detected_score else None,
+                role_assigned=r.role_name if r is granted else None,
+                phash=image_hash.to_hex(phash),
+                duplicate_of=r.duplicate_of[0] if r.duplicate_of else None
+            )
 
         embed = build_result_embed(interaction.user, x_link, result)
+        if len(results) > 1:
+            add_screenshot_breakdown(embed, results)
+            if not result.duplicate_of:
+                dup = next((r.duplicate_of for r in results if r.duplicate_of), None)
+                if dup:
+                    embed.add_field(
+                        name="⚠️ Reused Screenshot",
+                        value=f"A near-identical screenshot was already submitted by <@{dup[0]}> (distance {dup[1]}).",
+                        inline=False
+                    )
         if role_note:
             embed.add_field(name="⚠️ Role assignment", value=role_note, inline=False)
 
         await interaction.followup.send(embed=embed, ephemeral=True)
 
+        if capturing:
+            timings = {
+                "read_ms": (t_read - t0) * 1000.0,
+                "queue_ms": (t_acquired - t_read) * 1000.0,
+                "fast_ms": (t_fast - t_acquired) * 1000.0,
+                "total_ms": (time.perf_counter() - t0) * 1000.0,
+            }
+            for i, (image_bytes, fast, (_img, project_name, score_val, img_handle)) in enumerate(zip(blobs, fast_all, analyses)):
+                meta = {
+                    "project_hint": project_hint,
+                    "batch_size": len(blobs),
+                    "timings": dict(timings, full_ms=full_ms[i]),
+                    "used_fast": bool(fast[4]),
+                    "fast_conf": fast[5],
+                    "project": project_name,
+                    "score": str(score_val) if score_val else None,
+                    "handle": img_handle,
+                    "expected_handle": required_handle,
+                }
+                try:
+                    await asyncio.to_thread(CAPTURE.record, image_bytes, meta)
+                except Exception as e:
+                    print(f"[capture] failed to store capture: {e}")
+
     except Exception as e:
         await interaction.followup.send(f"❌ Verification failed: {e}", ephemeral=True)
+    finally:
+        try:
+            await PROFILER.finish(prof)
+        except OSError as e:
+            print(f"[profile] failed to write profile: {e}")
 
 # -----------------------------
-# Events
+# Background maintenance
 # -----------------------------
-@client.event
-async def on_ready():
-    print(f"Logged in as {client.user} (ID: {client.user.id})")
-    await database.init_db()
-    print("Database initialized.")
+_retention_task = None
+
+async def retention_loop():
+    while True:
+        try:
+            deleted = await database.purge_history(RETENTION_DAYS, batch_size=RETENTION_BATCH)
+            free = await database.incremental_vacuum(VACUUM_PAGES)
+            if deleted or free:
+                print(f"[retention] deleted {deleted} history rows older than {RETENTION_DAYS}d, vacuumed up to {min(free, VACUUM_PAGES)} pages")
+        except Exception as e:
+            print(f"[retention] failed: {e}")
+        await asyncio.sleep(RETENTION_INTERVAL_HOURS * 3600)
+
+_reconcile_task = None
+
+async def reconcile_loop():
+    await client.wait_until_ready()
+    while True:
+        for guild in list(client.guilds):
+            try:
+                await RECONCILER.reconcile_guild(guild)
+            except Exception as e:
+                print(f"[reconcile] guild {guild.id} failed: {e}")
+        await asyncio.sleep(RECONCILE_INTERVAL_HOURS * 3600)
 
+# -----------------------------
+# Startup (once per process)
+# -----------------------------
+_warmup_task = None
+
+async def warm_up_ocr():
     # Warm up OCR models (reduces first /verify latency)
     try:
         if _PIL_OK:
             dummy = Image.new('RGB', (320, 240), color=(0, 0, 0))
             await asyncio.to_thread(lambda: reader.readtext(np.array(dummy), detail=0))
+            print("OCR warm-up done.")
     except Exception:
         pass
 
-    # Sync commands
+def _command_tree_hash(guild: discord.abc.Snowflake | None) -> str:
+    payload = []
+    for cmd in tree.get_commands(guild=guild):
+        try:
+            payload.append(cmd.to_dict(tree))
+        except TypeError:
+            # discord.py < 2.4: to_dict() takes no tree argument
+            payload.append(cmd.to_dict())
+    payload.sort(key=lambda c: c.get("name", ""))
+    blob = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+async def sync_commands_if_changed():
+    """Only hit the (heavily rate-limited) sync endpoint when the command tree changed."""
     try:
+        guild_obj = None
+        scope = "global"
         if DISCORD_GUILD_ID:
             guild_obj = discord.Object(id=DISCORD_GUILD_ID)
             tree.copy_global_to(guild=guild_obj)
-            await tree.sync(guild=guild_obj)
+            scope = f"guild:{DISCORD_GUILD_ID}"
+        key = f"command_hash:{client.application_id}:{scope}"
+        current = _command_tree_hash(guild_obj)
+        if await database.get_meta(key) == current:
+            print(f"Slash commands unchanged ({scope}); skipping sync.")
+            return
+        await tree.sync(guild=guild_obj)
+        await database.set_meta(key, current)
+        if guild_obj:
             print(f"Slash commands synced to guild {DISCORD_GUILD_ID}.")
         else:
-            await tree.sync()
             print("Slash commands synced globally (may take time to appear).")
     except Exception as e:
         print(f"Failed to sync slash commands: {e}")
 
+async def startup():
+    global _retention_task, _reconcile_task, _warmup_task
+    await database.init_db()
+    await STORAGE.init()
+    print("Database initialized." if STORAGE.is_local else f"Database initialized (shared storage: {STORAGE.base_url}).")
+    await load_phash_index()
+    LEARNED_ROIS.load(await database.load_learned_rois())
+    OCR_COSTS.load(await database.get_meta("ocr_cost_model"))
+    # Retention runs where the history lives: here for local SQLite, in storage_service.py otherwise
+    if RETENTION_DAYS > 0 and STORAGE.is_local and IS_PRIMARY and _retention_task is None:
+        _retention_task = asyncio.create_task(retention_loop())
+    OCR_NODES.start()
+    if RECONCILE_ENABLED and RECONCILE_INTERVAL_HOURS > 0 and _reconcile_task is None:
+        _reconcile_task = asyncio.create_task(reconcile_loop())
+    # Warm-up runs in the background so it doesn't delay the gateway connect
+    if _warmup_task is None:
+        _warmup_task = asyncio.create_task(warm_up_ocr())
+    if IS_PRIMARY:
+        await sync_commands_if_changed()
+
+# -----------------------------
+# Events
+# -----------------------------
+@client.event
+async def on_ready():
+    # Fires again on every reconnect; keep it cheap
+    print(f"Logged in as {client.user} (ID: {client.user.id})")
+
 # -----------------------------
 # Main
 # -----------------------------
@@ -0,0 +1,110 @@
+"""
+Opt-in capture of production /verify requests for offline replay.
+
+A sampled request is stored as two files in the archive directory:
+  <id>.img   the uploaded screenshot bytes, untouched
+  <id>.json  project hint, the member's linked handle, per-stage timings
+             (ms) and the final project/score/handle the bot answered with
+The archive is capped by total size; the oldest captures are dropped first.
+The directory is scanned once, on the first capture; after that the running
+size is kept up to date as captures are written and evicted.
+replay.py runs an archive through the current pipeline and diffs the results.
+"""
+import collections
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+
+class CaptureArchive:
+    def __init__(self, path: str = "captures", sample_rate: float = 0.0, max_bytes: int = 500 * 1024 * 1024):
+        self.path = path
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.max_bytes = max_bytes
+        self.captured = 0
+        self.total_bytes = 0
+        self._sizes = None  # stem -> bytes on disk, oldest first; None until the first scan
+        self._lock = threading.Lock()  # record() runs in parallel to_thread workers
+
+    @property
+    def count(self) -> int:
+        return len(self._sizes or ())
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0.0
+
+    def should_sample(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def record(self, image_bytes: bytes, meta: dict) -> str:
+        """Write one capture (blocking; call via asyncio.to_thread). Returns its id."""
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            if self._sizes is None:
+                self._scan()
+        cid = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        with open(os.path.join(self.path, cid + ".img"), "wb") as f:
+            f.write(image_bytes)
+        meta = dict(meta, id=cid, captured_at=int(time.time()), bytes=len(image_bytes))
+        # .json is written last: a capture without it is incomplete and ignored by replay
+        encoded = json.dumps(meta, sort_keys=True).encode("utf-8")
+        with open(os.path.join(self.path, cid + ".json"), "wb") as f:
+            f.write(encoded)
+        with self._lock:
+            self.captured += 1
+            self._sizes[cid] = len(image_bytes) + len(encoded)
+            self.total_bytes += self._sizes[cid]
+            self._enforce_cap()
+        return cid
+
+    def _scan(self):
+        """Size up what is already on disk (once, before the first capture)."""
+        files = []
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            names = []
+        for n in names:
+            if n.endswith((".img", ".json")):
+                try:
+                    st = os.stat(os.path.join(self.path, n))
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, n.rsplit(".", 1)[0], st.st_size))
+        self._sizes = collections.OrderedDict()
+        for _mtime, stem, size in sorted(files):
+            self._sizes[stem] = self._sizes.get(stem, 0) + size
+        self.total_bytes = sum(self._sizes.values())
+
+    def _enforce_cap(self):
+        if self.max_bytes <= 0:
+            return
+        while self.total_bytes > self.max_bytes and self._sizes:
+            stem, size = self._sizes.popitem(last=False)  # oldest first
+            for ext in (".img", ".json"):
+                try:
+                    os.remove(os.path.join(self.path, stem + ext))
+                except FileNotFoundError:
+                    pass
+            self.total_bytes -= size
+
+
+def iter_captures(path: str):
+    """Yield (meta, image_bytes) for every complete capture, oldest first."""
+    try:
+        names = sorted(n for n in os.listdir(path) if n.endswith(".json"))
+    except FileNotFoundError:
+        return
+    for n in names:
+        stem = n[:-5]
+        img_path = os.path.join(path, stem + ".img")
+        if not os.path.exists(img_path):
+            continue
+        with open(os.path.join(path, n), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(img_path, "rb") as f:
+            yield meta, f.read()
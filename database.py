@@ -1,4 +1,5 @@
 import aiosqlite
+import asyncio
 import os
 import time
 
@@ -6,6 +7,10 @@ DB_FILE = "bot_database.db"
 
 async def init_db():
     async with aiosqlite.connect(DB_FILE) as db:
+        # Only takes effect on a new, empty database; existing ones switch offline (see below)
+        await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # WAL lets the retention job and stats readers run without blocking /verify writes
+        await db.execute("PRAGMA journal_mode=WAL")
         await db.execute("""
             CREATE TABLE IF NOT EXISTS x_accounts (
                 discord_id TEXT PRIMARY KEY,
@@ -17,7 +22,13 @@ async def init_db():
                 linked_at INTEGER
             )
         """)
-        
+        # Bumped on every save_link; bulk lookups derive their ETag from it
+        await _ensure_column(db, "x_accounts", "version", "INTEGER NOT NULL DEFAULT 1")
+        # Covering index: ETag checks never touch the table rows
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_x_accounts_version ON x_accounts (discord_id, version, linked_at)"
+        )
+
         await db.execute("""
             CREATE TABLE IF NOT EXISTS verification_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -30,6 +41,268 @@ async def init_db():
                 timestamp INTEGER
             )
         """)
+        await _ensure_column(db, "verification_history", "phash", "TEXT")
+        await _ensure_column(db, "verification_history", "duplicate_of", "TEXT")
+        # Numeric score; going forward `score` TEXT is only kept for values that don't parse
+        await _ensure_column(db, "verification_history", "score_num", "REAL")
+        # Keyset pagination for per-guild exports
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_verification_history_guild_id ON verification_history (guild_id, id)"
+        )
+
+        # OAuth PKCE state between /x/start and /x/callback (shared by every verify_service replica)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS oauth_pending (
+                state TEXT PRIMARY KEY,
+                discord_id TEXT NOT NULL,
+                code_verifier TEXT NOT NULL,
+                created_at INTEGER NOT NULL
+            )
+        """)
+
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        await _init_aggregates(db)
+
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS learned_rois (
+                project TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                x0 REAL, y0 REAL, x1 REAL, y1 REAL,
+                dev REAL,
+                samples INTEGER,
+                updated_at INTEGER,
+                PRIMARY KEY (project, kind, bucket)
+            ) WITHOUT ROWID
+        """)
+        await db.commit()
+
+async def _ensure_column(db, table: str, column: str, decl: str):
+    # Lightweight migration for databases created before the column existed
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        cols = {row[1] for row in await cursor.fetchall()}
+    if column not in cols:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+# ============================================================
+# Incremental aggregates over verification_history
+# ============================================================
+# Maintained by AFTER INSERT triggers so every writer keeps them current;
+# stats readers never touch verification_history itself.
+_AGGREGATE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS verification_daily (
+        guild_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        project TEXT NOT NULL,
+        role_assigned TEXT NOT NULL,   -- '' when no role was assigned
+        attempts INTEGER NOT NULL DEFAULT 0,
+        scored INTEGER NOT NULL DEFAULT 0,
+        score_sum REAL NOT NULL DEFAULT 0,
+        score_max REAL,
+        PRIMARY KEY (guild_id, day, project, role_assigned)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS verification_totals (
+        guild_id TEXT NOT NULL,
+        project TEXT NOT NULL,
+        role_assigned TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        scored INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (guild_id, project, role_assigned)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS member_latest_tier (
+        guild_id TEXT NOT NULL,
+        discord_id TEXT NOT NULL,
+        project TEXT,
+        role_assigned TEXT NOT NULL,
+        score,
+        timestamp INTEGER,
+        PRIMARY KEY (guild_id, discord_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_member_latest_tier_role
+        ON member_latest_tier (guild_id, role_assigned)
+    """,
+    # Recreated on every start so trigger changes apply to existing databases
+    "DROP TRIGGER IF EXISTS trg_verification_history_agg",
+    """
+    CREATE TRIGGER trg_verification_history_agg
+    AFTER INSERT ON verification_history
+    BEGIN
+        INSERT INTO verification_daily (guild_id, day, project, role_assigned, attempts, scored, score_sum, score_max)
+        VALUES (
+            COALESCE(NEW.guild_id, ''),
+            date(NEW.timestamp, 'unixepoch'),
+            COALESCE(NEW.project, 'Unknown'),
+            COALESCE(NEW.role_assigned, ''),
+            1,
+            NEW.score IS NOT NULL OR NEW.score_num IS NOT NULL,
+            COALESCE(NEW.score_num, 0),
+            NEW.score_num
+        )
+        ON CONFLICT (guild_id, day, project, role_assigned) DO UPDATE SET
+            attempts = attempts + 1,
+            scored = scored + excluded.scored,
+            score_sum = score_sum + excluded.score_sum,
+            score_max = MAX(COALESCE(score_max, excluded.score_max), COALESCE(excluded.score_max, score_max));
+
+        INSERT INTO verification_totals (guild_id, project, role_assigned, attempts, scored)
+        VALUES (
+            COALESCE(NEW.guild_id, ''),
+            COALESCE(NEW.project, 'Unknown'),
+            COALESCE(NEW.role_assigned, ''),
+            1,
+            NEW.score IS NOT NULL OR NEW.score_num IS NOT NULL
+        )
+        ON CONFLICT (guild_id, project, role_assigned) DO UPDATE SET
+            attempts = attempts + 1,
+            scored = scored + excluded.scored;
+
+        INSERT INTO member_latest_tier (guild_id, discord_id, project, role_assigned, score, timestamp)
+        SELECT COALESCE(NEW.guild_id, ''), NEW.discord_id, NEW.project, NEW.role_assigned,
+               COALESCE(NEW.score_num, NEW.score), NEW.timestamp
+        WHERE NEW.role_assigned IS NOT NULL
+        ON CONFLICT (guild_id, discord_id) DO UPDATE SET
+            project = excluded.project,
+            role_assigned = excluded.role_assigned,
+            score = excluded.score,
+            timestamp = excluded.timestamp
+        WHERE excluded.timestamp >= member_latest_tier.timestamp;
+    END
+    """,
+]
+
+async def _init_aggregates(db):
+    for stmt in _AGGREGATE_SCHEMA[:3]:
+        await db.execute(stmt)
+    await _ensure_column(db, "verification_daily", "score_sum", "REAL NOT NULL DEFAULT 0")
+    await _ensure_column(db, "verification_daily", "score_max", "REAL")
+    for stmt in _AGGREGATE_SCHEMA[3:]:
+        await db.execute(stmt)
+    # One-time backfill for databases that already had history before the triggers existed
+    async with db.execute("SELECT value FROM meta WHERE key = 'aggregates_version'") as cursor:
+        row = await cursor.fetchone()
+    if row is None:
+        await _rebuild_aggregates(db)
+        await db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('aggregates_version', '1')")
+
+async def _rebuild_aggregates(db):
+    await db.execute("DELETE FROM verification_daily")
+    await db.execute("DELETE FROM verification_totals")
+    await db.execute("DELETE FROM member_latest_tier")
+    await db.execute("""
+        INSERT INTO verification_daily (guild_id, day, project, role_assigned, attempts, scored, score_sum, score_max)
+        SELECT COALESCE(guild_id, ''), date(timestamp, 'unixepoch'), COALESCE(project, 'Unknown'),
+               COALESCE(role_assigned, ''), COUNT(*), SUM(score IS NOT NULL OR score_num IS NOT NULL),
+               TOTAL(score_num), MAX(score_num)
+        FROM verification_history
+        GROUP BY 1, 2, 3, 4
+    """)
+    await db.execute("""
+        INSERT INTO verification_totals (guild_id, project, role_assigned, attempts, scored)
+        SELECT COALESCE(guild_id, ''), COALESCE(project, 'Unknown'), COALESCE(role_assigned, ''),
+               COUNT(*), SUM(score IS NOT NULL OR score_num IS NOT NULL)
+        FROM verification_history
+        GROUP BY 1, 2, 3
+    """)
+    await db.execute("""
+        INSERT INTO member_latest_tier (guild_id, discord_id, project, role_assigned, score, timestamp)
+        SELECT COALESCE(h.guild_id, ''), h.discord_id, h.project, h.role_assigned,
+               COALESCE(h.score_num, h.score), h.timestamp
+        FROM verification_history h
+        WHERE h.role_assigned IS NOT NULL
+          AND h.id = (
+              SELECT h2.id FROM verification_history h2
+              WHERE h2.discord_id = h.discord_id
+                AND COALESCE(h2.guild_id, '') = COALESCE(h.guild_id, '')
+                AND h2.role_assigned IS NOT NULL
+              ORDER BY h2.timestamp DESC, h2.id DESC LIMIT 1
+          )
+    """)
+
+async def get_guild_stats(guild_id: str, days: int = 7) -> dict:
+    """Stats for one guild, read only from the aggregate tables."""
+    since = time.strftime("%Y-%m-%d", time.gmtime(time.time() - max(0, days - 1) * 86400))
+    async with aiosqlite.connect(DB_FILE) as db:
+        projects = {}
+        async with db.execute("""
+            SELECT project, role_assigned, attempts, scored
+            FROM verification_totals WHERE guild_id = ?
+        """, (guild_id,)) as cursor:
+            async for project, role, attempts, scored in cursor:
+                p = projects.setdefault(project, {"attempts": 0, "scored": 0, "roles_assigned": 0})
+                p["attempts"] += attempts
+                p["scored"] += scored
+                if role:
+                    p["roles_assigned"] += attempts
+        for p in projects.values():
+            p["success_rate"] = round(p["roles_assigned"] / p["attempts"], 4) if p["attempts"] else 0.0
+
+        tiers = {}
+        async with db.execute("""
+            SELECT role_assigned, COUNT(*) FROM member_latest_tier
+            WHERE guild_id = ? GROUP BY role_assigned
+        """, (guild_id,)) as cursor:
+            async for role, n in cursor:
+                tiers[role] = n
+
+        daily = {}
+        async with db.execute("""
+            SELECT day, project, SUM(attempts), SUM(scored)
+            FROM verification_daily
+            WHERE guild_id = ? AND day >= ?
+            GROUP BY day, project
+            ORDER BY day
+        """, (guild_id, since)) as cursor:
+            async for day, project, attempts, scored in cursor:
+                daily.setdefault(day, {})[project] = {"attempts": attempts, "scored": scored}
+
+    return {
+        "guild_id": guild_id,
+        "projects": projects,
+        "tier_distribution": tiers,
+        "daily": daily,
+        "days": days,
+    }
+
+async def get_meta(key: str):
+    async with aiosqlite.connect(DB_FILE) as db:
+        async with db.execute("SELECT value FROM meta WHERE key = ?", (key,)) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else None
+
+async def set_meta(key: str, value: str):
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        await db.commit()
+
+async def load_learned_rois() -> list[dict]:
+    async with aiosqlite.connect(DB_FILE) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute("SELECT * FROM learned_rois") as cursor:
+            return [dict(r) for r in await cursor.fetchall()]
+
+async def save_learned_roi(row: dict):
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.execute("""
+            INSERT OR REPLACE INTO learned_rois
+            (project, kind, bucket, x0, y0, x1, y1, dev, samples, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            row["project"], row["kind"], row["bucket"],
+            row["x0"], row["y0"], row["x1"], row["y1"],
+            row["dev"], row["samples"], row.get("updated_at", int(time.time()))
+        ))
         await db.commit()
 
 async def get_link(discord_id: str):
@@ -46,8 +319,9 @@ async def save_link(discord_id: str, data: dict):
     async with aiosqlite.connect(DB_FILE) as db:
         await db.execute("""
             INSERT OR REPLACE INTO x_accounts 
-            (discord_id, x_user_id, x_username, x_name, verified, verified_type, linked_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            (discord_id, x_user_id, x_username, x_name, verified, verified_type, linked_at, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?,
+                    COALESCE((SELECT version FROM x_accounts WHERE discord_id = ?), 0) + 1)
         """, (
             discord_id,
             data.get("x_user_id"),
@@ -55,29 +329,259 @@ async def save_link(discord_id: str, data: dict):
             data.get("x_name"),
             data.get("verified"),
             data.get("verified_type"),
-            data.get("linked_at", int(time.time()))
+            data.get("linked_at", int(time.time())),
+            discord_id
         ))
         await db.commit()
 
+# SQLite's default host-parameter limit is 999; stay well under it
+_IN_CHUNK = 500
+
+def _chunks(items: list, n: int = _IN_CHUNK):
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+async def get_link_versions(discord_ids: list[str]) -> dict:
+    """discord_id -> (version, linked_at) for linked ids; served from the covering index."""
+    out = {}
+    async with aiosqlite.connect(DB_FILE) as db:
+        for chunk in _chunks(discord_ids):
+            marks = ",".join("?" * len(chunk))
+            async with db.execute(
+                f"SELECT discord_id, version, linked_at FROM x_accounts INDEXED BY idx_x_accounts_version "
+                f"WHERE discord_id IN ({marks})", chunk
+            ) as cursor:
+                for did, version, linked_at in await cursor.fetchall():
+                    out[did] = (version, linked_at)
+    return out
+
+async def iter_links(discord_ids: list[str]):
+    """Yield (discord_id, row-or-None) in request order, one indexed IN (...) query per chunk."""
+    async with aiosqlite.connect(DB_FILE) as db:
+        db.row_factory = aiosqlite.Row
+        for chunk in _chunks(discord_ids):
+            marks = ",".join("?" * len(chunk))
+            async with db.execute(f"SELECT * FROM x_accounts WHERE discord_id IN ({marks})", chunk) as cursor:
+                rows = {row["discord_id"]: dict(row) for row in await cursor.fetchall()}
+            for did in chunk:
+                yield did, rows.get(did)
+
+async def get_latest_tiers(guild_id: str, discord_ids: list[str]) -> dict:
+    """discord_id -> latest recorded tier role for the given members (missing = no tier)."""
+    out = {}
+    async with aiosqlite.connect(DB_FILE) as db:
+        for chunk in _chunks(discord_ids):
+            marks = ",".join("?" * len(chunk))
+            async with db.execute(
+                f"SELECT discord_id, role_assigned FROM member_latest_tier WHERE guild_id = ? AND discord_id IN ({marks})",
+                [guild_id, *chunk]
+            ) as cursor:
+                for did, role in await cursor.fetchall():
+                    out[did] = role
+    return out
+
 async def delete_link(discord_id: str):
     async with aiosqlite.connect(DB_FILE) as db:
         await db.execute("DELETE FROM x_accounts WHERE discord_id = ?", (discord_id,))
         await db.commit()
         return True # logic in bot was "if removed"
 
-async def log_result(discord_id: str, discord_username: str, guild_id: str, project: str, score: str, role_assigned: str):
+async def pending_put(state: str, discord_id: str, code_verifier: str, ttl: int = 600):
+    now = int(time.time())
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.execute("DELETE FROM oauth_pending WHERE created_at < ?", (now - ttl,))
+        await db.execute(
+            "INSERT OR REPLACE INTO oauth_pending (state, discord_id, code_verifier, created_at) VALUES (?, ?, ?, ?)",
+            (state, discord_id, code_verifier, now)
+        )
+        await db.commit()
+
+async def pending_pop(state: str, ttl: int = 600):
+    """Take (and remove) a pending OAuth state; None if unknown or expired."""
+    async with aiosqlite.connect(DB_FILE) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute("SELECT * FROM oauth_pending WHERE state = ?", (state,)) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        cur = await db.execute("DELETE FROM oauth_pending WHERE state = ?", (state,))
+        await db.commit()
+        if not cur.rowcount:
+            return None  # a concurrent callback already took it
+    if int(time.time()) - row["created_at"] > ttl:
+        return None
+    return dict(row)
+
+def _parse_score(score):
+    if score is None:
+        return None
+    try:
+        return float(str(score).replace(",", "").strip())
+    except ValueError:
+        return None
+
+async def log_result(discord_id: str, discord_username: str, guild_id: str, project: str, score: str, role_assigned: str,
+                     phash: str | None = None, duplicate_of: str | None = None):
+    score_num = _parse_score(score)
     async with aiosqlite.connect(DB_FILE) as db:
         await db.execute("""
             INSERT INTO verification_history 
-            (discord_id, discord_username, guild_id, project, score, role_assigned, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            (discord_id, discord_username, guild_id, project, score, score_num, role_assigned, timestamp, phash, duplicate_of)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             discord_id,
             discord_username,
             guild_id,
             project,
-            score,
+            score if score_num is None else None,
+            score_num,
             role_assigned,
-            int(time.time())
+            int(time.time()),
+            phash,
+            duplicate_of
         ))
         await db.commit()
+
+async def get_phash_page(after_id: int = 0, limit: int = 5000) -> list:
+    """[id, discord_id, phash_hex] rows with id > after_id, in id order (for paged index loads)."""
+    async with aiosqlite.connect(DB_FILE) as db:
+        async with db.execute(
+            "SELECT id, discord_id, phash FROM verification_history WHERE phash IS NOT NULL AND id > ? "
+            "ORDER BY id LIMIT ?", (after_id, limit)
+        ) as cursor:
+            return [list(r) for r in await cursor.fetchall()]
+
+# ============================================================
+# Retention: age out raw history (already rolled up by the aggregate trigger)
+# ============================================================
+async def _history_cutoff_id(db, cutoff_ts: int) -> int:
+    """
+    Largest id with timestamp < cutoff_ts. Rows are appended in time order, so
+    this is a binary search over rowid lookups instead of a full scan.
+    """
+    async with db.execute("SELECT MIN(id), MAX(id) FROM verification_history") as cursor:
+        lo, hi = await cursor.fetchone()
+    if lo is None:
+        return 0
+    best = lo - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        async with db.execute(
+            "SELECT id, timestamp FROM verification_history WHERE id >= ? ORDER BY id LIMIT 1", (mid,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            hi = mid - 1
+        elif (row[1] or 0) < cutoff_ts:
+            best = row[0]
+            lo = row[0] + 1
+        else:
+            hi = mid - 1
+    return best
+
+async def purge_history(older_than_days: int, batch_size: int = 500, pause: float = 0.05) -> int:
+    """
+    Delete verification_history rows older than the cutoff in small transactions.
+    Daily aggregates already hold their rollup, so nothing is lost for /stats.
+    Returns the number of rows deleted.
+    """
+    if older_than_days <= 0:
+        return 0
+    cutoff_ts = int(time.time()) - older_than_days * 86400
+    deleted = 0
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.execute("PRAGMA busy_timeout = 5000")
+        cutoff_id = await _history_cutoff_id(db, cutoff_ts)
+        while True:
+            cur = await db.execute("""
+                DELETE FROM verification_history
+                WHERE id IN (
+                    SELECT id FROM verification_history WHERE id <= ? ORDER BY id LIMIT ?
+                )
+            """, (cutoff_id, batch_size))
+            await db.commit()
+            n = cur.rowcount or 0
+            deleted += n
+            if n < batch_size:
+                break
+            # yield between batches so /verify inserts aren't starved
+            await asyncio.sleep(pause)
+    return deleted
+
+_vacuum_hint_shown = False
+
+async def incremental_vacuum(max_pages: int = 2000) -> int:
+    """
+    Return up to max_pages free pages to the OS. Returns the freelist size before vacuuming.
+    Databases created before auto_vacuum=INCREMENTAL are left alone: switching needs a full
+    VACUUM, which locks and rewrites the whole file, so it is an offline step
+    (python database.py --enable-incremental-vacuum).
+    """
+    global _vacuum_hint_shown
+    async with aiosqlite.connect(DB_FILE) as db:
+        async with db.execute("PRAGMA auto_vacuum") as cursor:
+            mode = (await cursor.fetchone())[0]
+        if mode != 2:
+            if not _vacuum_hint_shown:
+                _vacuum_hint_shown = True
+                print("[retention] freed pages stay in the file; run `python database.py --enable-incremental-vacuum` "
+                      "while the bot is stopped to return them to the OS")
+            return 0
+        async with db.execute("PRAGMA freelist_count") as cursor:
+            free = (await cursor.fetchone())[0]
+        if free:
+            # the pragma frees one page per step; fetch to run it to completion
+            async with db.execute(f"PRAGMA incremental_vacuum({int(max_pages)})") as cursor:
+                await cursor.fetchall()
+        return free
+
+# ============================================================
+# Export: keyset pagination over (guild_id, id)
+# ============================================================
+EXPORT_COLUMNS = ["id", "timestamp", "discord_id", "discord_username", "project", "score",
+                  "role_assigned", "phash", "duplicate_of"]
+
+async def iter_history(guild_id: str, since_ts: int | None = None, after_id: int = 0, chunk_size: int = 1000):
+    """
+    Yield lists of up to chunk_size history rows (dicts, EXPORT_COLUMNS) for a guild in id order.
+    Each chunk is its own `id > last` query, so no cursor or result set is held between chunks.
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        if since_ts:
+            after_id = max(after_id, await _history_cutoff_id(db, since_ts))
+        while True:
+            async with db.execute("""
+                SELECT id, timestamp, discord_id, discord_username, project,
+                       COALESCE(score_num, score), role_assigned, phash, duplicate_of
+                FROM verification_history
+                WHERE guild_id = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (guild_id, after_id, chunk_size)) as cursor:
+                rows = await cursor.fetchall()
+            if not rows:
+                return
+            out = []
+            for r in rows:
+                row = dict(zip(EXPORT_COLUMNS, r))
+                if isinstance(row["score"], float) and row["score"].is_integer():
+                    row["score"] = int(row["score"])
+                out.append(row)
+            yield out
+            if len(rows) < chunk_size:
+                return
+            after_id = rows[-1][0]
+
+async def enable_incremental_vacuum():
+    """Offline: switch an existing database to auto_vacuum=INCREMENTAL (a full VACUUM)."""
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await db.execute("VACUUM")
+    print(f"{DB_FILE}: auto_vacuum is now INCREMENTAL")
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["--enable-incremental-vacuum"]:
+        asyncio.run(enable_incremental_vacuum())
+    else:
+        print("usage: python database.py --enable-incremental-vacuum  (stop the bot first)")
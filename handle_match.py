@@ -0,0 +1,123 @@
+"""
+Matching OCR output against the X handle a member has linked.
+
+/verify already knows which handle should be on the screenshot, so instead of
+reading "any @token" and comparing afterwards, the fast path asks a narrower
+question: is @expected in this crop? That lets it
+  - recognize only text boxes wide enough to hold "@" + expected,
+  - restrict the recognizer to the characters of expected (plus the glyphs
+    OCR confuses them with) while looking for the box that holds the handle,
+  - accept small recognition errors there, with a bounded edit distance, and
+  - stop at the first box that looks like the handle, or after one crop that
+    shows a different handle.
+
+The fuzzy comparison (case-insensitive, folding common OCR confusions such as
+0/o, 1/l/I, 5/s before counting edits) only picks the box. Whether the handle
+matches is decided by an open read of that box, which must equal expected
+exactly (ignoring case): one edit is often another real account. A crop where
+no box decides gets one open read of all its lines, reusing the detection, so
+a different handle is still named without a second detector pass.
+"""
+import re
+
+# OCR confusion classes: every character maps to its class representative
+_FOLD = str.maketrans({"0": "o", "1": "l", "i": "l", "|": "l", "5": "s", "8": "b", "2": "z"})
+_CONFUSABLE = {"o": "0oO", "l": "1lIi|", "s": "5sS", "b": "8bB", "z": "2zZ"}
+_AT_TOKEN = re.compile(r"@\s?([A-Za-z0-9_|]+)")
+
+# Rough width/height of one glyph in UI sans fonts, for sizing detector boxes
+_GLYPH_ASPECT = 0.55
+
+
+def fold(text: str) -> str:
+    return (text or "").lower().translate(_FOLD)
+
+
+def allowlist_for(handle: str) -> str:
+    """Recognizer allowlist: the handle's characters in both cases, their confusables, '@' and '_'."""
+    chars = set("@_")
+    for c in handle:
+        chars.update((c.lower(), c.upper()))
+        chars.update(_CONFUSABLE.get(fold(c), ""))
+    return "".join(sorted(chars))
+
+
+def max_edits(handle: str, cap: int) -> int:
+    """Edit budget for a handle: none for short handles, where one edit is another plausible name."""
+    if cap <= 0 or len(handle) < 6:
+        return 0
+    return min(cap, 1 if len(handle) < 12 else 2)
+
+
+def edit_distance(a: str, b: str, bound: int) -> int:
+    """Levenshtein distance, giving up (returns bound + 1) once it must exceed `bound`."""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, start=1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+        if min(cur) > bound:
+            return bound + 1
+        prev = cur
+    return min(prev[-1], bound + 1)
+
+
+def plausible_boxes(boxes: list, expected: str, limit: int) -> list:
+    """
+    Detector boxes ([x_min, x_max, y_min, y_max]) that could hold "@expected",
+    closest to the expected width first. Wider boxes stay in (EasyOCR merges a
+    display name and handle on one line into one box), narrower ones don't.
+    """
+    n = len(expected) + 1
+    scored = []
+    for b in boxes:
+        w, h = b[1] - b[0], b[3] - b[2]
+        if w <= 0 or h <= 0:
+            continue
+        chars = w / (_GLYPH_ASPECT * h)
+        if chars < 0.6 * n:
+            continue
+        scored.append((abs(chars - n), b))
+    scored.sort(key=lambda x: x[0])
+    return [b for _, b in scored[:limit]]
+
+
+def first_token(results) -> str | None:
+    """The first @token in readtext-style results, as the open-ended handle read takes it."""
+    for _bbox, text, _prob in results:
+        for token in _AT_TOKEN.findall(str(text)):
+            token = token.strip(".,;:!)]}(")
+            if token:
+                return token
+    return None
+
+
+def match_results(results, expected: str, bound: int, min_conf: float):
+    """
+    Check readtext-style [(bbox, text, prob)] for @expected.
+    Returns ("match", token) for an exact (case-insensitive) read, ("near", token)
+    for one within `bound` edits after folding, ("mismatch", token) for a confident
+    @token that is neither, or (None, None) when the crop says nothing either way.
+    Only confident reads count: a restricted allowlist can force another handle
+    into expected's characters, but not with a confident read.
+    """
+    want = fold(expected)
+    near = mismatch = None
+    for _bbox, text, prob in results:
+        if prob < min_conf:
+            continue
+        for token in _AT_TOKEN.findall(str(text)):
+            token = token.strip(".,;:!)]}(")
+            if not token:
+                continue
+            if token.lower() == expected.lower():
+                return "match", token
+            if near is None and edit_distance(fold(token), want, bound) <= bound:
+                near = token
+            if mismatch is None:
+                mismatch = token
+    if near:
+        return "near", near
+    return ("mismatch", mismatch) if mismatch else (None, None)
@@ -0,0 +1,35 @@
+"""
+Streaming CSV / NDJSON export of verification_history for one guild.
+
+Rows come from `store.iter_history` (database.py, or a storage.Storage so a
+shared store is read; keyset pagination on (guild_id, id)), and each chunk
+is formatted and yielded as one string, so memory stays flat however large
+the guild's history is. Used by verify_service's /api/export and the bot's
+/export command.
+"""
+import csv
+import io
+import json
+
+import database
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+async def export_chunks(guild_id: str, fmt: str = "csv", since_ts: int | None = None,
+                        after_id: int = 0, chunk_size: int = 1000, store=database):
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=database.EXPORT_COLUMNS)
+        writer.writeheader()
+        yield buf.getvalue()
+    async for rows in store.iter_history(guild_id, since_ts=since_ts, after_id=after_id, chunk_size=chunk_size):
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=database.EXPORT_COLUMNS)
+            writer.writerows(rows)
+            yield buf.getvalue()
+        else:
+            yield "".join(json.dumps(r) + "\n" for r in rows)
@@ -0,0 +1,102 @@
+"""
+Perceptual hashing + near-duplicate index for submitted screenshots.
+
+dHash is computed with NumPy from the already-decoded Pillow image, and hashes
+are kept in a BK-tree so "is there a screenshot within Hamming distance k that
+was submitted by someone else?" doesn't need a scan of verification_history.
+"""
+try:
+    from PIL import Image  # type: ignore
+    import numpy as np  # type: ignore
+    _PIL_OK = True
+except Exception:
+    Image = None  # type: ignore
+    np = None  # type: ignore
+    _PIL_OK = False
+
+HASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash
+
+
+def dhash(img, hash_size: int = HASH_SIZE) -> int | None:
+    """Difference hash of a PIL image (None if Pillow/numpy are unavailable)."""
+    if not _PIL_OK or img is None:
+        return None
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    px = np.asarray(small, dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).flatten()
+    # Pack bits MSB-first into a Python int
+    weights = 1 << np.arange(bits.size - 1, -1, -1, dtype=np.uint64)
+    return int(np.sum(weights[bits], dtype=np.uint64))
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_hex(h: int | None) -> str | None:
+    return None if h is None else f"{h:016x}"
+
+
+def from_hex(s: str | None) -> int | None:
+    if not s:
+        return None
+    try:
+        return int(s, 16)
+    except ValueError:
+        return None
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance.
+    Each node stores one hash and the set of discord_ids that submitted it;
+    children are keyed by their distance to the node's hash.
+    """
+
+    def __init__(self):
+        self._root = None  # [hash, owners:set, children:dict]
+        self.size = 0
+
+    def add(self, h: int, owner: str):
+        if self._root is None:
+            self._root = [h, {owner}, {}]
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].add(owner)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, {owner}, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, h: int, max_dist: int) -> list[tuple[int, int, set]]:
+        """Return [(distance, hash, owners)] for every stored hash within max_dist."""
+        out = []
+        if self._root is None:
+            return out
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_dist:
+                out.append((d, node[0], node[1]))
+            lo, hi = d - max_dist, d + max_dist
+            for cd, child in node[2].items():
+                if lo <= cd <= hi:
+                    stack.append(child)
+        out.sort(key=lambda x: x[0])
+        return out
+
+    def find_other_owner(self, h: int, owner: str, max_dist: int) -> tuple[str, int] | None:
+        """Closest (discord_id, distance) within max_dist submitted by someone other than owner."""
+        for d, _, owners in self.search(h, max_dist):
+            others = owners - {owner}
+            if others:
+                return sorted(others)[0], d
+        return None
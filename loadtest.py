@@ -0,0 +1,419 @@
+"""
+Synthetic load generator for /verify.
+
+Drives bot.verify_cmd end to end with fake discord Interaction / Attachment
+objects (no gateway connection). Link lookups, role edits and history writes
+go to in-memory stand-ins so only the download + OCR pipeline is measured.
+Anything else that reaches SQLite (the phash index) uses a throwaway database,
+and ROI / cost-model learning is frozen, so a run never touches the bot's
+bot_database.db.
+
+Examples:
+  python loadtest.py --rate 2 --duration 60
+  python loadtest.py --images ./screens --pattern spike --rate 1 --spike-rate 12 --ocr-concurrency 2
+  python loadtest.py --max-image-side 1200 --json-out run.json
+
+OCR_CONCURRENCY / MAX_IMAGE_SIDE are read by bot.py at import time, so the
+matching flags are applied to the environment before bot is imported.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+try:
+    import resource  # Unix-only; only used for the RSS fallback
+except ImportError:
+    resource = None
+
+
+# ============================================================
+# Arrival processes
+# ============================================================
+def poisson_arrivals(rate: float, duration: float, rng: random.Random) -> list[float]:
+    """Arrival offsets (seconds) of a homogeneous Poisson process."""
+    out, t = [], 0.0
+    if rate <= 0:
+        return out
+    while True:
+        t += rng.expovariate(rate)
+        if t >= duration:
+            return out
+        out.append(t)
+
+def spike_arrivals(base_rate: float, spike_rate: float, duration: float, spike_every: float,
+                   spike_len: float, rng: random.Random) -> list[float]:
+    """
+    Poisson background traffic plus periodic campaign-launch spikes.
+    Uses thinning of a Poisson process at the peak rate.
+    """
+    peak = max(base_rate, spike_rate)
+    out = []
+    for t in poisson_arrivals(peak, duration, rng):
+        in_spike = spike_every > 0 and (t % spike_every) < spike_len
+        rate = spike_rate if in_spike else base_rate
+        if rng.random() < rate / peak:
+            out.append(t)
+    return out
+
+
+# ============================================================
+# Sample images
+# ============================================================
+_SYNTH_LAYOUTS = [
+    ("Kaito", "KAITO  Total Yaps", 50, 5000),
+    ("Cookie", "cookie.fun  Total snaps earned", 10, 900),
+    ("Xeet", "Xeets earned", 100, 3000),
+    ("Wallchain", "Wallchain  Quack balance  Score", 10, 800),
+]
+
+def _synthetic_images(n: int, rng: random.Random) -> list[tuple[bytes, str, str]]:
+    """Render simple dashboard-like screenshots: (png_bytes, project, handle)."""
+    from PIL import Image, ImageDraw  # type: ignore
+
+    out = []
+    for i in range(n):
+        project, label, lo, hi = _SYNTH_LAYOUTS[i % len(_SYNTH_LAYOUTS)]
+        handle = f"loaduser{i}"
+        w, h = rng.choice([(1170, 2532), (1920, 1080), (1284, 2778), (1440, 900)])
+        img = Image.new("RGB", (w, h), color=(18, 18, 24))
+        d = ImageDraw.Draw(img)
+        d.text((int(w * 0.05), int(h * 0.05)), f"@{handle}", fill=(230, 230, 230))
+        d.text((int(w * 0.05), int(h * 0.12)), label, fill=(200, 200, 200))
+        d.text((int(w * 0.08), int(h * 0.40)), f"{rng.randint(lo, hi):,}", fill=(255, 255, 255))
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        out.append((buf.getvalue(), project, handle))
+    return out
+
+def _load_images(path: str) -> list[tuple[bytes, str, str]]:
+    """Load screenshots from a directory. Files named <Project>__<handle>.png keep their hint."""
+    out = []
+    for name in sorted(os.listdir(path)):
+        if not name.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
+            continue
+        stem = os.path.splitext(name)[0]
+        project, _, handle = stem.partition("__")
+        with open(os.path.join(path, name), "rb") as f:
+            out.append((f.read(), project if handle else "auto", handle or "loaduser"))
+    return out
+
+
+# ============================================================
+# Fake discord objects
+# ============================================================
+def make_fakes(discord):
+    class FakeGuild:
+        def __init__(self, gid):
+            self.id = gid
+            self.roles = []
+
+    class FakeMember(discord.Member):
+        # discord.Member is slotted; this subclass keeps its own __dict__ and
+        # shadows the properties verify_cmd / build_result_embed touch.
+        def __init__(self, uid, guild):
+            self._lt_id = uid
+            self._lt_guild = guild
+
+        id = property(lambda self: self._lt_id)
+        guild = property(lambda self: self._lt_guild)
+        display_name = property(lambda self: f"load-{self._lt_id}")
+        display_avatar = property(lambda self: SimpleNamespace(url=None))
+        roles = property(lambda self: [])
+
+        def __str__(self):
+            return f"load-{self._lt_id}"
+
+    class FakeAttachment:
+        def __init__(self, data, download_delay):
+            self._data = data
+            self._delay = download_delay
+            self.content_type = "image/png"
+            self.filename = "screenshot.png"
+            self.size = len(data)
+            self.width = self.height = None  # like a non-image attachment: the bot reads the header
+
+        async def read(self):
+            if self._delay:
+                await asyncio.sleep(self._delay)
+            return self._data
+
+    class FakeResponse:
+        def __init__(self, rec):
+            self._rec = rec
+
+        async def send_message(self, *args, **kwargs):
+            self._rec["responded_at"] = time.perf_counter()
+            self._rec["outcome"] = "rejected"
+
+        async def defer(self, *args, **kwargs):
+            self._rec["deferred_at"] = time.perf_counter()
+
+    class FakeFollowup:
+        def __init__(self, rec):
+            self._rec = rec
+
+        async def send(self, content=None, embed=None, **kwargs):
+            self._rec["responded_at"] = time.perf_counter()
+            if content and content.startswith("❌"):
+                self._rec["outcome"] = "error"
+            elif embed is not None and embed.fields and any(f.name == "🎯 Score" for f in embed.fields):
+                self._rec["outcome"] = "score"
+            else:
+                self._rec["outcome"] = "no_score"
+
+    class FakeInteraction:
+        def __init__(self, uid, guild, rec):
+            self.guild = guild
+            self.user = FakeMember(uid, guild)
+            self.channel_id = 0
+            self.response = FakeResponse(rec)
+            self.followup = FakeFollowup(rec)
+
+    return FakeGuild, FakeAttachment, FakeInteraction
+
+
+# ============================================================
+# Stand-ins + instrumentation
+# ============================================================
+class TimedSemaphore:
+    """Wraps bot.OCR_SEMAPHORE to record how long each job queued for an OCR slot."""
+
+    def __init__(self, inner):
+        self._inner = inner
+        self.waits = []
+
+    async def __aenter__(self):
+        t0 = time.perf_counter()
+        await self._inner.__aenter__()
+        self.waits.append(time.perf_counter() - t0)
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self._inner.__aexit__(*exc)
+
+    def job(self, cost=None, heavy=False):
+        return _TimedJob(self.waits, self._inner.job(cost, heavy))
+
+
+class _TimedJob:
+    def __init__(self, waits: list, inner):
+        self._waits = waits
+        self._inner = inner
+
+    async def __aenter__(self):
+        t0 = time.perf_counter()
+        await self._inner.__aenter__()
+        self._waits.append(time.perf_counter() - t0)
+        return self._inner
+
+    async def __aexit__(self, *exc):
+        return await self._inner.__aexit__(*exc)
+
+
+def install_stand_ins(bot, handles_by_user: dict, role_delay: float, db_rows: list, db_path: str):
+    # Local SQLite on a throwaway file, whatever STORAGE_URL says
+    bot.database.DB_FILE = db_path
+    bot.STORAGE = bot.storage.SQLiteStorage()
+
+    async def fake_link_get(discord_id):
+        return {"x_username": handles_by_user.get(discord_id, "loaduser"), "verified": False, "verified_type": None}
+
+    async def fake_assign_tier_role(member, role_name):
+        if role_delay:
+            await asyncio.sleep(role_delay)
+        return True, "Role assigned."
+
+    async def fake_log_result(**kwargs):
+        db_rows.append(kwargs)
+
+    async def frozen(*_args, **_kwargs):
+        return None
+
+    bot.link_get = fake_link_get
+    bot.assign_tier_role = fake_assign_tier_role
+    bot.STORAGE.log_result = fake_log_result
+    # Learned ROIs and the cost model stay as loaded (priors here), like replay.py
+    bot.learn_rois_from_full_ocr = frozen
+    bot.record_ocr_costs = frozen
+    bot.VERIFY_CHANNEL_ID = 0
+    # Synthetic users fire far faster than any member could; measure the pipeline, not the cooldowns
+    bot.COOLDOWNS_ENABLED = False
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except Exception:
+        # ru_maxrss is KB on Linux, bytes on macOS; only a high-water mark
+        if resource is None:
+            return 0.0
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return r / 1e6 if sys.platform == "darwin" else r / 1e3
+
+async def sample_resources(samples: list, interval: float, stop: asyncio.Event):
+    t_start = time.perf_counter()
+    last_wall, last_cpu = t_start, time.process_time()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        now, cpu = time.perf_counter(), time.process_time()
+        samples.append({
+            "t": round(now - t_start, 2),
+            "cpu_pct": round(100.0 * (cpu - last_cpu) / max(1e-9, now - last_wall), 1),
+            "rss_mb": round(_rss_mb(), 1),
+        })
+        last_wall, last_cpu = now, cpu
+
+
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+# ============================================================
+# Runner
+# ============================================================
+async def run(args) -> dict:
+    import discord
+    import bot
+
+    rng = random.Random(args.seed)
+    images = _load_images(args.images) if args.images else _synthetic_images(args.synthetic, rng)
+    if not images:
+        raise SystemExit("No images to replay.")
+
+    if args.pattern == "spike":
+        arrivals = spike_arrivals(args.rate, args.spike_rate, args.duration, args.spike_every, args.spike_len, rng)
+    else:
+        arrivals = poisson_arrivals(args.rate, args.duration, rng)
+
+    FakeGuild, FakeAttachment, FakeInteraction = make_fakes(discord)
+    guilds = [FakeGuild(900000 + i) for i in range(max(1, args.guilds))]
+    handles_by_user, db_rows, records = {}, [], []
+    db_path = os.path.join(tempfile.mkdtemp(prefix="loadtest_"), "bot_database.db")
+    install_stand_ins(bot, handles_by_user, args.role_delay, db_rows, db_path)
+    await bot.database.init_db()
+    timed = TimedSemaphore(bot.OCR_SEMAPHORE)
+    bot.OCR_SEMAPHORE = timed
+
+    callback = bot.verify_cmd.callback
+    samples, stop = [], asyncio.Event()
+    sampler = asyncio.create_task(sample_resources(samples, args.sample_every, stop))
+
+    async def one(i: int, offset: float, t0: float):
+        await asyncio.sleep(max(0.0, t0 + offset - time.perf_counter()))
+        data, proj, handle = images[i % len(images)]
+        uid = 100000 + i
+        handles_by_user[str(uid)] = handle
+        rec = {"i": i, "project": proj, "arrived_at": time.perf_counter(), "outcome": None}
+        records.append(rec)
+        inter = FakeInteraction(uid, guilds[i % len(guilds)], rec)
+        choice = SimpleNamespace(value=proj) if proj and proj != "auto" and not args.auto else None
+        try:
+            await callback(inter, FakeAttachment(data, args.download_delay), choice)
+        except Exception as e:
+            rec["outcome"] = f"exception:{type(e).__name__}"
+            rec["responded_at"] = time.perf_counter()
+
+    print(f"Replaying {len(arrivals)} requests over {args.duration:.0f}s "
+          f"(pattern={args.pattern}, OCR_CONCURRENCY={bot.OCR_CONCURRENCY}, MAX_IMAGE_SIDE={bot.MAX_IMAGE_SIDE})")
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i, off, t0) for i, off in enumerate(arrivals)))
+    wall = time.perf_counter() - t0
+    stop.set()
+    await sampler
+
+    e2e = [r["responded_at"] - r["arrived_at"] for r in records if r.get("responded_at")]
+    outcomes = {}
+    for r in records:
+        outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+
+    return {
+        "config": {
+            "ocr_concurrency": bot.OCR_CONCURRENCY,
+            "max_image_side": bot.MAX_IMAGE_SIDE,
+            "pattern": args.pattern,
+            "rate": args.rate,
+            "spike_rate": args.spike_rate,
+            "duration": args.duration,
+        },
+        "requests": len(records),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(e2e) / wall, 3) if wall else 0.0,
+        "outcomes": outcomes,
+        "e2e_s": {p: round(_pct(e2e, v), 3) for p, v in (("p50", 50), ("p95", 95), ("p99", 99))} | {"max": round(max(e2e, default=0.0), 3)},
+        "queue_wait_s": {p: round(_pct(timed.waits, v), 3) for p, v in (("p50", 50), ("p95", 95), ("p99", 99))} | {"max": round(max(timed.waits, default=0.0), 3)},
+        "db_rows": len(db_rows),
+        "ocr_limiter": bot.OCR_SEMAPHORE._inner.state() if hasattr(bot.OCR_SEMAPHORE._inner, "state") else None,
+        "resources": samples,
+    }
+
+
+def _print_report(rep: dict):
+    print("")
+    print(f"Requests:    {rep['requests']} in {rep['wall_s']}s -> {rep['throughput_rps']} req/s")
+    print(f"Outcomes:    {rep['outcomes']}")
+    e, q = rep["e2e_s"], rep["queue_wait_s"]
+    print(f"End-to-end:  p50={e['p50']}s p95={e['p95']}s p99={e['p99']}s max={e['max']}s")
+    print(f"Queue wait:  p50={q['p50']}s p95={q['p95']}s p99={q['p99']}s max={q['max']}s")
+    if rep.get("ocr_limiter"):
+        print(f"OCR limiter: {rep['ocr_limiter']}")
+    if rep["resources"]:
+        peak_cpu = max(s["cpu_pct"] for s in rep["resources"])
+        peak_rss = max(s["rss_mb"] for s in rep["resources"])
+        print(f"CPU/RSS:     peak cpu={peak_cpu}% peak rss={peak_rss}MB")
+        print("  t(s)   cpu%    rss(MB)")
+        for s in rep["resources"]:
+            print(f"  {s['t']:>5}  {s['cpu_pct']:>6}  {s['rss_mb']:>8}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay synthetic /verify traffic without Discord.")
+    ap.add_argument("--images", help="Directory of screenshots (Project__handle.png keeps the hint)")
+    ap.add_argument("--synthetic", type=int, default=16, help="Number of synthetic screenshots if --images is not set")
+    ap.add_argument("--auto", action="store_true", help="Ignore project hints and use Auto detection")
+    ap.add_argument("--pattern", choices=["poisson", "spike"], default="poisson")
+    ap.add_argument("--rate", type=float, default=1.0, help="Mean arrivals per second (background rate for spike)")
+    ap.add_argument("--spike-rate", type=float, default=10.0, help="Arrivals per second during a spike")
+    ap.add_argument("--spike-every", type=float, default=60.0, help="Seconds between spike starts")
+    ap.add_argument("--spike-len", type=float, default=10.0, help="Spike length in seconds")
+    ap.add_argument("--duration", type=float, default=60.0)
+    ap.add_argument("--guilds", type=int, default=1)
+    ap.add_argument("--download-delay", type=float, default=0.05, help="Simulated attachment download seconds")
+    ap.add_argument("--role-delay", type=float, default=0.15, help="Simulated role edit seconds")
+    ap.add_argument("--sample-every", type=float, default=1.0, help="CPU/RSS sampling interval seconds")
+    ap.add_argument("--ocr-concurrency", type=int, help="Override OCR_CONCURRENCY")
+    ap.add_argument("--max-image-side", type=int, help="Override MAX_IMAGE_SIDE")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json-out", help="Write the full report as JSON")
+    args = ap.parse_args(argv)
+
+    if args.ocr_concurrency:
+        os.environ["OCR_CONCURRENCY"] = str(args.ocr_concurrency)
+    if args.max_image_side:
+        os.environ["MAX_IMAGE_SIDE"] = str(args.max_image_side)
+
+    rep = asyncio.run(run(args))
+    _print_report(rep)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2)
+        print(f"Report written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Load / soak test for the X account link flow.
+
+Starts verify_service.py as a subprocess against a throwaway SQLite file and a
+local stand-in for X's OAuth2 token and /2/users/me endpoints (configurable
+latency and error rate), then drives simulated link flows:
+
+  GET /x/start (signed)  ->  state from the authorize redirect
+  GET /x/callback?state&code  ->  token exchange + users/me + save_link
+
+and reports throughput, per-step latency percentiles, lost states (issued
+but rejected on callback), duplicated states (issued twice, or accepted
+twice on a replayed callback), links missing or wrong in the database and
+database-lock errors.
+
+Examples:
+  python oauth_loadtest.py --flows 2000 --concurrency 200
+  python oauth_loadtest.py --rate 50 --duration 600 --x-latency-ms 300 --x-error-rate 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, web
+
+LINK_SECRET = "oauth-loadtest-secret"
+BASE_DISCORD_ID = 900_000_000
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+def _latency_summary(values: list[float]) -> dict:
+    ms = [v * 1000.0 for v in values]
+    return {"n": len(ms), "p50": round(_pct(ms, 0.5), 1), "p95": round(_pct(ms, 0.95), 1),
+            "p99": round(_pct(ms, 0.99), 1), "max": round(max(ms), 1) if ms else 0.0}
+
+
+# ============================================================
+# Fake X API
+# ============================================================
+def make_fake_x(latency_ms: float, jitter_ms: float, error_rate: float, rng: random.Random, counters: dict):
+    async def _delay():
+        await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000.0)
+
+    async def token(request):
+        counters["token"] += 1
+        await _delay()
+        if rng.random() < error_rate:
+            counters["token_errors"] += 1
+            return web.json_response({"error": "temporarily_unavailable"}, status=503)
+        form = await request.post()
+        if form.get("grant_type") != "authorization_code" or not form.get("code_verifier"):
+            return web.json_response({"error": "invalid_request"}, status=400)
+        return web.json_response({"access_token": f"tok-{form.get('code')}", "token_type": "bearer"})
+
+    async def users_me(request):
+        counters["users_me"] += 1
+        await _delay()
+        if rng.random() < error_rate:
+            counters["users_me_errors"] += 1
+            return web.json_response({"title": "Too Many Requests"}, status=429)
+        auth = request.headers.get("Authorization", "")
+        code = auth.split("tok-", 1)[-1]
+        uid = code.split("-", 1)[-1]
+        return web.json_response({"data": {"id": f"x{uid}", "username": f"user{uid}", "name": f"User {uid}",
+                                           "verified": False}})
+
+    app = web.Application()
+    app.router.add_post("/2/oauth2/token", token)
+    app.router.add_get("/2/users/me", users_me)
+    return app
+
+
+# ============================================================
+# One simulated link flow
+# ============================================================
+async def link_flow(session: ClientSession, base: str, discord_id: int, replay: bool, rec: dict):
+    ts = int(time.time())
+    sig = hmac.new(LINK_SECRET.encode(), f"{discord_id}:{ts}".encode(), hashlib.sha256).hexdigest()
+    t0 = time.perf_counter()
+    try:
+        async with session.get(f"{base}/x/start", params={"discord_id": discord_id, "ts": ts, "sig": sig},
+                               allow_redirects=False) as r:
+            loc = r.headers.get("Location", "")
+            if r.status not in (302, 303, 307):
+                rec["outcome"] = f"start_{r.status}"
+                return
+        rec["start_s"] = time.perf_counter() - t0
+        state = urllib.parse.parse_qs(urllib.parse.urlparse(loc).query).get("state", [None])[0]
+        rec["state"] = state
+
+        t1 = time.perf_counter()
+        params = {"state": state, "code": f"code-{discord_id}"}
+        async with session.get(f"{base}/x/callback", params=params) as r:
+            body = await r.text()
+            rec["callback_s"] = time.perf_counter() - t1
+            rec["total_s"] = time.perf_counter() - t0
+            if r.status == 200:
+                rec["outcome"] = "linked"
+            elif "Invalid/expired state" in body:
+                rec["outcome"] = "lost_state"
+            elif "locked" in body.lower():
+                rec["outcome"] = "db_locked"
+            else:
+                rec["outcome"] = f"callback_{r.status}"
+        if replay:
+            async with session.get(f"{base}/x/callback", params=params) as r:
+                rec["replay_accepted"] = r.status == 200
+    except Exception as e:
+        rec["outcome"] = f"exception:{type(e).__name__}"
+
+
+# ============================================================
+# Driver
+# ============================================================
+async def _wait_port(port: int, proc: subprocess.Popen, log_path: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"verify_service exited with code {proc.returncode}; see {log_path}")
+        try:
+            _, w = await asyncio.open_connection("127.0.0.1", port)
+            w.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"verify_service did not start on port {port}")
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    counters = {"token": 0, "token_errors": 0, "users_me": 0, "users_me_errors": 0}
+
+    x_port = _free_port()
+    runner = web.AppRunner(make_fake_x(args.x_latency_ms, args.x_jitter_ms, args.x_error_rate, rng, counters))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", x_port).start()
+
+    workdir = tempfile.mkdtemp(prefix="oauth_loadtest_")
+    db_path = os.path.join(workdir, "bot_database.db")
+    svc_port = _free_port()
+    env = dict(os.environ,
+               PORT=str(svc_port), X_API_BASE=f"http://127.0.0.1:{x_port}", X_CLIENT_ID="loadtest",
+               X_REDIRECT_URI=f"http://127.0.0.1:{svc_port}/x/callback", LINK_SECRET=LINK_SECRET,
+               STORAGE_URL=f"sqlite:///{db_path}")
+    env.pop("STORAGE_TOKEN", None)
+    log_path = os.path.join(workdir, "verify_service.log")
+    log = open(log_path, "w")
+    svc = subprocess.Popen([sys.executable, os.path.abspath(os.path.join(os.path.dirname(__file__), "verify_service.py"))],
+                           cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    records = []
+    try:
+        await _wait_port(svc_port, svc, log_path)
+        base = f"http://127.0.0.1:{svc_port}"
+        sem = asyncio.Semaphore(args.concurrency)
+        connector = TCPConnector(limit=args.concurrency)
+        async with ClientSession(connector=connector, timeout=ClientTimeout(total=args.timeout)) as session:
+            async def one(i: int):
+                rec = {"discord_id": BASE_DISCORD_ID + i}
+                records.append(rec)
+                async with sem:
+                    await link_flow(session, base, rec["discord_id"], rng.random() < args.replay_fraction, rec)
+
+            t_start = time.perf_counter()
+            tasks = []
+            if args.duration:
+                # Soak: Poisson arrivals at --rate for --duration seconds
+                i, t = 0, 0.0
+                while True:
+                    t += rng.expovariate(args.rate)
+                    if t >= args.duration:
+                        break
+                    await asyncio.sleep(max(0.0, t - (time.perf_counter() - t_start)))
+                    tasks.append(asyncio.create_task(one(i)))
+                    i += 1
+            else:
+                tasks = [asyncio.create_task(one(i)) for i in range(args.flows)]
+            await asyncio.gather(*tasks)
+            wall = time.perf_counter() - t_start
+    finally:
+        svc.terminate()
+        try:
+            svc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            svc.kill()
+        log.close()
+        await runner.cleanup()
+
+    return _report(records, wall, counters, db_path, log_path)
+
+def _report(records: list[dict], wall: float, counters: dict, db_path: str, log_path: str) -> dict:
+    outcomes = {}
+    for r in records:
+        outcomes[r.get("outcome", "unknown")] = outcomes.get(r.get("outcome", "unknown"), 0) + 1
+    states = [r["state"] for r in records if r.get("state")]
+    linked = {r["discord_id"] for r in records if r.get("outcome") == "linked"}
+
+    missing, wrong, pending_left = 0, 0, None
+    try:
+        db = sqlite3.connect(db_path)
+        rows = dict(db.execute("SELECT discord_id, x_username FROM x_accounts").fetchall())
+        pending_left = db.execute("SELECT COUNT(*) FROM oauth_pending").fetchone()[0]
+        db.close()
+        for did in linked:
+            got = rows.get(str(did))
+            if got is None:
+                missing += 1
+            elif got != f"user{did}":
+                wrong += 1
+    except sqlite3.Error as e:
+        print(f"could not inspect database: {e}")
+
+    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+        log_locked = sum(1 for line in f if "database is locked" in line)
+
+    return {
+        "flows": len(records),
+        "wall_s": round(wall, 2),
+        "throughput_flows_per_s": round(len(linked) / wall, 2) if wall else 0.0,
+        "outcomes": outcomes,
+        "latency_ms": {
+            "start": _latency_summary([r["start_s"] for r in records if "start_s" in r]),
+            "callback": _latency_summary([r["callback_s"] for r in records if "callback_s" in r]),
+            "total": _latency_summary([r["total_s"] for r in records if r.get("outcome") == "linked"]),
+        },
+        "states": {
+            "issued": len(states),
+            "duplicated": len(states) - len(set(states)),
+            "lost": outcomes.get("lost_state", 0),
+            "replays_accepted": sum(1 for r in records if r.get("replay_accepted")),
+            "left_pending": pending_left,
+        },
+        "database": {"linked_missing": missing, "linked_wrong": wrong,
+                     "locked_responses": outcomes.get("db_locked", 0), "locked_in_log": log_locked},
+        "fake_x": counters,
+    }
+
+def _print_report(rep: dict):
+    print(f"Flows: {rep['flows']} in {rep['wall_s']}s -> {rep['throughput_flows_per_s']} linked/s")
+    print(f"Outcomes: {rep['outcomes']}")
+    for step, s in rep["latency_ms"].items():
+        print(f"  {step:<9} p50={s['p50']}ms p95={s['p95']}ms p99={s['p99']}ms max={s['max']}ms (n={s['n']})")
+    print(f"States: {rep['states']}")
+    print(f"Database: {rep['database']}")
+    print(f"Fake X: {rep['fake_x']}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--flows", type=int, default=1000, help="Number of link flows (burst mode)")
+    ap.add_argument("--concurrency", type=int, default=100, help="Max flows in flight")
+    ap.add_argument("--rate", type=float, default=20.0, help="Soak mode: flows per second")
+    ap.add_argument("--duration", type=float, default=0.0, help="Soak mode: seconds (0 = burst of --flows)")
+    ap.add_argument("--replay-fraction", type=float, default=0.05, help="Fraction of callbacks sent twice")
+    ap.add_argument("--x-latency-ms", type=float, default=150.0)
+    ap.add_argument("--x-jitter-ms", type=float, default=50.0)
+    ap.add_argument("--x-error-rate", type=float, default=0.0)
+    ap.add_argument("--timeout", type=float, default=60.0, help="Per-request client timeout seconds")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json-out", help="Write the full report as JSON")
+    args = ap.parse_args(argv)
+
+    rep = asyncio.run(run(args))
+    _print_report(rep)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2)
+        print(f"Report written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
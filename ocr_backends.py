@@ -0,0 +1,246 @@
+"""
+OCR backend abstraction.
+
+A backend reads an RGB numpy crop and returns readtext-style results:
+[(bbox_4pts, text, prob)]. Backends are looked up by name and routed per
+region kind ("score", "handle", "project") and project, so a project/ROI can
+use a cheap engine first and fall back to EasyOCR.
+
+Shipped backends:
+  - "easyocr": wraps the shared easyocr.Reader (the default for everything)
+  - "digits":  OpenCV/NumPy connected components + template matching for the
+               large, clean headline digits in score crops; no PyTorch
+"""
+import json
+import os
+
+try:
+    import numpy as np  # type: ignore
+    from PIL import Image, ImageDraw, ImageFont  # type: ignore
+    import cv2  # type: ignore
+    _CV_OK = True
+except Exception:
+    np = None  # type: ignore
+    Image = ImageDraw = ImageFont = None  # type: ignore
+    cv2 = None  # type: ignore
+    _CV_OK = False
+
+
+class OCRBackend:
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    def readtext(self, arr, allowlist: str | None = None) -> list:
+        raise NotImplementedError
+
+
+class EasyOCRBackend(OCRBackend):
+    name = "easyocr"
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def readtext(self, arr, allowlist: str | None = None, detail: int = 1) -> list:
+        return self.reader.readtext(arr, detail=detail, paragraph=False, allowlist=allowlist, decoder="greedy")
+
+
+# ============================================================
+# Digit template matcher
+# ============================================================
+_GLYPH = 32  # templates and candidates are normalized to GLYPH x GLYPH
+_DIGITS = "0123456789"
+_FONT_CANDIDATES = ["DejaVuSans-Bold.ttf", "DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Bold.ttf"]
+
+
+def _normalize_glyph(mask):
+    """Tight-crop a binary glyph, scale to GLYPH height keeping aspect, center on a square canvas."""
+    ys, xs = np.nonzero(mask)
+    if ys.size == 0:
+        return None
+    g = mask[ys.min():ys.max() + 1, xs.min():xs.max() + 1].astype(np.uint8) * 255
+    h, w = g.shape
+    nw = max(1, min(_GLYPH, int(round(w * _GLYPH / float(h)))))
+    g = cv2.resize(g, (nw, _GLYPH), interpolation=cv2.INTER_AREA)
+    out = np.zeros((_GLYPH, _GLYPH), dtype=np.float32)
+    x0 = (_GLYPH - nw) // 2
+    out[:, x0:x0 + nw] = g / 255.0
+    return out
+
+
+def _ncc(a, b) -> float:
+    a = a - a.mean()
+    b = b - b.mean()
+    den = float(np.sqrt((a * a).sum() * (b * b).sum()))
+    return float((a * b).sum() / den) if den > 0 else 0.0
+
+
+def _binarize(gray):
+    """Otsu threshold with text as foreground (inverts light-on-dark automatically)."""
+    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    fg = bw > 0
+    # Background is whichever class dominates the border
+    border = np.concatenate([fg[0, :], fg[-1, :], fg[:, 0], fg[:, -1]])
+    if border.mean() > 0.5:
+        fg = ~fg
+    return fg
+
+
+class DigitTemplateBackend(OCRBackend):
+    """
+    Reads runs of digits (with ',' and '.') that are the tallest glyphs in a crop.
+    Each run becomes one token; its prob is the worst per-digit template match,
+    so anything that isn't clean digits scores low and the router falls back.
+    """
+    name = "digits"
+
+    def __init__(self, template_dir: str | None = None, font_path: str | None = None, min_height: int = 12):
+        self.min_height = min_height
+        self.templates = {}
+        if not _CV_OK:
+            return
+        if template_dir and os.path.isdir(template_dir):
+            self._load_templates(template_dir)
+        if not self.templates:
+            self._render_templates(font_path)
+
+    def available(self) -> bool:
+        return _CV_OK and bool(self.templates)
+
+    def _load_templates(self, path: str):
+        # Files: 0.png .. 9.png (any number of variants: 0_a.png, 0_b.png)
+        for name in os.listdir(path):
+            ch = name[:1]
+            if ch not in _DIGITS or not name.lower().endswith(".png"):
+                continue
+            gray = cv2.imread(os.path.join(path, name), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                continue
+            g = _normalize_glyph(_binarize(gray))
+            if g is not None:
+                self.templates.setdefault(ch, []).append(g)
+
+    def _render_templates(self, font_path: str | None):
+        fonts = []
+        for fp in ([font_path] if font_path else []) + _FONT_CANDIDATES:
+            try:
+                fonts.append(ImageFont.truetype(fp, 64))
+            except Exception:
+                continue
+        if not fonts:
+            fonts = [ImageFont.load_default()]
+        for font in fonts:
+            for ch in _DIGITS:
+                img = Image.new("L", (96, 96), color=0)
+                ImageDraw.Draw(img).text((16, 8), ch, fill=255, font=font)
+                g = _normalize_glyph(np.asarray(img) > 127)
+                if g is not None:
+                    self.templates.setdefault(ch, []).append(g)
+
+    def _match(self, glyph) -> tuple[str, float]:
+        best_ch, best = "?", -1.0
+        for ch, temps in self.templates.items():
+            for t in temps:
+                s = _ncc(glyph, t)
+                if s > best:
+                    best_ch, best = ch, s
+        return best_ch, best
+
+    def readtext(self, arr, allowlist: str | None = None) -> list:
+        if not self.available():
+            return []
+        gray = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY) if arr.ndim == 3 else arr
+        fg = _binarize(gray)
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(fg.astype(np.uint8), connectivity=8)
+        if n <= 1:
+            return []
+
+        comps = [tuple(stats[i][:4]) + (i,) for i in range(1, n)]  # x, y, w, h, label
+        tall = max(c[3] for c in comps)
+        if tall < self.min_height:
+            return []
+        # wide blobs (touching digits) stay in and score low, so the run is rejected rather than misread
+        digits = [c for c in comps if c[3] >= 0.7 * tall]
+        if not digits:
+            return []
+        digits.sort(key=lambda c: c[0])
+
+        # Split into runs on large horizontal gaps or baseline changes
+        runs, cur = [], [digits[0]]
+        for c in digits[1:]:
+            p = cur[-1]
+            gap = c[0] - (p[0] + p[2])
+            if gap > 0.9 * tall or abs((c[1] + c[3]) - (p[1] + p[3])) > 0.3 * tall:
+                runs.append(cur)
+                cur = [c]
+            else:
+                cur.append(c)
+        runs.append(cur)
+
+        small = [c for c in comps if c[3] < 0.55 * tall and c[2] < 0.5 * tall]
+        out = []
+        for run in runs:
+            text, worst = "", 1.0
+            for k, c in enumerate(run):
+                x, y, w, h, lab = c
+                ch, score = self._match(_normalize_glyph(labels[y:y + h, x:x + w] == lab))
+                text += ch
+                worst = min(worst, score)
+                if k + 1 < len(run):
+                    nx = run[k + 1][0]
+                    base = y + h
+                    for s in small:
+                        sx, sy, sw, sh, _ = s
+                        if x + w <= sx and sx + sw <= nx and sy + sh >= base - 0.35 * tall:
+                            # dot sits on the baseline; a comma hangs below it
+                            text += "," if sy + sh > base + 0.1 * tall else "."
+                            break
+            if allowlist and any(ch not in allowlist for ch in text):
+                continue
+            x0 = min(c[0] for c in run)
+            y0 = min(c[1] for c in run)
+            x1 = max(c[0] + c[2] for c in run)
+            y1 = max(c[1] + c[3] for c in run)
+            bbox = [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+            out.append((bbox, text, max(0.0, worst)))
+        return out
+
+
+# ============================================================
+# Routing
+# ============================================================
+class OCRRouter:
+    """
+    Maps (kind, project) -> ordered backend names.
+    routes: {"score": ["digits", "easyocr"], "Kaito:score": ["easyocr"], ...}
+    The most specific key wins: "<project>:<kind>", then "<kind>", then "default".
+    """
+
+    def __init__(self, backends: dict, routes: dict | None = None):
+        self.backends = backends
+        self.routes = {"default": ["easyocr"]}
+        self.routes.update(routes or {})
+
+    def backends_for(self, kind: str, project: str | None = None) -> list:
+        names = (self.routes.get(f"{project}:{kind}") if project else None) \
+            or self.routes.get(kind) or self.routes["default"]
+        out = [self.backends[n] for n in names if n in self.backends and self.backends[n].available()]
+        return out or [self.backends["easyocr"]]
+
+
+def parse_routes(raw: str) -> dict:
+    """OCR_ROUTES env/config value: JSON object of route key -> list or comma string of backend names."""
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return {}
+    out = {}
+    for k, v in data.items():
+        if isinstance(v, str):
+            v = [x.strip() for x in v.split(",") if x.strip()]
+        if isinstance(v, list):
+            out[str(k)] = [str(x) for x in v]
+    return out
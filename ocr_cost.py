@@ -0,0 +1,110 @@
+"""
+Predicted cost of a /verify OCR job, for the scheduler in ocr_limiter.py.
+
+A job is a set of screenshots with one project hint. Each screenshot costs the
+ROI fast path (roughly constant per hint) plus, when the fast path misses, a
+full-image OCR whose time grows with the pixel count after MAX_IMAGE_SIDE
+downscaling:
+
+  cost = sum(fast_s[hint] + (1 - hit_rate[hint]) * full_s_per_mp * megapixels)
+
+All three are learned online from finished jobs (per-observation averages
+that settle into an EWMA), starting from priors that are only meant to rank
+jobs sensibly until real numbers arrive. `snapshot()`/`load()` let the
+learned values survive restarts.
+"""
+import io
+import json
+
+# Priors: hinted projects usually hit the ROI fast path, "auto" often does not
+_PRIOR_HIT = {"auto": 0.3}
+_PRIOR_HIT_DEFAULT = 0.7
+_PRIOR_FAST_S = 0.4
+_PRIOR_FULL_S_PER_MP = 4.0
+_MIN_ALPHA = 0.05
+
+
+def _blend(old: float, new: float, n: int) -> float:
+    # running mean for the first 1/_MIN_ALPHA observations, EWMA afterwards
+    return old + (new - old) * max(_MIN_ALPHA, 1.0 / n)
+
+
+def image_size(image_bytes: bytes) -> tuple[int, int] | None:
+    """(width, height) from the image header, without decoding pixels."""
+    try:
+        from PIL import Image  # type: ignore
+        with Image.open(io.BytesIO(image_bytes)) as im:
+            return im.size
+    except Exception:
+        return None
+
+
+class CostModel:
+    def __init__(self, max_side: int = 1600):
+        self.max_side = max_side
+        self.hit = {}    # hint -> [rate, n]
+        self.fast = {}   # hint -> [seconds, n]
+        self.full = [_PRIOR_FULL_S_PER_MP, 0]
+        self.dirty = 0
+
+    def megapixels(self, size: tuple[int, int] | None) -> float:
+        if not size:
+            return (self.max_side * self.max_side * 0.75) / 1e6  # unknown: assume a large screenshot
+        w, h = size
+        scale = min(1.0, self.max_side / max(1, w, h)) if self.max_side else 1.0
+        return (w * scale) * (h * scale) / 1e6
+
+    def hit_rate(self, hint: str) -> float:
+        row = self.hit.get(hint)
+        return row[0] if row else _PRIOR_HIT.get(hint, _PRIOR_HIT_DEFAULT)
+
+    def miss_probability(self, hint: str) -> float:
+        return 1.0 - self.hit_rate(hint)
+
+    def estimate(self, hint: str, sizes: list) -> float:
+        """Expected seconds of OCR for screenshots of these (width, height) sizes."""
+        fast_s = self.fast.get(hint, [_PRIOR_FAST_S])[0]
+        miss = self.miss_probability(hint)
+        return sum(fast_s + miss * self.full[0] * self.megapixels(s) for s in sizes)
+
+    def observe(self, hint: str, size, fast_s: float, used_fast: bool, full_s: float = 0.0):
+        """Record one finished screenshot."""
+        for table, value, prior in (
+            (self.hit, 1.0 if used_fast else 0.0, self.hit_rate(hint)),
+            (self.fast, fast_s, self.fast.get(hint, [_PRIOR_FAST_S])[0]),
+        ):
+            row = table.setdefault(hint, [prior, 0])
+            row[1] += 1
+            row[0] = _blend(row[0], value, row[1])
+        if not used_fast and full_s > 0:
+            mp = self.megapixels(size)
+            if mp > 0:
+                self.full[1] += 1
+                self.full[0] = _blend(self.full[0], full_s / mp, self.full[1])
+        self.dirty += 1
+
+    def snapshot(self) -> str:
+        self.dirty = 0
+        return json.dumps({"hit": self.hit, "fast": self.fast, "full": self.full})
+
+    def load(self, raw: str | None):
+        if not raw:
+            return
+        try:
+            data = json.loads(raw)
+            self.hit = {k: list(v) for k, v in data.get("hit", {}).items()}
+            self.fast = {k: list(v) for k, v in data.get("fast", {}).items()}
+            self.full = list(data.get("full", self.full))
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"[ocr-cost] ignoring saved cost model: {e}")
+
+    def state(self) -> dict:
+        return {
+            "full_s_per_mp": round(self.full[0], 2),
+            "hints": {
+                hint: {"hit_rate": round(self.hit_rate(hint), 2),
+                       "fast_s": round(self.fast.get(hint, [_PRIOR_FAST_S])[0], 2),
+                       "jobs": self.hit.get(hint, [0, 0])[1]}
+                for hint in sorted(set(self.hit) | set(self.fast))
+            },
+        }
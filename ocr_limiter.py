@@ -0,0 +1,287 @@
+"""
+Adaptive concurrency limiter for OCR jobs.
+
+Drop-in replacement for the asyncio.Semaphore that guarded OCR
+(`async with OCR_SEMAPHORE:`). The number of concurrent jobs is tuned with
+AIMD, like TCP congestion control:
+  - additive increase (+1) while jobs are queueing, latency is near its
+    baseline and the CPU has headroom
+  - multiplicative decrease (x0.75) when latency inflates past the baseline
+    or the CPU is saturated
+Latency is compared as a multiple of each job's predicted cost, with separate
+baselines for jobs that stayed on the fast path and jobs that fell back to
+full OCR (`promote()`), so a window with more fallbacks is not mistaken for
+contention. PyTorch's intra-op thread count is re-split across the current
+limit so concurrent jobs don't oversubscribe the cores.
+
+Both the CPU reading (process_time) and the thread split only see this
+process: when OCR runs in worker processes or on remote nodes, leave
+`adaptive` and `tune_torch_threads` off (bot.py does).
+
+Queued jobs are not served FIFO but shortest-expected-job-first: `job(cost)`
+takes the predicted seconds of OCR (ocr_cost.py) and waiters are ordered by
+cost minus `aging` x seconds waited, so an expensive job is eventually served
+no matter how many cheap ones arrive. Jobs flagged `heavy` (likely full-OCR
+fallbacks) may hold at most `limit - reserved` slots, keeping a lane free
+for cheap jobs; a job that turns heavy mid-flight calls `promote()`.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+
+_current_job = contextvars.ContextVar("ocr_current_job", default=None)
+
+
+def _set_torch_threads(n: int) -> bool:
+    try:
+        import torch  # type: ignore
+        torch.set_num_threads(max(1, int(n)))
+        return True
+    except Exception:
+        return False
+
+
+class _Job:
+    """One slot request; the async context manager returned by AdaptiveLimiter.job()."""
+
+    def __init__(self, limiter, cost: float | None, heavy: bool):
+        self.limiter = limiter
+        self.cost = cost
+        self.heavy = heavy
+        self.start = None
+        self.wait = 0.0
+        self.deferred = False  # passed over at least once while its lane was full
+        self.fell_back = False  # promote()d: ran full OCR, so its latency has its own baseline
+
+    def promote(self):
+        """Count this job against the heavy lane from now on (it fell back to full OCR)."""
+        self.fell_back = True
+        if not self.heavy and self.start is not None:
+            self.heavy = True
+            self.limiter._heavy_in_flight += 1
+            self.limiter.promotions += 1
+
+    async def __aenter__(self):
+        await self.limiter._acquire(self)
+        self.start = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.limiter._release(self)
+        if exc_type is None:
+            self.limiter.observe(time.perf_counter() - self.start, cost=self.cost, fell_back=self.fell_back)
+        return False
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int | None = None,
+                 adaptive: bool = True, total_threads: int | None = None,
+                 latency_tolerance: float = 1.5, cpu_high: float = 0.90,
+                 decrease_factor: float = 0.75, tune_torch_threads: bool = True,
+                 aging: float = 1.0, reserved: int = 1):
+        self.total_threads = max(1, total_threads or os.cpu_count() or 1)
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit or self.total_threads)
+        self.limit = min(self.max_limit, max(self.min_limit, initial))
+        self.adaptive = adaptive
+        self.latency_tolerance = latency_tolerance
+        self.cpu_high = cpu_high
+        self.decrease_factor = decrease_factor
+        self.tune_torch_threads = tune_torch_threads
+        self.aging = max(0.0, aging)
+        self.reserved = max(0, reserved)
+
+        self._in_flight = 0
+        self._heavy_in_flight = 0
+        self._waiters = []  # heap of (priority, seq, job, future)
+        self._waiting = 0
+        self._seq = itertools.count()
+        self.promotions = 0
+        self.heavy_deferrals = 0
+
+        # Observations for the current adjustment window
+        self._win_latency = []
+        self._win_wait = []
+        self._win_wall = time.perf_counter()
+        self._win_cpu = time.process_time()
+
+        self.latency_baseline = {}  # "fast" / "full": latency per predicted second; "raw": unpriced seconds
+        self.latency_ewma = None
+        self.queue_wait_ewma = 0.0
+        self.cpu_util = 0.0
+        self.completed = 0
+        self.increases = 0
+        self.decreases = 0
+        self.torch_threads = None
+        self._apply_threads()
+
+    # ---- semaphore API ----
+    def locked(self) -> bool:
+        return self._in_flight >= self.limit
+
+    @property
+    def heavy_limit(self) -> int:
+        return max(1, self.limit - self.reserved)
+
+    def job(self, cost: float | None = None, heavy: bool = False) -> _Job:
+        """A slot for a job expected to take `cost` seconds (None = the running average)."""
+        return _Job(self, cost, heavy)
+
+    def _admissible(self, job: _Job) -> bool:
+        if self._in_flight >= self.limit:
+            return False
+        return not job.heavy or self._heavy_in_flight < self.heavy_limit
+
+    def _take(self, job: _Job):
+        self._in_flight += 1
+        if job.heavy:
+            self._heavy_in_flight += 1
+
+    async def _acquire(self, job: _Job):
+        t0 = time.perf_counter()
+        if not self._waiting and self._admissible(job):
+            self._take(job)
+        else:
+            cost = job.cost if job.cost is not None else (self.latency_ewma or 0.0)
+            # cost - aging * (now - t0) orders the same for every waiter as cost + aging * t0
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (cost + self.aging * t0, next(self._seq), job, fut))
+            self._waiting += 1
+            self._wake()
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # slot was handed over just as we were cancelled; give it back
+                    self._release(job)
+                else:
+                    fut.cancel()
+                    self._waiting -= 1
+                raise
+        job.wait = time.perf_counter() - t0
+        self._win_wait.append(job.wait)
+        self.queue_wait_ewma = 0.8 * self.queue_wait_ewma + 0.2 * job.wait
+
+    def _release(self, job: _Job):
+        self._in_flight -= 1
+        if job.heavy:
+            self._heavy_in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        """Hand free slots to the best-ranked waiters; heavy ones wait while their lane is full."""
+        skipped = []
+        while self._waiters and self._in_flight < self.limit:
+            entry = heapq.heappop(self._waiters)
+            job, fut = entry[2], entry[3]
+            if fut.done():
+                continue  # cancelled while queued
+            if not self._admissible(job):
+                skipped.append(entry)
+                continue
+            self._waiting -= 1
+            self._take(job)
+            fut.set_result(True)
+        for entry in skipped:
+            # Count jobs, not wake-ups: a queued heavy job is passed over on every _wake()
+            if not entry[2].deferred:
+                entry[2].deferred = True
+                self.heavy_deferrals += 1
+            heapq.heappush(self._waiters, entry)
+
+    async def __aenter__(self):
+        job = self.job()
+        await job.__aenter__()
+        _current_job.set(job)
+        return job
+
+    async def __aexit__(self, exc_type, exc, tb):
+        job = _current_job.get()
+        _current_job.set(None)
+        return await job.__aexit__(exc_type, exc, tb)
+
+    # ---- control loop ----
+    def observe(self, latency: float, cost: float | None = None, fell_back: bool = False):
+        """Record one finished job; adjusts the limit once per window of `limit` jobs."""
+        self.completed += 1
+        if cost:
+            self._win_latency.append(("full" if fell_back else "fast", latency / cost, latency))
+        else:
+            self._win_latency.append(("raw", latency, latency))
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        if len(self._win_latency) >= max(2, self.limit):
+            self._adjust()
+
+    def _adjust(self):
+        now_wall, now_cpu = time.perf_counter(), time.process_time()
+        elapsed = max(1e-6, now_wall - self._win_wall)
+        self.cpu_util = min(1.0, (now_cpu - self._win_cpu) / elapsed / self.total_threads)
+        avg_lat = sum(x[2] for x in self._win_latency) / len(self._win_latency)
+        queued = bool(self._waiting) or (self._win_wait and max(self._win_wait) > 0.05 * avg_lat)
+
+        inflation = 0.0
+        for kind in {x[0] for x in self._win_latency}:
+            vals = [x[1] for x in self._win_latency if x[0] == kind]
+            avg = sum(vals) / len(vals)
+            base = self.latency_baseline.get(kind)
+            if base is not None:
+                inflation = max(inflation, avg / max(1e-9, base))
+            if base is None or avg < base:
+                self.latency_baseline[kind] = avg
+            else:
+                # let the baseline drift up slowly so a changed workload mix is re-learned
+                self.latency_baseline[kind] = 0.95 * base + 0.05 * avg
+
+        if self.adaptive:
+            old = self.limit
+            inflated = inflation > self.latency_tolerance
+            if inflated or self.cpu_util >= self.cpu_high:
+                self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+            elif queued:
+                self.limit = min(self.max_limit, self.limit + 1)
+            if self.limit != old:
+                if self.limit > old:
+                    self.increases += 1
+                else:
+                    self.decreases += 1
+                self._apply_threads()
+                self._wake()
+                print(f"[ocr-limiter] limit {old} -> {self.limit} "
+                      f"(lat={avg_lat:.2f}s inflation={inflation:.2f}x cpu={self.cpu_util:.0%} "
+                      f"torch_threads={self.torch_threads})")
+
+        self._win_latency.clear()
+        self._win_wait.clear()
+        self._win_wall, self._win_cpu = now_wall, now_cpu
+
+    def _apply_threads(self):
+        if not self.tune_torch_threads:
+            return
+        n = max(1, self.total_threads // self.limit)
+        if n != self.torch_threads and _set_torch_threads(n):
+            self.torch_threads = n
+
+    def state(self) -> dict:
+        return {
+            "adaptive": self.adaptive,
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "heavy_in_flight": self._heavy_in_flight,
+            "heavy_limit": self.heavy_limit,
+            "heavy_deferrals": self.heavy_deferrals,
+            "promotions": self.promotions,
+            "torch_threads": self.torch_threads,
+            "latency_ewma_s": None if self.latency_ewma is None else round(self.latency_ewma, 3),
+            "latency_baseline": {k: round(v, 3) for k, v in self.latency_baseline.items()},
+            "queue_wait_ewma_s": round(self.queue_wait_ewma, 3),
+            "cpu_util": round(self.cpu_util, 3),
+            "completed": self.completed,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
@@ -0,0 +1,151 @@
+"""
+Client for remote OCR nodes (ocr_service.py).
+
+OCR_NODES lists base URLs, e.g. "http://10.0.0.5:8101,http://10.0.0.6:8101".
+Each request goes to the healthy node with the fewest outstanding requests
+(ties: lowest latency EWMA). A failed request marks the node down and is
+retried on the next node; when no node can take it analyze() returns None
+and the caller runs OCR locally. A background loop polls /health so nodes
+that come back are used again.
+"""
+import asyncio
+import time
+
+import aiohttp
+
+
+class _Node:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.failures = 0
+        self.served = 0
+        self.latency_ewma = None
+        self.last_error = None
+        self.down_since = None
+
+    def mark_ok(self, latency: float | None = None):
+        self.healthy = True
+        self.down_since = None
+        if latency is not None:
+            self.served += 1
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+    def mark_down(self, err: str):
+        self.failures += 1
+        self.last_error = err
+        if self.healthy:
+            self.down_since = time.time()
+        self.healthy = False
+
+    def state(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "served": self.served,
+            "failures": self.failures,
+            "latency_ms": round(self.latency_ewma * 1000.0, 1) if self.latency_ewma is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class OCRNodePool:
+    def __init__(self, urls: list[str], token: str = "", timeout: float = 30.0, health_interval: float = 10.0):
+        self.nodes = [_Node(u) for u in urls if u.strip()]
+        self.token = token
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.local_fallbacks = 0
+        self._session = None
+        self._health_task = None
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    def start(self):
+        if self.nodes and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def _candidates(self) -> list[_Node]:
+        healthy = [n for n in self.nodes if n.healthy]
+        return sorted(healthy, key=lambda n: (n.outstanding, n.latency_ewma or 0.0))
+
+    async def analyze(self, image_bytes: bytes, project_hint: str = "auto", expected_handle: str | None = None) -> dict | None:
+        """
+        Run the OCR pipeline on a remote node; None means: do it locally.
+        A result with an "error" key means the node could not decode the image (422).
+        Node faults (5xx, timeouts) fail over to the next node.
+        """
+        tried = set()
+        while True:
+            node = next((n for n in self._candidates() if n.url not in tried), None)
+            if node is None:
+                if self.nodes:
+                    self.local_fallbacks += 1
+                return None
+            tried.add(node.url)
+            node.outstanding += 1
+            t0 = time.perf_counter()
+            try:
+                async with self._get_session().post(
+                    f"{node.url}/ocr/analyze",
+                    params={"project_hint": project_hint or "auto",
+                            **({"expected_handle": expected_handle} if expected_handle else {})},
+                    data=image_bytes,
+                    headers={**self._headers(), "Content-Type": "application/octet-stream"},
+                ) as r:
+                    if r.status == 422:
+                        # The node is fine; the image isn't. Don't fail over, report it.
+                        node.mark_ok(time.perf_counter() - t0)
+                        return {"error": (await r.json()).get("detail", "unreadable image"), "node": node.url}
+                    if r.status == 413:
+                        # Too large for this node's body cap; local OCR has no cap
+                        node.mark_ok(time.perf_counter() - t0)
+                        self.local_fallbacks += 1
+                        return None
+                    if r.status != 200:
+                        raise RuntimeError(f"HTTP {r.status}: {(await r.text())[:200]}")
+                    out = await r.json()
+                node.mark_ok(time.perf_counter() - t0)
+                out["node"] = node.url
+                return out
+            except Exception as e:
+                node.mark_down(f"{type(e).__name__}: {e}")
+                print(f"[ocr-nodes] {node.url} failed ({e}); trying next")
+            finally:
+                node.outstanding -= 1
+
+    async def check(self, node: _Node):
+        try:
+            async with self._get_session().get(f"{node.url}/health", headers=self._headers(),
+                                               timeout=aiohttp.ClientTimeout(total=5)) as r:
+                if r.status != 200:
+                    raise RuntimeError(f"HTTP {r.status}")
+                await r.json()
+            if not node.healthy:
+                print(f"[ocr-nodes] {node.url} is back")
+            node.mark_ok()
+        except Exception as e:
+            node.mark_down(f"health: {type(e).__name__}: {e}")
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.gather(*(self.check(n) for n in self.nodes), return_exceptions=True)
+            await asyncio.sleep(self.health_interval)
+
+    def state(self) -> dict:
+        return {"nodes": [n.state() for n in self.nodes], "local_fallbacks": self.local_fallbacks}
@@ -0,0 +1,124 @@
+"""
+OCR node: the /verify OCR pipeline (ROI fast path + full-OCR fallback) over HTTP.
+
+Runs bot.py's pipeline without the Discord client, so OCR capacity can be added
+by starting more nodes and listing them in the bot's OCR_NODES.
+
+  POST /ocr/analyze?project_hint=auto[&expected_handle=name]   body: raw image bytes
+      -> {project, score, handle, used_fast, conf, phash, elapsed_ms}
+  GET  /health
+      -> {ok, in_flight, served, limiter}
+
+Several nodes on one machine:
+  OCR_NODE_PORT=8101 OCR_NODE_TOKEN=... python ocr_service.py
+  OCR_NODE_PORT=8102 OCR_NODE_TOKEN=... python ocr_service.py
+and in the bot: OCR_NODES=http://127.0.0.1:8101,http://127.0.0.1:8102 plus the same OCR_NODE_TOKEN.
+
+OCR_NODE_TOKEN is required, and request bodies are capped at OCR_NODE_MAX_BYTES.
+A node listens on 127.0.0.1 unless OCR_NODE_HOST says otherwise. 422 means the
+image could not be decoded; any other failure is a node fault (5xx), so the
+bot fails over to another node or its local OCR.
+"""
+import hmac
+import os
+import time
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+
+import bot
+import database
+import image_hash
+import ocr_cost
+
+OCR_NODE_TOKEN = os.environ.get("OCR_NODE_TOKEN", "")
+# Discord's attachment limit is 25 MB; nothing larger is a screenshot
+OCR_NODE_MAX_BYTES = int(os.environ.get("OCR_NODE_MAX_BYTES", str(25 * 1024 * 1024)) or 0)
+
+app = FastAPI()
+_stats = {"in_flight": 0, "served": 0, "errors": 0}
+
+
+@app.on_event("startup")
+async def startup_event():
+    await database.init_db()
+    bot.LEARNED_ROIS.load(await database.load_learned_rois())
+    bot.OCR_COSTS.load(await database.get_meta("ocr_cost_model"))
+
+def _check_token(authorization: str | None):
+    if not OCR_NODE_TOKEN:
+        raise HTTPException(503, "OCR node disabled: set OCR_NODE_TOKEN")
+    expected = f"Bearer {OCR_NODE_TOKEN}"
+    if not authorization or not hmac.compare_digest(authorization, expected):
+        raise HTTPException(401, "node token required")
+
+async def _read_body(request: Request) -> bytes:
+    """The request body, refusing (413) anything over OCR_NODE_MAX_BYTES before it is buffered."""
+    declared = request.headers.get("content-length", "")
+    if OCR_NODE_MAX_BYTES and declared.isdigit() and int(declared) > OCR_NODE_MAX_BYTES:
+        raise HTTPException(413, f"image larger than {OCR_NODE_MAX_BYTES} bytes")
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if OCR_NODE_MAX_BYTES and size > OCR_NODE_MAX_BYTES:
+            raise HTTPException(413, f"image larger than {OCR_NODE_MAX_BYTES} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+@app.post("/ocr/analyze")
+async def ocr_analyze(
+    request: Request,
+    project_hint: str = Query("auto"),
+    expected_handle: str = Query(None),
+    authorization: str = Header(None),
+):
+    _check_token(authorization)
+    data = await _read_body(request)
+    if not data:
+        raise HTTPException(422, "empty body")
+    size = ocr_cost.image_size(data)
+    if size is None:
+        raise HTTPException(422, "not a decodable image")
+
+    _stats["in_flight"] += 1
+    t0 = time.perf_counter()
+    try:
+        async with bot.ocr_job(project_hint, [size]) as job:
+            t_acquired = time.perf_counter()
+            fast = await bot.detect_project_score_and_handle(
+                data, project_hint=project_hint, expected_handle=expected_handle
+            )
+            t_fast = time.perf_counter()
+            if bot.needs_full_ocr(project_hint, fast):
+                job.promote()
+            pil_img, project, score, handle = await bot.complete_with_full_ocr(data, project_hint, fast)
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"[ocr-node] analyze failed: {type(e).__name__}: {e}")
+        raise HTTPException(500, f"OCR failed: {type(e).__name__}: {e}")
+    finally:
+        _stats["in_flight"] -= 1
+    _stats["served"] += 1
+    await bot.record_ocr_costs(project_hint, [size], t_fast - t_acquired, [fast], [time.perf_counter() - t_fast])
+
+    phash = image_hash.dhash(pil_img) if pil_img is not None else None
+    return {
+        "project": project,
+        "score": str(score) if score else None,
+        "handle": handle,
+        "used_fast": bool(fast[4]),
+        "conf": fast[5],
+        "phash": image_hash.to_hex(phash),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+    }
+
+@app.get("/health")
+async def health(authorization: str = Header(None)):
+    _check_token(authorization)
+    return {"ok": True, **_stats, "limiter": bot.OCR_SEMAPHORE.state()}
+
+if __name__ == "__main__":
+    if not OCR_NODE_TOKEN:
+        raise SystemExit("OCR_NODE_TOKEN is not set; refusing to serve OCR without it.")
+    import uvicorn
+    port = int(os.environ.get("OCR_NODE_PORT", "8101"))
+    uvicorn.run(app, host=os.environ.get("OCR_NODE_HOST", "127.0.0.1"), port=port)
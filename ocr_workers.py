@@ -0,0 +1,484 @@
+"""
+OCR worker processes with recycling.
+
+PyTorch / allocator fragmentation makes a long-lived easyocr.Reader's RSS
+creep up. With OCR_WORKERS > 0 the bot keeps no Reader of its own; instead a
+WorkerPool runs N worker processes, each holding its own Reader, and exposes
+the same blocking readtext/detect/recognize calls (so existing
+asyncio.to_thread call sites work unchanged).
+
+A worker is recycled after `max_jobs` jobs or once its RSS crosses
+`max_rss_mb`: a replacement is spawned and warmed up first, and only when it is
+ready is the old worker retired, so capacity never drops. Current and
+high-water RSS are tracked per worker (and kept for retired ones).
+
+Workers are separate interpreters, not multiprocessing children, so bot.py's
+module-level setup never runs in them. By default (`shared=True`) a model host
+(`python ocr_workers.py --host`) loads the Reader once and forks each worker
+from itself: the weights are shared copy-on-write, so a worker costs only its
+private memory and is ready in milliseconds instead of seconds. The host never
+runs inference itself and is pinned to one thread (forking after PyTorch starts
+its thread pools is unsafe); workers pick their own thread count. With
+gpu=True workers fall back to separate interpreters (`--worker`), since CUDA
+state cannot be forked. Shared workers are recycled on private memory (USS),
+as the shared weight pages are not what creeps.
+"""
+import gc
+import json
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.reduction
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import resource  # Unix-only; workers need POSIX anyway (pass_fds, fork)
+except ImportError:
+    resource = None
+
+_OPS = ("readtext", "detect", "recognize")
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except Exception:
+        return _peak_rss_mb()
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    if resource is None:
+        return 0.0
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r / 1e6 if sys.platform == "darwin" else r / 1e3
+
+def _private_mb() -> float:
+    """Memory only this process holds (USS); pages shared with the model host don't count."""
+    try:
+        kb = 0
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                    kb += int(line.split()[1])
+        return kb / 1e3
+    except Exception:
+        return _rss_mb()
+
+def _mem() -> tuple:
+    return _rss_mb(), _peak_rss_mb(), _private_mb()
+
+
+# ============================================================
+# Worker / model host processes
+# ============================================================
+def _set_threads(cfg: dict):
+    if cfg.get("threads"):
+        try:
+            import torch  # type: ignore
+            torch.set_num_threads(int(cfg["threads"]))
+        except Exception:
+            pass
+
+def _load_reader(cfg: dict):
+    _set_threads(cfg)
+    import easyocr  # type: ignore
+    try:
+        return easyocr.Reader(cfg.get("langs") or ["en"], gpu=bool(cfg.get("gpu")), verbose=False)
+    except TypeError:
+        return easyocr.Reader(cfg.get("langs") or ["en"], gpu=bool(cfg.get("gpu")))
+
+def _worker_main(fd: int, cfg: dict):
+    conn = multiprocessing.connection.Connection(fd)
+    _serve(conn, _load_reader(cfg))
+
+def _host_main(fd: int, cfg: dict):
+    """Load the weights once, then fork one worker per ("spawn", <fd>) request."""
+    ctl = multiprocessing.connection.Connection(fd)
+    # Pin the host to one thread before torch is imported: a fork inherits no threads, so
+    # an OpenMP/MKL pool started here would be left dead (and its locks held) in every worker.
+    # Each worker sets its own thread count after the fork.
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = "1"
+    reader = _load_reader(dict(cfg, threads=1))
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # workers are reaped automatically
+    # Keep the GC from touching (and so un-sharing) the host's objects in every worker
+    gc.collect()
+    gc.freeze()
+    ctl.send(("ready", None) + _mem())
+    while True:
+        try:
+            msg = ctl.recv()
+            if msg is None:
+                return
+            worker_fd = multiprocessing.reduction.recv_handle(ctl)
+        except (EOFError, OSError):
+            return
+        pid = os.fork()
+        if pid == 0:
+            ctl.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            try:
+                _set_threads(cfg)
+                _serve(multiprocessing.connection.Connection(worker_fd), reader)
+            finally:
+                os._exit(0)
+        os.close(worker_fd)
+        ctl.send(("spawned", pid) + _mem())
+
+def _serve(conn, reader):
+    conn.send(("ready", None) + _mem())
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg is None:
+            return
+        op, args, kwargs = msg
+        try:
+            if op not in _OPS:
+                raise ValueError(f"unsupported op {op!r}")
+            out = ("ok", getattr(reader, op)(*args, **kwargs))
+        except Exception as e:
+            out = ("err", f"{type(e).__name__}: {e}")
+        conn.send(out + _mem())
+
+
+# ============================================================
+# Parent side
+# ============================================================
+def _spawn(role: str, cfg: dict):
+    """Start `python ocr_workers.py --<role>`; returns (Popen, parent end of its pipe)."""
+    if os.name != "posix":
+        raise RuntimeError("OCR worker processes need a POSIX system (the pipe is passed as an inherited fd)")
+    parent, child = multiprocessing.Pipe()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), f"--{role}", str(child.fileno()), json.dumps(cfg)],
+        pass_fds=[child.fileno()],
+    )
+    child.close()
+    return proc, parent
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class _ModelHost:
+    """The process holding the loaded weights; workers are forked from it."""
+
+    def __init__(self, cfg: dict, ready_timeout: float):
+        self.proc, self.conn = _spawn("host", cfg)
+        self._lock = threading.Lock()
+        self.rss_mb = 0.0
+        t0 = time.perf_counter()
+        try:
+            if not self.conn.poll(ready_timeout):
+                raise RuntimeError("timed out loading models")
+            status, _payload, self.rss_mb, _peak, _private = self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.stop()
+            raise RuntimeError(f"OCR model host {self.proc.pid} exited while loading") from e
+        except RuntimeError:
+            self.stop()
+            raise
+        self.load_s = time.perf_counter() - t0
+
+    @property
+    def pid(self) -> int:
+        return self.proc.pid
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def fork_worker(self, child_conn) -> int:
+        with self._lock:
+            self.conn.send("spawn")
+            multiprocessing.reduction.send_handle(self.conn, child_conn.fileno(), self.proc.pid)
+            _status, pid, self.rss_mb, _peak, _private = self.conn.recv()
+        return pid
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+            self.conn.close()
+        except Exception:
+            pass
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+    def state(self) -> dict:
+        return {"pid": self.pid, "rss_mb": round(self.rss_mb, 1), "load_s": round(self.load_s, 2)}
+
+
+class _Worker:
+    def __init__(self, cfg: dict, host: _ModelHost | None = None):
+        if host is None:
+            self.proc, self.conn = _spawn("worker", cfg)
+            self._pid = self.proc.pid
+        else:
+            # Forked by the host, so not our child: tracked by pid only
+            self.proc = None
+            self.conn, child = multiprocessing.Pipe()
+            try:
+                self._pid = host.fork_worker(child)
+            finally:
+                child.close()
+        self.started = time.time()
+        self.ready_s = None
+        self.jobs = 0
+        self.rss_mb = 0.0
+        self.peak_rss_mb = 0.0
+        self.private_mb = 0.0
+        self.ready = False
+        self.retiring = False
+        self.replacing = False
+        self.dead = False
+
+    @property
+    def pid(self) -> int:
+        return self._pid
+
+    def _track(self, rss: float, peak: float, private: float):
+        self.rss_mb = rss
+        self.peak_rss_mb = max(self.peak_rss_mb, peak, rss)
+        self.private_mb = private
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            if not self.conn.poll(timeout):
+                return False
+            status, _payload, rss, peak, private = self.conn.recv()
+        except (EOFError, OSError):
+            self.dead = True
+            return False
+        self._track(rss, peak, private)
+        self.ready = status == "ready"
+        self.ready_s = time.time() - self.started
+        return self.ready
+
+    def call(self, op: str, args: tuple, kwargs: dict):
+        try:
+            self.conn.send((op, args, kwargs))
+            status, payload, rss, peak, private = self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.dead = True
+            raise RuntimeError(f"OCR worker {self.pid} exited") from e
+        self.jobs += 1
+        self._track(rss, peak, private)
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        if self.proc is not None:
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+            return
+        deadline = time.time() + 5
+        while _pid_alive(self._pid) and time.time() < deadline:
+            time.sleep(0.05)
+        if _pid_alive(self._pid):
+            try:
+                os.kill(self._pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def state(self) -> dict:
+        return {
+            "pid": self.pid,
+            "jobs": self.jobs,
+            "rss_mb": round(self.rss_mb, 1),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "private_mb": round(self.private_mb, 1),
+            "ready_s": None if self.ready_s is None else round(self.ready_s, 2),
+            "age_s": int(time.time() - self.started),
+            "retiring": self.retiring,
+        }
+
+
+class WorkerPool:
+    """Drop-in for easyocr.Reader's readtext/detect/recognize, backed by recycled worker processes."""
+
+    def __init__(self, size: int, max_jobs: int = 500, max_rss_mb: float = 0.0, gpu: bool = False,
+                 langs: list[str] | None = None, threads: int | None = None, ready_timeout: float = 300.0,
+                 shared: bool = True):
+        self.size = max(1, size)
+        self.shared = shared and not gpu and hasattr(os, "fork")
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.ready_timeout = ready_timeout
+        self.cfg = {"gpu": gpu, "langs": langs or ["en"],
+                    "threads": threads or max(1, (os.cpu_count() or 1) // self.size)}
+        self._cond = threading.Condition()
+        self._idle = []
+        self._workers = []
+        self.recycled = {"jobs": 0, "rss": 0, "exited": 0}
+        self.retired_peak_rss_mb = 0.0
+        self._closed = False
+        self._host = None
+        self._host_lock = threading.Lock()
+
+    def _new_worker(self) -> _Worker:
+        if not self.shared:
+            return _Worker(self.cfg)
+        with self._host_lock:
+            if self._host is None or not self._host.alive:
+                if self._host is not None:
+                    print(f"[ocr-workers] model host {self._host.pid} exited; reloading")
+                self._host = _ModelHost(self.cfg, self.ready_timeout)
+                print(f"[ocr-workers] model host {self._host.pid} loaded weights in {self._host.load_s:.1f}s "
+                      f"(rss {self._host.rss_mb:.0f}MB)")
+            host = self._host
+        return _Worker(self.cfg, host)
+
+    def start(self) -> "WorkerPool":
+        """Spawn all workers and wait for their models to load (blocking)."""
+        workers = [self._new_worker() for _ in range(self.size)]
+        for w in workers:
+            if not w.wait_ready(self.ready_timeout):
+                w.stop()
+                raise RuntimeError(f"OCR worker {w.pid} failed to start")
+        with self._cond:
+            self._workers += workers
+            self._idle += workers
+            self._cond.notify_all()
+        print(f"[ocr-workers] {self.size} worker(s) ready: pids {[w.pid for w in workers]}"
+              + (f", forked from model host {self._host.pid}" if self._host else ""))
+        return self
+
+    # ---- reader API ----
+    def readtext(self, *args, **kwargs):
+        return self._call("readtext", args, kwargs)
+
+    def detect(self, *args, **kwargs):
+        return self._call("detect", args, kwargs)
+
+    def recognize(self, *args, **kwargs):
+        return self._call("recognize", args, kwargs)
+
+    def _call(self, op: str, args: tuple, kwargs: dict):
+        w = self._acquire()
+        try:
+            return w.call(op, args, kwargs)
+        finally:
+            self._release(w)
+
+    def _acquire(self) -> _Worker:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("OCR worker pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                self._cond.wait()
+
+    def _release(self, w: _Worker):
+        with self._cond:
+            if w.dead:
+                self._workers.remove(w)
+                self._retire_stats(w, "exited")
+                threading.Thread(target=self._replace, args=(None,), daemon=True).start()
+                return
+            if w.retiring:
+                self._workers.remove(w)
+                threading.Thread(target=w.stop, daemon=True).start()
+                return
+            self._idle.append(w)
+            reason = None
+            if self.max_jobs and w.jobs >= self.max_jobs:
+                reason = "jobs"
+            elif self.max_rss_mb and (w.private_mb if self.shared else w.rss_mb) >= self.max_rss_mb:
+                reason = "rss"
+            if reason and not w.replacing:
+                # The old worker keeps serving until its replacement is warm
+                w.replacing = True
+                self._retire_stats(w, reason)
+                threading.Thread(target=self._replace, args=(w,), daemon=True).start()
+            self._cond.notify()
+
+    def _retire_stats(self, w: _Worker, reason: str):
+        self.recycled[reason] += 1
+        self.retired_peak_rss_mb = max(self.retired_peak_rss_mb, w.peak_rss_mb)
+        print(f"[ocr-workers] recycling worker {w.pid} ({reason}): {w.jobs} jobs, "
+              f"rss {w.rss_mb:.0f}MB, private {w.private_mb:.0f}MB, peak {w.peak_rss_mb:.0f}MB")
+
+    def _replace(self, old: _Worker | None):
+        try:
+            new = self._new_worker()
+            ok = new.wait_ready(self.ready_timeout)
+        except Exception as e:
+            new, ok = None, False
+            print(f"[ocr-workers] failed to spawn replacement: {e}")
+        with self._cond:
+            if not ok or self._closed:
+                if new is not None:
+                    threading.Thread(target=new.stop, daemon=True).start()
+                if old is not None:
+                    old.replacing = False  # retried on its next release
+                elif not self._closed:
+                    threading.Timer(5.0, self._replace, args=(None,)).start()
+                return
+            self._workers.append(new)
+            self._idle.append(new)
+            if old is not None:
+                old.retiring = True
+                if old in self._idle:
+                    self._idle.remove(old)
+                    self._workers.remove(old)
+                    threading.Thread(target=old.stop, daemon=True).start()
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            workers, self._workers, self._idle = list(self._workers), [], []
+            self._cond.notify_all()
+        for w in workers:
+            w.stop()
+        with self._host_lock:
+            if self._host is not None:
+                self._host.stop()
+                self._host = None
+
+    def state(self) -> dict:
+        with self._cond:
+            workers = [w.state() for w in self._workers]
+        return {
+            "host": self._host.state() if self._host else None,
+            "workers": workers,
+            "idle": len(self._idle),
+            "recycled": dict(self.recycled),
+            "peak_rss_mb": round(max([w["peak_rss_mb"] for w in workers] + [self.retired_peak_rss_mb]), 1),
+        }
+
+
+if __name__ == "__main__" and len(sys.argv) >= 4 and sys.argv[1] == "--worker":
+    _worker_main(int(sys.argv[2]), json.loads(sys.argv[3]))
+elif __name__ == "__main__" and len(sys.argv) >= 4 and sys.argv[1] == "--host":
+    _host_main(int(sys.argv[2]), json.loads(sys.argv[3]))
@@ -0,0 +1,112 @@
+"""
+Vectorized crop preprocessing for dark-mode / low-contrast dashboards.
+
+Runs between _crop_ratio and the recognizer. Modes:
+  - "none":   pass the RGB crop through unchanged
+  - "gray":   luminance only
+  - "invert": luminance, auto-invert dark backgrounds (dark text on light),
+              percentile contrast stretch
+  - "binary": "invert" + adaptive (local mean) threshold
+Per-mode latency and fast-path hit counts are kept in STATS so the effect of
+a mode can be compared in /ocrstatus or with bench_preprocess.py.
+"""
+import time
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+
+try:
+    import cv2  # type: ignore
+except Exception:
+    cv2 = None  # type: ignore
+
+MODES = ("none", "gray", "invert", "binary")
+_LUMA = (0.299, 0.587, 0.114)
+
+STATS = {}  # mode -> {"calls", "total_ms", "attempts", "hits"}
+
+
+def luminance(arr):
+    if arr.ndim == 2:
+        return arr.astype(np.float32)
+    return arr[..., :3].astype(np.float32) @ np.asarray(_LUMA, dtype=np.float32)
+
+
+def auto_invert(lum):
+    """Make text dark on a light background; a dark median means a dark theme."""
+    if float(np.median(lum)) < 128.0:
+        return 255.0 - lum
+    return lum
+
+
+def contrast_stretch(lum, lo_pct: float = 2.0, hi_pct: float = 98.0):
+    lo, hi = np.percentile(lum, (lo_pct, hi_pct))
+    if hi - lo < 1.0:
+        return lum
+    return np.clip((lum - lo) * (255.0 / (hi - lo)), 0.0, 255.0)
+
+
+def adaptive_threshold(lum, block: int = 31, c: float = 10.0):
+    """Pixel is foreground (0) when darker than its local mean minus c."""
+    u8 = lum.astype(np.uint8)
+    if cv2 is not None:
+        return cv2.adaptiveThreshold(u8, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block | 1, c)
+    # Box-filter local mean with an integral image
+    r = block // 2
+    pad = np.pad(lum, r + 1, mode="edge").cumsum(0).cumsum(1)
+    h, w = lum.shape
+    y0, x0 = np.arange(h), np.arange(w)
+    y1, x1 = y0 + 2 * r + 1, x0 + 2 * r + 1
+    s = pad[y1][:, x1] - pad[y0][:, x1] - pad[y1][:, x0] + pad[y0][:, x0]
+    mean = s / float((2 * r + 1) ** 2)
+    return np.where(lum > mean - c, 255, 0).astype(np.uint8)
+
+
+def parse_modes(raw: str) -> dict:
+    """PREPROCESS_MODES value: comma-separated key=mode, e.g. "Kaito=invert,Kaito:handle=gray,default=none"."""
+    out = {}
+    for item in (raw or "").split(","):
+        if not item.strip():
+            continue
+        key, sep, mode = item.partition("=")
+        key, mode = key.strip(), mode.strip().lower()
+        if not sep or not key or mode not in MODES:
+            print(f"[preprocess] ignoring PREPROCESS_MODES entry {item.strip()!r} (want key={'|'.join(MODES)})")
+            continue
+        out[key] = mode
+    return out
+
+
+def apply(mode: str, arr):
+    """Preprocess an RGB uint8 crop; returns an array EasyOCR / the digit reader accept."""
+    if np is None or not mode or mode == "none":
+        return arr
+    t0 = time.perf_counter()
+    lum = luminance(arr)
+    if mode != "gray":
+        lum = contrast_stretch(auto_invert(lum))
+    out = adaptive_threshold(lum) if mode == "binary" else lum.astype(np.uint8)
+    st = STATS.setdefault(mode, {"calls": 0, "total_ms": 0.0, "attempts": 0, "hits": 0})
+    st["calls"] += 1
+    st["total_ms"] += (time.perf_counter() - t0) * 1000.0
+    return out
+
+
+def record_outcome(mode: str, hit: bool):
+    st = STATS.setdefault(mode or "none", {"calls": 0, "total_ms": 0.0, "attempts": 0, "hits": 0})
+    st["attempts"] += 1
+    if hit:
+        st["hits"] += 1
+
+
+def summary() -> dict:
+    out = {}
+    for mode, st in STATS.items():
+        out[mode] = {
+            "avg_ms": round(st["total_ms"] / st["calls"], 3) if st["calls"] else 0.0,
+            "hit_rate": round(st["hits"] / st["attempts"], 3) if st["attempts"] else None,
+            "attempts": st["attempts"],
+        }
+    return out
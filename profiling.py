@@ -0,0 +1,172 @@
+"""
+On-demand profiling for slow verifications.
+
+Two triggers:
+  - armed: an admin arms the hook for the next N requests; each one runs under
+    cProfile (event-loop thread, written as .pstats) plus the stack sampler
+  - slow threshold: with slow_ms > 0 every request runs under the stack
+    sampler, and its collapsed stacks are kept only if it took longer than
+    the threshold
+
+The sampler walks sys._current_frames() from a background thread, so it also
+sees the asyncio.to_thread workers where decode/detection/recognition run.
+Output is flamegraph-compatible collapsed stacks ("a;b;c count"), written
+(and the output directory rotated) in a worker thread, off the event loop.
+When neither trigger is active, start() returns None and finish() is a no-op.
+"""
+import asyncio
+import collections
+import cProfile
+import os
+import sys
+import threading
+import time
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+
+class _StackSampler:
+    """One shared sampling thread; every active session receives every sample."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def attach(self, session):
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def detach(self, session):
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions)
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = []
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                parts = []
+                while frame is not None:
+                    parts.append(_frame_label(frame))
+                    frame = frame.f_back
+                parts.append(names.get(tid, str(tid)))
+                stacks.append(";".join(reversed(parts)))
+            for s in sessions:
+                s.samples.update(stacks)
+            time.sleep(self.interval)
+
+
+class ProfileSession:
+    def __init__(self, label: str, armed: bool):
+        self.label = label
+        self.armed = armed
+        self.started = time.perf_counter()
+        self.samples = collections.Counter()
+        self.cprofile = None
+
+
+class ProfileHook:
+    def __init__(self, out_dir: str = "profiles", slow_ms: int = 0, keep: int = 20, sample_ms: int = 5):
+        self.out_dir = out_dir
+        self.slow_ms = slow_ms
+        self.keep = keep
+        self._armed = 0
+        self._cprofile_busy = False
+        self._sampler = _StackSampler(max(0.001, sample_ms / 1000.0))
+        self._write_lock = threading.Lock()  # finishes run in parallel threads; rotate one at a time
+        self.captured = 0
+
+    @property
+    def armed(self) -> int:
+        return self._armed
+
+    def arm(self, n: int):
+        self._armed = max(0, int(n))
+
+    def start(self, label: str):
+        """Begin a session for one request, or return None when disarmed."""
+        if not self._armed and self.slow_ms <= 0:
+            return None
+        armed = self._armed > 0
+        if armed:
+            self._armed -= 1
+        sess = ProfileSession(label, armed)
+        if armed and not self._cprofile_busy:
+            # cProfile is per-thread and only one may be active on the loop thread
+            self._cprofile_busy = True
+            sess.cprofile = cProfile.Profile()
+            sess.cprofile.enable()
+        self._sampler.attach(sess)
+        return sess
+
+    async def finish(self, sess) -> list[str]:
+        """End a session; writes files if it was armed or slower than the threshold."""
+        if sess is None:
+            return []
+        self._sampler.detach(sess)
+        if sess.cprofile is not None:
+            sess.cprofile.disable()
+            self._cprofile_busy = False
+        elapsed_ms = (time.perf_counter() - sess.started) * 1000.0
+        slow = self.slow_ms > 0 and elapsed_ms >= self.slow_ms
+        if not (sess.armed or slow):
+            return []
+        return await asyncio.to_thread(self._write, sess, elapsed_ms)
+
+    def _write(self, sess, elapsed_ms: float) -> list[str]:
+        os.makedirs(self.out_dir, exist_ok=True)
+        stem = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{sess.label}-{int(elapsed_ms)}ms")
+        written = []
+        if sess.samples:
+            path = stem + ".collapsed"
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in sess.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            written.append(path)
+        if sess.cprofile is not None:
+            path = stem + ".pstats"
+            sess.cprofile.dump_stats(path)
+            written.append(path)
+        with self._write_lock:
+            self.captured += 1
+            self._rotate()
+        print(f"[profile] {sess.label} took {elapsed_ms:.0f}ms -> {', '.join(written) or 'no samples'}")
+        return written
+
+    def _rotate(self):
+        if self.keep <= 0:
+            return
+        try:
+            files = [os.path.join(self.out_dir, n) for n in os.listdir(self.out_dir)
+                     if n.endswith((".collapsed", ".pstats"))]
+        except FileNotFoundError:
+            return
+        files.sort(key=os.path.getmtime)
+        # keep is a per-request limit; each capture may write two files
+        stems = []
+        for p in files:
+            stem = p.rsplit(".", 1)[0]
+            if stem not in stems:
+                stems.append(stem)
+        for stem in stems[:-self.keep]:
+            for ext in (".collapsed", ".pstats"):
+                try:
+                    os.remove(stem + ext)
+                except FileNotFoundError:
+                    pass
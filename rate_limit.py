@@ -0,0 +1,79 @@
+"""
+In-memory token buckets for command cooldowns.
+
+Each key (a member id, a guild id) costs one small [tokens, last_refill] list.
+A bucket that has been idle long enough to refill completely is identical to
+a missing one, so such entries are dropped: idle keys expire after
+burst / rate seconds, and `max_keys` caps the table (least recently used
+first) in case of a burst of distinct keys.
+"""
+import collections
+import time
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate_per_min: float, burst: float, max_keys: int = 100_000, name: str = ""):
+        self.name = name
+        self.rate = max(0.0, rate_per_min) / 60.0  # tokens per second
+        self.burst = max(1.0, burst)
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()  # key -> [tokens, last_ts]
+        self.allowed = 0
+        self.rejected = 0
+        self._last_sweep = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    @property
+    def idle_ttl(self) -> float:
+        return self.burst / self.rate if self.rate else 0.0
+
+    def try_acquire(self, key, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0.0 if allowed, otherwise seconds until it would be."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        b = self._buckets.get(key)
+        if b is None:
+            b = [self.burst, now]
+            self._buckets[key] = b
+        else:
+            b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+            b[1] = now
+            self._buckets.move_to_end(key)
+        self._maybe_sweep(now)
+        if b[0] >= cost:
+            b[0] -= cost
+            self.allowed += 1
+            return 0.0
+        self.rejected += 1
+        return (cost - b[0]) / self.rate
+
+    def refund(self, key, cost: float = 1.0):
+        b = self._buckets.get(key)
+        if b is not None:
+            b[0] = min(self.burst, b[0] + cost)
+
+    def _maybe_sweep(self, now: float):
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        if now - self._last_sweep < self.idle_ttl:
+            return
+        self._last_sweep = now
+        # OrderedDict is in last-use order, so stop at the first bucket still refilling
+        while self._buckets:
+            key, b = next(iter(self._buckets.items()))
+            if now - b[1] < self.idle_ttl:
+                break
+            self._buckets.popitem(last=False)
+
+    def state(self) -> dict:
+        return {
+            "rate_per_min": round(self.rate * 60.0, 2),
+            "burst": self.burst,
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,129 @@
+"""
+Replay captured /verify screenshots through the current OCR pipeline.
+
+Each capture (see capture.py) is run through the same fast path + full-OCR
+fallback as verify_cmd, with the recorded project hint, and compared with
+what the bot answered when it was captured:
+  - agreement on project, score and handle (and a list of the differences)
+  - fast-path acceptance rate then vs now
+  - latency percentiles of the recorded OCR stages vs the replayed ones
+
+ROI learning is frozen during a replay so every capture sees the same model.
+
+  python replay.py ./captures --diffs 20 --json report.json
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import capture
+
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def _norm(v):
+    return str(v).replace(",", "").strip().lower() if v else None
+
+
+async def replay(path: str, limit: int = 0) -> dict:
+    import bot
+    import database
+
+    try:
+        bot.LEARNED_ROIS.load(await database.load_learned_rois())
+    except Exception as e:
+        print(f"[replay] no learned ROIs loaded: {e}")
+
+    async def _frozen(*_args, **_kwargs):
+        return None
+    bot.learn_rois_from_full_ocr = _frozen
+
+    rows = []
+    for meta, data in capture.iter_captures(path):
+        hint = meta.get("project_hint") or "auto"
+        t0 = time.perf_counter()
+        # Captures record the member's linked handle; the targeted identity check needs it
+        fast = await bot.detect_project_score_and_handle(data, project_hint=hint,
+                                                         expected_handle=meta.get("expected_handle"))
+        t_fast = time.perf_counter()
+        _img, project, score, handle = await bot.complete_with_full_ocr(data, hint, fast)
+        t_full = time.perf_counter()
+        rec = meta.get("timings") or {}
+        rows.append({
+            "id": meta.get("id"),
+            "was": {"project": meta.get("project"), "score": meta.get("score"), "handle": meta.get("handle")},
+            "now": {"project": project, "score": str(score) if score else None, "handle": handle},
+            "was_fast": bool(meta.get("used_fast")),
+            "now_fast": bool(fast[4]),
+            # A recorded batch shares one fast pass; its per-image share is the fair comparison
+            "was_ms": rec.get("fast_ms", 0.0) / max(1, meta.get("batch_size") or 1) + rec.get("full_ms", 0.0),
+            "now_ms": (t_full - t0) * 1000.0,
+            "now_fast_ms": (t_fast - t0) * 1000.0,
+        })
+        if limit and len(rows) >= limit:
+            break
+    return summarize(rows)
+
+
+def summarize(rows: list[dict]) -> dict:
+    n = len(rows)
+    agree = {k: 0 for k in ("project", "score", "handle")}
+    diffs = []
+    for r in rows:
+        changed = {}
+        for k in agree:
+            if _norm(r["was"][k]) == _norm(r["now"][k]):
+                agree[k] += 1
+            else:
+                changed[k] = [r["was"][k], r["now"][k]]
+        if changed:
+            diffs.append({"id": r["id"], **changed})
+    was_ms = [r["was_ms"] for r in rows]
+    now_ms = [r["now_ms"] for r in rows]
+    return {
+        "captures": n,
+        "agreement": {k: round(v / n, 4) if n else None for k, v in agree.items()},
+        "fast_rate": {
+            "was": round(sum(r["was_fast"] for r in rows) / n, 4) if n else None,
+            "now": round(sum(r["now_fast"] for r in rows) / n, 4) if n else None,
+        },
+        "latency_ms": {
+            "was": {"p50": round(_pct(was_ms, 0.5), 1), "p95": round(_pct(was_ms, 0.95), 1)},
+            "now": {"p50": round(_pct(now_ms, 0.5), 1), "p95": round(_pct(now_ms, 0.95), 1)},
+        },
+        "diffs": diffs,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("archive", nargs="?", default="captures")
+    ap.add_argument("--limit", type=int, default=0, help="replay at most N captures")
+    ap.add_argument("--diffs", type=int, default=20, help="print at most N differing captures")
+    ap.add_argument("--json", default="", help="also write the full report here")
+    args = ap.parse_args()
+
+    report = asyncio.run(replay(args.archive, args.limit))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"captures: {report['captures']}")
+    for k, v in report["agreement"].items():
+        print(f"  {k:<8} agreement: {v}")
+    print(f"  fast path: was {report['fast_rate']['was']}, now {report['fast_rate']['now']}")
+    lat = report["latency_ms"]
+    print(f"  OCR latency p50/p95: was {lat['was']['p50']}/{lat['was']['p95']}ms, now {lat['now']['p50']}/{lat['now']['p95']}ms")
+    for d in report["diffs"][:args.diffs]:
+        changes = ", ".join(f"{k}: {v[0]!r} -> {v[1]!r}" for k, v in d.items() if k != "id")
+        print(f"  {d['id']}: {changes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Self-calibrating ROIs.
+
+When the full-OCR fallback finds the score/handle, the normalized box of that
+token is recorded per (project, kind, aspect-ratio bucket). Each key keeps an
+EWMA of the box plus an EWMA of its deviation; the learned ROI is that box
+padded by the deviation, and is tried before the static SCORE_ROIS/HANDLE_ROIS.
+"""
+import time
+
+ALPHA = 0.2  # EWMA weight of a new observation
+
+
+def aspect_bucket(size) -> str:
+    w, h = size
+    return f"{round(h / float(max(1, w)), 1):.1f}"
+
+
+def normalize_bbox(bbox, size):
+    """readtext 4-point bbox -> (x0, y0, x1, y1) as ratios of the image size."""
+    w, h = size
+    xs = [p[0] for p in bbox]
+    ys = [p[1] for p in bbox]
+    return (
+        max(0.0, min(xs) / float(w)),
+        max(0.0, min(ys) / float(h)),
+        min(1.0, max(xs) / float(w)),
+        min(1.0, max(ys) / float(h)),
+    )
+
+
+class RoiLearner:
+    def __init__(self, min_samples: int = 3, pad_x: float = 0.6, pad_y: float = 0.5):
+        self.min_samples = min_samples
+        self.pad_x = pad_x  # fraction of box width added each side (digit counts vary)
+        self.pad_y = pad_y  # fraction of box height added above/below
+        self._rows = {}     # (project, kind, bucket) -> row dict
+
+    def load(self, rows):
+        for r in rows:
+            self._rows[(r["project"], r["kind"], r["bucket"])] = dict(r)
+
+    def observe(self, project: str, kind: str, size, bbox) -> dict:
+        """Fold one successful extraction into the model; returns the row to persist."""
+        box = normalize_bbox(bbox, size)
+        key = (project, kind, aspect_bucket(size))
+        row = self._rows.get(key)
+        if row is None:
+            row = {"project": key[0], "kind": key[1], "bucket": key[2],
+                   "x0": box[0], "y0": box[1], "x1": box[2], "y1": box[3],
+                   "dev": 0.0, "samples": 0}
+        else:
+            dev = max(abs(box[0] - row["x0"]), abs(box[1] - row["y0"]),
+                      abs(box[2] - row["x1"]), abs(box[3] - row["y1"]))
+            for i, k in enumerate(("x0", "y0", "x1", "y1")):
+                row[k] = (1 - ALPHA) * row[k] + ALPHA * box[i]
+            row["dev"] = (1 - ALPHA) * row["dev"] + ALPHA * dev
+        row["samples"] += 1
+        row["updated_at"] = int(time.time())
+        self._rows[key] = row
+        return row
+
+    def rois(self, project: str, kind: str, size) -> list[tuple]:
+        """Learned ROI for this layout bucket (empty until it has min_samples)."""
+        row = self._rows.get((project, kind, aspect_bucket(size)))
+        if not row or row["samples"] < self.min_samples:
+            return []
+        bw, bh = row["x1"] - row["x0"], row["y1"] - row["y0"]
+        px = self.pad_x * bw + 2 * row["dev"]
+        py = self.pad_y * bh + 2 * row["dev"]
+        return [(
+            max(0.0, row["x0"] - px),
+            max(0.0, row["y0"] - py),
+            min(1.0, row["x1"] + px),
+            min(1.0, row["y1"] + py),
+        )]
+
+    def snapshot(self) -> list[dict]:
+        return [dict(r) for r in self._rows.values()]
@@ -0,0 +1,118 @@
+"""
+Background tier-role reconciliation.
+
+Walks a guild's members in id order with guild.fetch_members (paginated HTTP,
+so nothing is cached), in chunks of `chunk_size`. For each chunk the latest
+recorded tier of those members is read from member_latest_tier in one query,
+and only members whose tier roles differ are queued for the role editor,
+which applies edits at `edits_per_minute`. After a chunk's edits are done its
+last member id is checkpointed in `meta`, so an interrupted pass resumes
+where it stopped.
+
+Members with no recorded tier keep whatever tier roles they have unless
+`remove_untracked` is set (roles granted by hand are left alone by default).
+"""
+import asyncio
+import time
+
+import discord
+
+import database
+
+
+class RoleReconciler:
+    def __init__(self, tier_names: list[str], ensure_roles, chunk_size: int = 500,
+                 edits_per_minute: float = 30.0, remove_untracked: bool = False, store=database):
+        self.tier_names = list(tier_names)
+        self.ensure_roles = ensure_roles  # async (guild) -> {name: Role | None}
+        self.chunk_size = max(1, chunk_size)
+        self.edit_interval = 60.0 / edits_per_minute if edits_per_minute > 0 else 0.0
+        self.remove_untracked = remove_untracked
+        self.store = store  # anything with get_latest_tiers (database or a storage.Storage)
+        self.running = set()
+        self.last = {}  # guild_id -> stats of the last finished pass
+
+    @staticmethod
+    def _checkpoint_key(guild) -> str:
+        return f"reconcile_checkpoint:{guild.id}"
+
+    async def reconcile_guild(self, guild: discord.Guild) -> dict:
+        if guild.id in self.running:
+            return {"error": "already running"}
+        self.running.add(guild.id)
+        stats = {"started_at": int(time.time()), "scanned": 0, "differing": 0, "edited": 0,
+                 "failed": 0, "untracked": 0, "resumed_after": None, "complete": False}
+        try:
+            roles_map = await self.ensure_roles(guild)
+            if any(r is None for r in roles_map.values()):
+                stats["error"] = "missing tier roles (Manage Roles permission?)"
+                return stats
+
+            key = self._checkpoint_key(guild)
+            after = await database.get_meta(key)
+            kwargs = {"limit": None}
+            if after:
+                stats["resumed_after"] = after
+                kwargs["after"] = discord.Object(id=int(after))
+
+            queue = asyncio.Queue(maxsize=self.chunk_size)
+            editor = asyncio.create_task(self._editor(queue, roles_map, stats))
+            try:
+                chunk = []
+                async for member in guild.fetch_members(**kwargs):
+                    chunk.append(member)
+                    if len(chunk) >= self.chunk_size:
+                        await self._process_chunk(guild, chunk, roles_map, queue, stats)
+                        await queue.join()
+                        await database.set_meta(key, str(chunk[-1].id))
+                        chunk = []
+                if chunk:
+                    await self._process_chunk(guild, chunk, roles_map, queue, stats)
+                    await queue.join()
+                # Pass finished: the next one starts from the beginning
+                await database.set_meta(key, "")
+                stats["complete"] = True
+            finally:
+                editor.cancel()
+            return stats
+        finally:
+            stats["finished_at"] = int(time.time())
+            self.last[guild.id] = stats
+            self.running.discard(guild.id)
+            print(f"[reconcile] guild {guild.id}: {stats}")
+
+    async def _process_chunk(self, guild, chunk, roles_map, queue, stats):
+        latest = await self.store.get_latest_tiers(str(guild.id), [str(m.id) for m in chunk])
+        for member in chunk:
+            stats["scanned"] += 1
+            if member.bot:
+                continue
+            have = {n for n, r in roles_map.items() if r in member.roles}
+            want = latest.get(str(member.id))
+            if want not in self.tier_names:
+                want = None
+                if not self.remove_untracked:
+                    if have:
+                        stats["untracked"] += 1
+                    continue
+            if have != ({want} if want else set()):
+                stats["differing"] += 1
+                await queue.put((member, want))
+
+    async def _editor(self, queue, roles_map, stats):
+        while True:
+            member, want = await queue.get()
+            try:
+                remove = [r for n, r in roles_map.items() if n != want and r in member.roles]
+                if remove:
+                    await member.remove_roles(*remove, reason="Tier role reconciliation")
+                if want and roles_map[want] not in member.roles:
+                    await member.add_roles(roles_map[want], reason="Tier role reconciliation")
+                stats["edited"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"[reconcile] failed to update {member.id}: {e}")
+            finally:
+                queue.task_done()
+            if self.edit_interval:
+                await asyncio.sleep(self.edit_interval)
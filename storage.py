@@ -0,0 +1,209 @@
+"""
+Storage backends for state that every bot/shard process and verify_service
+replica must share: X links, verification history, OAuth pending state and
+the tier/stats reads derived from history.
+
+  SQLiteStorage  - database.py on a local file (the default; one host)
+  RemoteStorage  - the same operations against storage_service.py over HTTP,
+                   which owns the SQLite file; run one of those and point every
+                   process at it with STORAGE_URL=http://host:8200
+
+Per-process caches (learned ROIs, command-sync hashes, the perceptual-hash
+index) stay in each process's local database.py file.
+"""
+import aiohttp
+
+import database
+
+
+class Storage:
+    async def init(self):
+        raise NotImplementedError
+
+    async def get_link(self, discord_id: str) -> dict | None:
+        raise NotImplementedError
+
+    async def save_link(self, discord_id: str, data: dict):
+        raise NotImplementedError
+
+    async def delete_link(self, discord_id: str) -> bool:
+        raise NotImplementedError
+
+    async def log_result(self, **row):
+        raise NotImplementedError
+
+    async def pending_put(self, state: str, discord_id: str, code_verifier: str, ttl: int = 600):
+        raise NotImplementedError
+
+    async def pending_pop(self, state: str, ttl: int = 600) -> dict | None:
+        raise NotImplementedError
+
+    async def get_guild_stats(self, guild_id: str, days: int = 7) -> dict:
+        raise NotImplementedError
+
+    async def get_latest_tiers(self, guild_id: str, discord_ids: list[str]) -> dict:
+        raise NotImplementedError
+
+    async def get_link_versions(self, discord_ids: list[str]) -> dict:
+        raise NotImplementedError
+
+    def iter_links(self, discord_ids: list[str]):
+        """Async iterator of (discord_id, row-or-None) in request order."""
+        raise NotImplementedError
+
+    async def get_phash_page(self, after_id: int = 0, limit: int = 5000) -> list:
+        """[id, discord_id, phash_hex] rows with id > after_id, for incremental index loads."""
+        raise NotImplementedError
+
+    def iter_history(self, guild_id: str, since_ts: int | None = None, after_id: int = 0, chunk_size: int = 1000):
+        """Async iterator of history row lists (database.EXPORT_COLUMNS dicts) in id order."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    @property
+    def is_local(self) -> bool:
+        return False
+
+
+class SQLiteStorage(Storage):
+    """database.py as-is (calls go through the module so they can be patched)."""
+
+    @property
+    def is_local(self) -> bool:
+        return True
+
+    async def init(self):
+        await database.init_db()
+
+    async def get_link(self, discord_id):
+        return await database.get_link(discord_id)
+
+    async def save_link(self, discord_id, data):
+        await database.save_link(discord_id, data)
+
+    async def delete_link(self, discord_id):
+        return await database.delete_link(discord_id)
+
+    async def log_result(self, **row):
+        await database.log_result(**row)
+
+    async def pending_put(self, state, discord_id, code_verifier, ttl=600):
+        await database.pending_put(state, discord_id, code_verifier, ttl=ttl)
+
+    async def pending_pop(self, state, ttl=600):
+        return await database.pending_pop(state, ttl=ttl)
+
+    async def get_guild_stats(self, guild_id, days=7):
+        return await database.get_guild_stats(guild_id, days=days)
+
+    async def get_latest_tiers(self, guild_id, discord_ids):
+        return await database.get_latest_tiers(guild_id, discord_ids)
+
+    async def get_link_versions(self, discord_ids):
+        return await database.get_link_versions(discord_ids)
+
+    async def iter_links(self, discord_ids):
+        async for item in database.iter_links(discord_ids):
+            yield item
+
+    async def get_phash_page(self, after_id=0, limit=5000):
+        return await database.get_phash_page(after_id, limit)
+
+    async def iter_history(self, guild_id, since_ts=None, after_id=0, chunk_size=1000):
+        async for rows in database.iter_history(guild_id, since_ts=since_ts, after_id=after_id, chunk_size=chunk_size):
+            yield rows
+
+
+class RemoteStorage(Storage):
+    """Client for storage_service.py. Every call is one small JSON POST."""
+
+    def __init__(self, base_url: str, token: str = "", timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+            self._session = aiohttp.ClientSession(
+                headers=headers, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def _call(self, op: str, **payload):
+        async with self._get_session().post(f"{self.base_url}/storage/{op}", json=payload) as r:
+            if r.status != 200:
+                raise RuntimeError(f"storage {op} failed: HTTP {r.status}: {(await r.text())[:200]}")
+            return (await r.json()).get("result")
+
+    async def init(self):
+        await self._call("ping")
+
+    async def get_link(self, discord_id):
+        return await self._call("get_link", discord_id=discord_id)
+
+    async def save_link(self, discord_id, data):
+        await self._call("save_link", discord_id=discord_id, data=data)
+
+    async def delete_link(self, discord_id):
+        return await self._call("delete_link", discord_id=discord_id)
+
+    async def log_result(self, **row):
+        await self._call("log_result", **row)
+
+    async def pending_put(self, state, discord_id, code_verifier, ttl=600):
+        await self._call("pending_put", state=state, discord_id=discord_id, code_verifier=code_verifier, ttl=ttl)
+
+    async def pending_pop(self, state, ttl=600):
+        return await self._call("pending_pop", state=state, ttl=ttl)
+
+    async def get_guild_stats(self, guild_id, days=7):
+        return await self._call("get_guild_stats", guild_id=guild_id, days=days)
+
+    async def get_latest_tiers(self, guild_id, discord_ids):
+        return await self._call("get_latest_tiers", guild_id=guild_id, discord_ids=discord_ids)
+
+    async def get_link_versions(self, discord_ids):
+        out = {}
+        for chunk in database._chunks(discord_ids):
+            out.update(await self._call("get_link_versions", discord_ids=chunk))
+        return out
+
+    # The iterators below page through the service, one request per chunk
+
+    async def iter_links(self, discord_ids):
+        for chunk in database._chunks(discord_ids):
+            for did, row in await self._call("get_links", discord_ids=chunk):
+                yield did, row
+
+    async def get_phash_page(self, after_id=0, limit=5000):
+        return await self._call("get_phash_page", after_id=after_id, limit=limit)
+
+    async def iter_history(self, guild_id, since_ts=None, after_id=0, chunk_size=1000):
+        while True:
+            rows = await self._call("get_history_page", guild_id=guild_id, since_ts=since_ts,
+                                    after_id=after_id, chunk_size=chunk_size)
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            after_id = rows[-1]["id"]
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+
+def from_url(url: str = "", token: str = "") -> Storage:
+    """Empty or sqlite:///path -> SQLiteStorage; http(s)://... -> RemoteStorage."""
+    url = (url or "").strip()
+    if url.startswith(("http://", "https://")):
+        return RemoteStorage(url, token=token)
+    if url.startswith("sqlite:///"):
+        database.DB_FILE = url[len("sqlite:///"):]
+    elif url:
+        raise ValueError(f"unsupported STORAGE_URL {url!r}")
+    return SQLiteStorage()
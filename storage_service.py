@@ -0,0 +1,113 @@
+"""
+Shared storage server for multi-process / multi-host deployments.
+
+Owns the SQLite database (database.py) and serves the operations of
+storage.Storage at POST /storage/<op> with a JSON body; every bot shard and
+verify_service replica uses it through storage.RemoteStorage
+(STORAGE_URL=http://host:8200). Retention runs here, next to the data.
+
+  STORAGE_PORT=8200 STORAGE_TOKEN=... python storage_service.py
+
+STORAGE_TOKEN is required: whoever can call this service can link any
+Discord id to any X account. It listens on 127.0.0.1 unless STORAGE_HOST
+says otherwise.
+"""
+import asyncio
+import hmac
+import os
+
+from fastapi import FastAPI, Header, HTTPException, Request
+
+import database
+import storage
+
+STORAGE_TOKEN = os.environ.get("STORAGE_TOKEN", "")
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", "0") or 0)  # opt-in, as in bot.py
+RETENTION_INTERVAL_HOURS = float(os.environ.get("RETENTION_INTERVAL_HOURS", "6") or 6)
+
+app = FastAPI()
+_backend = storage.SQLiteStorage()
+
+async def _get_links(discord_ids: list[str]) -> list:
+    return [[did, row] async for did, row in _backend.iter_links(discord_ids)]
+
+async def _get_history_page(guild_id: str, since_ts: int | None = None, after_id: int = 0, chunk_size: int = 1000) -> list:
+    async for rows in _backend.iter_history(guild_id, since_ts=since_ts, after_id=after_id, chunk_size=chunk_size):
+        return rows
+    return []
+
+# op -> storage method; arguments are the JSON body's keys
+_OPS = {
+    "get_link": _backend.get_link,
+    "save_link": _backend.save_link,
+    "delete_link": _backend.delete_link,
+    "log_result": _backend.log_result,
+    "pending_put": _backend.pending_put,
+    "pending_pop": _backend.pending_pop,
+    "get_guild_stats": _backend.get_guild_stats,
+    "get_latest_tiers": _backend.get_latest_tiers,
+    "get_link_versions": _backend.get_link_versions,
+    # paged reads behind RemoteStorage's iterators
+    "get_links": _get_links,
+    "get_phash_page": _backend.get_phash_page,
+    "get_history_page": _get_history_page,
+}
+
+
+async def _retention_loop():
+    while True:
+        try:
+            deleted = await database.purge_history(RETENTION_DAYS)
+            await database.incremental_vacuum()
+            if deleted:
+                print(f"[retention] deleted {deleted} history rows older than {RETENTION_DAYS}d")
+        except Exception as e:
+            print(f"[retention] failed: {e}")
+        await asyncio.sleep(RETENTION_INTERVAL_HOURS * 3600)
+
+_retention_task = None
+
+@app.on_event("startup")
+async def startup_event():
+    global _retention_task
+    await _backend.init()
+    if RETENTION_DAYS > 0 and _retention_task is None:
+        _retention_task = asyncio.create_task(_retention_loop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global _retention_task
+    if _retention_task is not None:
+        _retention_task.cancel()
+        try:
+            await _retention_task
+        except asyncio.CancelledError:
+            pass
+        _retention_task = None
+
+@app.post("/storage/{op}")
+async def storage_op(op: str, request: Request, authorization: str = Header(None)):
+    if not STORAGE_TOKEN:
+        raise HTTPException(503, "storage service disabled: set STORAGE_TOKEN")
+    expected = f"Bearer {STORAGE_TOKEN}"
+    if not authorization or not hmac.compare_digest(authorization, expected):
+        raise HTTPException(401, "storage token required")
+    if op == "ping":
+        return {"result": "ok"}
+    fn = _OPS.get(op)
+    if fn is None:
+        raise HTTPException(404, f"unknown op {op}")
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(400, "JSON body required")
+    try:
+        return {"result": await fn(**payload)}
+    except TypeError as e:
+        raise HTTPException(400, f"bad arguments for {op}: {e}")
+
+if __name__ == "__main__":
+    if not STORAGE_TOKEN:
+        raise SystemExit("STORAGE_TOKEN is not set; refusing to serve the shared database without it.")
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get("STORAGE_HOST", "127.0.0.1"), port=int(os.environ.get("STORAGE_PORT", "8200")))
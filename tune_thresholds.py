@@ -0,0 +1,115 @@
+"""
+Tune per-project fast-path confidence thresholds from a labelled corpus.
+
+Corpus layout: a directory of screenshots plus labels.json:
+  {"kaito_01.png": {"project": "Kaito", "score": "1,234"}, ...}
+
+For every screenshot the ROI fast path is run with the labelled project as the
+hint, and its raw score confidence is recorded along with whether the score was
+right. Per project, a Platt scaling (a, b) is fitted so confidences are
+calibrated probabilities of being correct. The threshold is the lowest one
+whose accepted reads reach --precision. The result is written to
+SCORE_THRESHOLDS_FILE (score_thresholds.json by default), which bot.py loads
+at startup.
+
+  python tune_thresholds.py ./corpus --precision 0.98
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+
+
+def _num(s):
+    try:
+        return float(str(s).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return None
+
+def fit_platt(samples: list[tuple[float, bool]], iters: int = 500, lr: float = 0.5) -> tuple[float, float]:
+    """1-D logistic regression p(correct) = sigmoid(a * conf + b) by gradient descent."""
+    a, b = 1.0, 0.0
+    n = float(len(samples))
+    for _ in range(iters):
+        ga = gb = 0.0
+        for x, y in samples:
+            p = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, a * x + b))))
+            ga += (p - y) * x
+            gb += (p - y)
+        a -= lr * ga / n
+        b -= lr * gb / n
+    return a, b
+
+def pick_threshold(samples: list[tuple[float, bool]], precision: float) -> tuple[float, dict]:
+    """Lowest threshold whose accepted samples reach `precision`; 1.01 (always fall back) if none."""
+    best_t = 1.01
+    for t in sorted({round(c, 4) for c, _ in samples}):
+        accepted = [ok for c, ok in samples if c >= t]
+        if accepted and sum(accepted) / len(accepted) >= precision:
+            best_t = t
+            break
+    accepted = [ok for c, ok in samples if c >= best_t]
+    stats = {
+        "samples": len(samples),
+        "fast_accept_rate": round(len(accepted) / len(samples), 4) if samples else 0.0,
+        "fast_precision": round(sum(accepted) / len(accepted), 4) if accepted else None,
+        "raw_accuracy": round(sum(ok for _, ok in samples) / len(samples), 4) if samples else 0.0,
+    }
+    return best_t, stats
+
+
+async def collect(corpus: str) -> dict:
+    import bot
+
+    # Measure raw (uncalibrated) confidences
+    bot.SCORE_THRESHOLDS = {}
+    with open(os.path.join(corpus, "labels.json"), "r", encoding="utf-8") as f:
+        labels = json.load(f)
+
+    per_project = {}
+    for name, lab in labels.items():
+        path = os.path.join(corpus, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        project = lab.get("project") or "auto"
+        img, proj, score, _handle, _used, conf = await bot.detect_project_score_and_handle(data, project_hint=project)
+        if proj == "Unknown":
+            continue
+        ok = score is not None and _num(score) == _num(lab.get("score"))
+        per_project.setdefault(proj, []).append((conf, ok))
+        print(f"{name}: {proj} read={score} expected={lab.get('score')} conf={conf:.3f} {'OK' if ok else 'WRONG'}")
+    return per_project
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fit fast-path score confidence thresholds from a labelled corpus.")
+    ap.add_argument("corpus", help="Directory with screenshots and labels.json")
+    ap.add_argument("--precision", type=float, default=0.97, help="Required precision of accepted fast-path reads")
+    ap.add_argument("--min-samples", type=int, default=20, help="Skip Platt scaling below this many samples")
+    ap.add_argument("--out", default=os.getenv("SCORE_THRESHOLDS_FILE", "score_thresholds.json"))
+    args = ap.parse_args(argv)
+
+    per_project = asyncio.run(collect(args.corpus))
+    out = {}
+    for proj, samples in sorted(per_project.items()):
+        entry = {}
+        if len(samples) >= args.min_samples and 0 < sum(ok for _, ok in samples) < len(samples):
+            a, b = fit_platt(samples)
+            entry.update({"a": round(a, 4), "b": round(b, 4)})
+            samples = [(1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, a * c + b)))), ok) for c, ok in samples]
+        t, stats = pick_threshold(samples, args.precision)
+        entry["threshold"] = round(t, 4)
+        entry["stats"] = stats
+        out[proj] = entry
+        print(f"{proj}: threshold={entry['threshold']} {stats}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
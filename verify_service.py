@@ -1,9 +1,11 @@
 import os, time, json, hmac, hashlib, base64, secrets, urllib.parse, tempfile
 import aiohttp
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Query, HTTPException, Header, Body
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 import database
+import storage
+import history_export
 
 load_dotenv()
 
@@ -12,10 +14,22 @@ X_CLIENT_ID = os.environ["X_CLIENT_ID"]
 X_CLIENT_SECRET = os.environ.get("X_CLIENT_SECRET", "")  # optional for public client
 X_REDIRECT_URI = os.environ["X_REDIRECT_URI"]            # e.g. https://your-service.com/x/callback
 X_SCOPES = os.environ.get("X_SCOPES", "users.read tweet.read")
+# Token / users API host; point it at a local stand-in for tests (oauth_loadtest.py)
+X_API_BASE = os.environ.get("X_API_BASE", "https://api.x.com").rstrip("/")
 
 LINK_SECRET = os.environ["LINK_SECRET"]  # shared with bot (HMAC)
 LINK_TTL = 10 * 60                       # seconds validity of signed link
 
+# Bearer token for admin/reporting endpoints; unset = those endpoints are disabled (503)
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN", "")
+
+# Max ids per /api/x/linked/bulk request
+BULK_LINK_MAX = int(os.environ.get("BULK_LINK_MAX", "1000"))
+
+# Links, OAuth pending state, stats and exports go through STORAGE so several replicas can share them
+# (STORAGE_URL=http://host:8200 for storage_service.py; default: local SQLite).
+STORAGE = storage.from_url(os.environ.get("STORAGE_URL", ""), token=os.environ.get("STORAGE_TOKEN", ""))
+
 PENDING_FILE = "oauth_pending.json"
 LINKS_FILE = "x_links.json"
 
@@ -24,6 +38,7 @@ app = FastAPI()
 @app.on_event("startup")
 async def startup_event():
     await database.init_db()
+    await STORAGE.init()
 
 # ---- JSON helpers (atomic write) ----
 def _load(path):
@@ -65,9 +80,17 @@ def _check_sig(discord_id: str, ts: int, sig: str):
     if not hmac.compare_digest(expected, sig):
         raise HTTPException(400, "bad signature")
 
+def _check_admin(authorization: str | None):
+    # Fail closed: this service faces the internet, so no token configured means no admin API
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(503, "admin API disabled: set ADMIN_API_TOKEN")
+    expected = f"Bearer {ADMIN_API_TOKEN}"
+    if not authorization or not hmac.compare_digest(authorization, expected):
+        raise HTTPException(401, "admin token required")
+
 # ---- X calls ----
 async def _token_exchange(code: str, verifier: str) -> dict:
-    url = "https://api.x.com/2/oauth2/token"
+    url = f"{X_API_BASE}/2/oauth2/token"
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
 
     if X_CLIENT_SECRET:
@@ -90,7 +113,7 @@ async def _token_exchange(code: str, verifier: str) -> dict:
             return json.loads(txt)
 
 async def _users_me(access_token: str) -> dict:
-    url = "https://api.x.com/2/users/me"
+    url = f"{X_API_BASE}/2/users/me"
     params = {"user.fields": "id,username,name,verified,verified_type"}
     headers = {"Authorization": f"Bearer {access_token}"}
 
@@ -114,13 +137,7 @@ async def x_start(
     code_verifier = secrets.token_urlsafe(48)
     code_challenge = _pkce_challenge(code_verifier)
 
-    pending = _load(PENDING_FILE)
-    pending[state] = {
-        "discord_id": discord_id,
-        "code_verifier": code_verifier,
-        "created_at": int(time.time())
-    }
-    _atomic_write(PENDING_FILE, pending)
+    await STORAGE.pending_put(state, discord_id, code_verifier, ttl=LINK_TTL)
 
     params = {
         "response_type": "code",
@@ -148,9 +165,7 @@ async def x_callback(
     if not code:
         return HTMLResponse("<h3>Missing code</h3>", status_code=400)
 
-    pending = _load(PENDING_FILE)
-    st = pending.pop(state, None)
-    _atomic_write(PENDING_FILE, pending)
+    st = await STORAGE.pending_pop(state, ttl=LINK_TTL)
 
     if not st:
         return HTMLResponse("<h3>Invalid/expired state</h3><p>Run !xlink again.</p>", status_code=400)
@@ -172,7 +187,7 @@ async def x_callback(
         "verified_type": user.get("verified_type"),
         "linked_at": int(time.time()),
     }
-    await database.save_link(st["discord_id"], link_payload)
+    await STORAGE.save_link(st["discord_id"], link_payload)
 
     return HTMLResponse(get_success_html(user.get("username")), status_code=200)
 
@@ -298,9 +313,81 @@ def get_success_html(username):
 
 @app.get("/api/x/linked")
 async def api_linked(discord_id: str = Query(...)):
-    obj = await database.get_link(discord_id)
+    obj = await STORAGE.get_link(discord_id)
     return {"linked": bool(obj), "data": obj}
 
+def _links_etag(ids: list[str], versions: dict) -> str:
+    h = hashlib.sha256()
+    for did in ids:
+        v = versions.get(did)
+        h.update(f"{did}:{v[0]}:{v[1]};".encode("utf-8") if v else f"{did}:-;".encode("utf-8"))
+    return '"' + h.hexdigest()[:32] + '"'
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+@app.post("/api/x/linked/bulk")
+async def api_linked_bulk(
+    discord_ids: list[str] = Body(..., embed=True),
+    if_none_match: str = Header(None),
+    authorization: str = Header(None),
+):
+    """
+    Linked accounts for many Discord ids at once, streamed as NDJSON
+    ({"discord_id", "linked", "data"} per line, in request order).
+    The ETag covers each id's row version, so a repeat request with
+    If-None-Match gets a 304 from an index-only query. Requires the
+    ADMIN_API_TOKEN bearer token (Discord->X mappings in bulk).
+    """
+    _check_admin(authorization)
+    ids = list(dict.fromkeys(str(d).strip() for d in discord_ids if str(d).strip()))
+    if len(ids) > BULK_LINK_MAX:
+        raise HTTPException(413, f"at most {BULK_LINK_MAX} discord_ids per request")
+
+    etag = _links_etag(ids, await STORAGE.get_link_versions(ids))
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    async def _lines():
+        async for did, row in STORAGE.iter_links(ids):
+            yield json.dumps({"discord_id": did, "linked": bool(row), "data": row}) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson", headers={"ETag": etag})
+
+@app.get("/api/stats")
+async def api_stats(
+    guild_id: str = Query(...),
+    days: int = Query(7, ge=1, le=365),
+    authorization: str = Header(None),
+):
+    # Reads only the incrementally maintained aggregate tables
+    _check_admin(authorization)
+    return await STORAGE.get_guild_stats(guild_id, days=days)
+
+@app.get("/api/export")
+async def api_export(
+    guild_id: str = Query(...),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    days: int = Query(0, ge=0, le=3650),
+    after_id: int = Query(0, ge=0),
+    authorization: str = Header(None),
+):
+    """
+    Stream a guild's verification history (days=0: everything; after_id resumes an interrupted dump).
+    Requires the ADMIN_API_TOKEN bearer token: rows carry discord ids, usernames and scores.
+    """
+    _check_admin(authorization)
+    since_ts = int(time.time()) - days * 86400 if days else None
+    filename = f"verifications-{guild_id}-{time.strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        history_export.export_chunks(guild_id, format, since_ts=since_ts, after_id=after_id, store=STORAGE),
+        media_type=history_export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", "8000"))